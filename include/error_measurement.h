@@ -1,54 +1,92 @@
+#ifndef ERROR_MEASUREMENT_H
+#define ERROR_MEASUREMENT_H
 
 #include <assert.h>
 #include <math.h>
 #include <mpfr.h>
+#include <pthread.h>
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 
-static mpfr_prec_t ORACLE_PREC = 106 + 10;
+#include "measurement_common.h"
+#include "xmalloc.h"
 
-typedef double (*unop_fp64)(double);
-typedef int (*unop_mpfr_fp64)(mpfr_t, double);
+static mpfr_prec_t ORACLE_PREC = 106 + 10;
 
+// Writes the header of a numpy .npy (version 1.0) file holding a one
+// dimensional structured array with one `kind` column per name, so that the
+// output of the generate_* runners can be read with `numpy.load`
 static void
-init_random_double()
+write_npy_header(FILE *out,
+                 const char **names,
+                 size_t columns,
+                 const char *kind,
+                 size_t rows)
 {
-    srand(42);
+    const uint16_t one = 1;
+    char endian = (*(const char *) &one == 1) ? '<' : '>';
+
+    char header[512];
+    int len = snprintf(header, sizeof(header), "{'descr': [");
+    for (size_t c = 0; c < columns; c++)
+    {
+        len += snprintf(header + len, sizeof(header) - len,
+                        "('%s', '%c%s'), ", names[c], endian, kind);
+    }
+    len += snprintf(header + len, sizeof(header) - len,
+                    "], 'fortran_order': False, 'shape': (%zu,), }", rows);
+    assert(len > 0 && (size_t) len < sizeof(header) - 64);
+
+    // magic (6) + version (2) + header length (2) + header, padded with
+    // spaces and ended by a newline to a multiple of 64 bytes
+    size_t total = 10 + len + 1;
+    size_t padding = (64 - total % 64) % 64;
+    memset(header + len, ' ', padding);
+    len += padding;
+    header[len++] = '\n';
+
+    unsigned char preamble[10] = {
+        0x93, 'N', 'U', 'M', 'P', 'Y', 1, 0,
+        (unsigned char) (len & 0xff), (unsigned char) ((len >> 8) & 0xff),
+    };
+    fwrite(preamble, 1, sizeof(preamble), out);
+    fwrite(header, 1, len, out);
 }
 
-static double
-random_double()
+typedef int (*unop_mpfr_fp64)(mpfr_t, double);
+
+typedef struct
 {
-    // TODO: this is a _really_ bad fp rng
-    return ((double)rand()) / ((double)RAND_MAX);
-}
+    unop_mpfr_fp64 oracle;
+    double low;
+    double span;
+    size_t start;
+    size_t end;
+    double *inputs;
+    double *correctly_rounded;
+    double *diffs;
+} oracle_block_fp64;
 
-static void
-generate_oracle_values_fp64(unop_mpfr_fp64 oracle,
-                            double low,
-                            double high,
-                            size_t samples)
+static void *
+oracle_block_main_fp64(void *arg)
 {
-    assert(isfinite(low));
-    assert(isfinite(high));
-    assert(low < high);
-    assert(samples > 0);
+    oracle_block_fp64 *block = arg;
 
-    double span = high - low;
+    // Scratch is per thread, the oracle keeps its own thread local state
     mpfr_t y_R;
     mpfr_t err_R;
 
     mpfr_init2(y_R, ORACLE_PREC);
     mpfr_init2(err_R, ORACLE_PREC);
 
-    printf("input\tcorrectly_rounded\tdiff\n");
-    init_random_double();
-    for (size_t i = 0; i < samples; i++)
+    for (size_t i = block->start; i < block->end; i++)
     {
-        double x = low + span * random_double();
+        double x = block->low + block->span * random_double_at(MEASUREMENT_SEED, i);
 
         // Run oracle
-        oracle(y_R, x);
+        block->oracle(y_R, x);
 
         // Closest double
         double y = mpfr_get_d(y_R, MPFR_RNDN);
@@ -57,15 +95,90 @@ generate_oracle_values_fp64(unop_mpfr_fp64 oracle,
         mpfr_sub_d(err_R, y_R, y, MPFR_RNDN);
         double err = mpfr_get_d(err_R, MPFR_RNDN);
 
-        printf("%a\t%a\t%a\n", x, y, err);
+        block->inputs[i] = x;
+        block->correctly_rounded[i] = y;
+        block->diffs[i] = err;
     }
+
+    mpfr_clear(y_R);
+    mpfr_clear(err_R);
+    mpfr_free_cache();
+    return NULL;
 }
 
+// Samples are split into one contiguous block per thread (0 means one per
+// online cpu), the inputs only depend on the sample index so the result is
+// the same for any number of threads
 static void
-generate_function_values_fp64(unop_fp64 func,
+fill_oracle_values_fp64(unop_mpfr_fp64 oracle,
+                        double low,
+                        double high,
+                        size_t samples,
+                        size_t threads,
+                        double *inputs,
+                        double *correctly_rounded,
+                        double *diffs)
+{
+    assert(isfinite(low));
+    assert(isfinite(high));
+    assert(low < high);
+    assert(samples > 0);
+
+    threads = measurement_threads(threads, samples);
+    oracle_block_fp64 *blocks =
+        xmalloc(threads * sizeof(oracle_block_fp64));
+    for (size_t t = 0; t < threads; t++)
+    {
+        blocks[t].oracle = oracle;
+        blocks[t].low = low;
+        blocks[t].span = high - low;
+        blocks[t].start = samples * t / threads;
+        blocks[t].end = samples * (t + 1) / threads;
+        blocks[t].inputs = inputs;
+        blocks[t].correctly_rounded = correctly_rounded;
+        blocks[t].diffs = diffs;
+    }
+
+    run_parallel(oracle_block_main_fp64, blocks,
+                 sizeof(oracle_block_fp64), threads);
+
+    xfree(blocks);
+}
+
+static void
+generate_oracle_values_fp64(unop_mpfr_fp64 oracle,
                             double low,
                             double high,
                             size_t samples)
+{
+    double *inputs = xmalloc(samples * sizeof(double));
+    double *correctly_rounded = xmalloc(samples * sizeof(double));
+    double *diffs = xmalloc(samples * sizeof(double));
+
+    fill_oracle_values_fp64(oracle, low, high, samples, 0,
+                            inputs, correctly_rounded, diffs);
+
+    const char *names[] = {"input", "correctly_rounded", "diff"};
+    write_npy_header(stdout, names, 3, "f8", samples);
+    for (size_t i = 0; i < samples; i++)
+    {
+        double row[3] = {inputs[i], correctly_rounded[i], diffs[i]};
+        fwrite(row, sizeof(double), 3, stdout);
+    }
+    fflush(stdout);
+
+    xfree(inputs);
+    xfree(correctly_rounded);
+    xfree(diffs);
+}
+
+static void
+fill_function_values_fp64(unop_fp64 func,
+                          double low,
+                          double high,
+                          size_t samples,
+                          double *inputs,
+                          double *outputs)
 {
     assert(isfinite(low));
     assert(isfinite(high));
@@ -74,46 +187,71 @@ generate_function_values_fp64(unop_fp64 func,
 
     double span = high - low;
 
-    printf("input\tfunction\n");
-    init_random_double();
     for (size_t i = 0; i < samples; i++)
     {
-        double x = low + span * random_double();
-        double y = func(x);
-        printf("%a\t%a\n", x, y);
+        double x = low + span * random_double_at(MEASUREMENT_SEED, i);
+        inputs[i] = x;
+        outputs[i] = func(x);
     }
 }
 
+static void
+generate_function_values_fp64(unop_fp64 func,
+                            double low,
+                            double high,
+                            size_t samples)
+{
+    double *inputs = xmalloc(samples * sizeof(double));
+    double *outputs = xmalloc(samples * sizeof(double));
+
+    fill_function_values_fp64(func, low, high, samples, inputs, outputs);
+
+    const char *names[] = {"input", "function"};
+    write_npy_header(stdout, names, 2, "f8", samples);
+    for (size_t i = 0; i < samples; i++)
+    {
+        double row[2] = {inputs[i], outputs[i]};
+        fwrite(row, sizeof(double), 2, stdout);
+    }
+    fflush(stdout);
+
+    xfree(inputs);
+    xfree(outputs);
+}
+
 
-typedef float (*unop_fp32)(float);
 typedef int (*unop_mpfr_fp32)(mpfr_t, float);
 
-static void
-generate_oracle_values_fp32(unop_mpfr_fp32 oracle,
-                            float low,
-                            float high,
-                            size_t samples)
+typedef struct
 {
-    assert(isfinite(low));
-    assert(isfinite(high));
-    assert(low < high);
-    assert(samples > 0);
+    unop_mpfr_fp32 oracle;
+    float low;
+    float span;
+    size_t start;
+    size_t end;
+    float *inputs;
+    float *correctly_rounded;
+    float *diffs;
+} oracle_block_fp32;
 
-    float span = high - low;
+static void *
+oracle_block_main_fp32(void *arg)
+{
+    oracle_block_fp32 *block = arg;
+
+    // Scratch is per thread, the oracle keeps its own thread local state
     mpfr_t y_R;
     mpfr_t err_R;
 
     mpfr_init2(y_R, ORACLE_PREC);
     mpfr_init2(err_R, ORACLE_PREC);
 
-    printf("input\tcorrectly_rounded\tdiff\n");
-    init_random_double();
-    for (size_t i = 0; i < samples; i++)
+    for (size_t i = block->start; i < block->end; i++)
     {
-        float x = low + span * ((float) random_double());
+        float x = block->low + block->span * ((float) random_double_at(MEASUREMENT_SEED, i));
 
         // Run oracle
-        oracle(y_R, x);
+        block->oracle(y_R, x);
 
         // Closest float
         float y = mpfr_get_flt(y_R, MPFR_RNDN);
@@ -122,15 +260,90 @@ generate_oracle_values_fp32(unop_mpfr_fp32 oracle,
         mpfr_sub_d(err_R, y_R, y, MPFR_RNDN);
         float err = mpfr_get_flt(err_R, MPFR_RNDN);
 
-        printf("%a\t%a\t%a\n", x, y, err);
+        block->inputs[i] = x;
+        block->correctly_rounded[i] = y;
+        block->diffs[i] = err;
     }
+
+    mpfr_clear(y_R);
+    mpfr_clear(err_R);
+    mpfr_free_cache();
+    return NULL;
 }
 
+// Samples are split into one contiguous block per thread (0 means one per
+// online cpu), the inputs only depend on the sample index so the result is
+// the same for any number of threads
 static void
-generate_function_values_fp32(unop_fp32 func,
+fill_oracle_values_fp32(unop_mpfr_fp32 oracle,
+                        float low,
+                        float high,
+                        size_t samples,
+                        size_t threads,
+                        float *inputs,
+                        float *correctly_rounded,
+                        float *diffs)
+{
+    assert(isfinite(low));
+    assert(isfinite(high));
+    assert(low < high);
+    assert(samples > 0);
+
+    threads = measurement_threads(threads, samples);
+    oracle_block_fp32 *blocks =
+        xmalloc(threads * sizeof(oracle_block_fp32));
+    for (size_t t = 0; t < threads; t++)
+    {
+        blocks[t].oracle = oracle;
+        blocks[t].low = low;
+        blocks[t].span = high - low;
+        blocks[t].start = samples * t / threads;
+        blocks[t].end = samples * (t + 1) / threads;
+        blocks[t].inputs = inputs;
+        blocks[t].correctly_rounded = correctly_rounded;
+        blocks[t].diffs = diffs;
+    }
+
+    run_parallel(oracle_block_main_fp32, blocks,
+                 sizeof(oracle_block_fp32), threads);
+
+    xfree(blocks);
+}
+
+static void
+generate_oracle_values_fp32(unop_mpfr_fp32 oracle,
                             float low,
                             float high,
                             size_t samples)
+{
+    float *inputs = xmalloc(samples * sizeof(float));
+    float *correctly_rounded = xmalloc(samples * sizeof(float));
+    float *diffs = xmalloc(samples * sizeof(float));
+
+    fill_oracle_values_fp32(oracle, low, high, samples, 0,
+                            inputs, correctly_rounded, diffs);
+
+    const char *names[] = {"input", "correctly_rounded", "diff"};
+    write_npy_header(stdout, names, 3, "f4", samples);
+    for (size_t i = 0; i < samples; i++)
+    {
+        float row[3] = {inputs[i], correctly_rounded[i], diffs[i]};
+        fwrite(row, sizeof(float), 3, stdout);
+    }
+    fflush(stdout);
+
+    xfree(inputs);
+    xfree(correctly_rounded);
+    xfree(diffs);
+}
+
+static void
+fill_function_values_fp32(unop_fp32 func,
+                          float low,
+                          float high,
+                          size_t samples,
+                          float *inputs,
+                          float *outputs)
 {
     assert(isfinite(low));
     assert(isfinite(high));
@@ -139,12 +352,36 @@ generate_function_values_fp32(unop_fp32 func,
 
     float span = high - low;
 
-    printf("input\tfunction\n");
-    init_random_double();
     for (size_t i = 0; i < samples; i++)
     {
-        float x = low + span * ((float) random_double());
-        float y = func(x);
-        printf("%a\t%a\n", x, y);
+        float x = low + span * ((float) random_double_at(MEASUREMENT_SEED, i));
+        inputs[i] = x;
+        outputs[i] = func(x);
     }
-}
\ No newline at end of file
+}
+
+static void
+generate_function_values_fp32(unop_fp32 func,
+                            float low,
+                            float high,
+                            size_t samples)
+{
+    float *inputs = xmalloc(samples * sizeof(float));
+    float *outputs = xmalloc(samples * sizeof(float));
+
+    fill_function_values_fp32(func, low, high, samples, inputs, outputs);
+
+    const char *names[] = {"input", "function"};
+    write_npy_header(stdout, names, 2, "f4", samples);
+    for (size_t i = 0; i < samples; i++)
+    {
+        float row[2] = {inputs[i], outputs[i]};
+        fwrite(row, sizeof(float), 2, stdout);
+    }
+    fflush(stdout);
+
+    xfree(inputs);
+    xfree(outputs);
+}
+
+#endif // #ifndef ERROR_MEASUREMENT_H
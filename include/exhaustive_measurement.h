@@ -0,0 +1,273 @@
+#ifndef EXHAUSTIVE_MEASUREMENT_H
+#define EXHAUSTIVE_MEASUREMENT_H
+
+#include <assert.h>
+#include <math.h>
+#include <mpfr.h>
+#include <pthread.h>
+#include <stdint.h>
+#include <string.h>
+
+#include "error_measurement.h"
+#include "measurement_common.h"
+#include "xmalloc.h"
+
+// Histogram of errors in ulps of the correctly rounded result.
+// Bin 0 counts exact results, bin i > 0 counts errors in
+// [2^(i - 1 - SWEEP_ULP_OFFSET), 2^(i - SWEEP_ULP_OFFSET)), the first and last
+// bins also take everything below and above their range.
+#define SWEEP_HISTOGRAM_BINS 64
+#define SWEEP_ULP_OFFSET 32
+
+// Inputs are handed out to threads in chunks of this many floats
+#define SWEEP_CHUNK ((uint64_t)1 << 16)
+
+typedef struct
+{
+    uint64_t count;
+    double max_abs_error;
+    float max_abs_input;
+    double max_ulp_error;
+    float max_ulp_input;
+    uint64_t histogram[SWEEP_HISTOGRAM_BINS];
+} sweep_result_fp32;
+
+// Floats mapped to integers with the same order, so a range of floats is a
+// range of keys
+static uint32_t
+float_to_key(float x)
+{
+    uint32_t u;
+    memcpy(&u, &x, sizeof(u));
+    return (u & 0x80000000u) ? ~u : (u | 0x80000000u);
+}
+
+static float
+key_to_float(uint32_t key)
+{
+    uint32_t u = (key & 0x80000000u) ? (key & 0x7fffffffu) : ~key;
+    float x;
+    memcpy(&x, &u, sizeof(x));
+    return x;
+}
+
+static double
+ulp_fp32(float y)
+{
+    float a = fabsf(y);
+    if (isinf(a))
+    {
+        return (double)a - (double)nextafterf(a, 0.0f);
+    }
+    return (double)nextafterf(a, INFINITY) - (double)a;
+}
+
+static int
+sweep_bin(double ulp_error)
+{
+    if (ulp_error == 0.0)
+    {
+        return 0;
+    }
+    if (isinf(ulp_error) || isnan(ulp_error))
+    {
+        return SWEEP_HISTOGRAM_BINS - 1;
+    }
+    int exp;
+    frexp(ulp_error, &exp);
+    int bin = exp + SWEEP_ULP_OFFSET;
+    if (bin < 1)
+    {
+        return 1;
+    }
+    if (bin > SWEEP_HISTOGRAM_BINS - 1)
+    {
+        return SWEEP_HISTOGRAM_BINS - 1;
+    }
+    return bin;
+}
+
+// Ties go to the smaller input so the answer does not depend on scheduling
+static void
+sweep_update(double *max_error, float *max_input, double error, float x)
+{
+    if (error > *max_error
+        || (error == *max_error && float_to_key(x) < float_to_key(*max_input)))
+    {
+        *max_error = error;
+        *max_input = x;
+    }
+}
+
+static void
+sweep_merge(sweep_result_fp32 *into, const sweep_result_fp32 *from)
+{
+    into->count += from->count;
+    sweep_update(&into->max_abs_error, &into->max_abs_input,
+                 from->max_abs_error, from->max_abs_input);
+    sweep_update(&into->max_ulp_error, &into->max_ulp_input,
+                 from->max_ulp_error, from->max_ulp_input);
+    for (int i = 0; i < SWEEP_HISTOGRAM_BINS; i++)
+    {
+        into->histogram[i] += from->histogram[i];
+    }
+}
+
+typedef struct
+{
+    unop_fp32 func;
+    unop_mpfr_fp32 oracle;
+    uint64_t first_key;
+    uint64_t last_key;
+    uint64_t next_key;
+    pthread_mutex_t lock;
+} sweep_work_fp32;
+
+typedef struct
+{
+    sweep_work_fp32 *work;
+    sweep_result_fp32 result;
+} sweep_thread_fp32;
+
+static int
+sweep_next_chunk(sweep_work_fp32 *work, uint64_t *start, uint64_t *end)
+{
+    pthread_mutex_lock(&work->lock);
+    *start = work->next_key;
+    *end = *start + SWEEP_CHUNK;
+    if (*end > work->last_key + 1)
+    {
+        *end = work->last_key + 1;
+    }
+    work->next_key = *end;
+    pthread_mutex_unlock(&work->lock);
+    return *start < *end;
+}
+
+static double
+sweep_abs_error_fp32(mpfr_t err_R, mpfr_t y_R, float fx)
+{
+    if (isnan(fx) || mpfr_nan_p(y_R))
+    {
+        return (isnan(fx) && mpfr_nan_p(y_R)) ? 0.0 : INFINITY;
+    }
+    if (isinf(fx) || mpfr_inf_p(y_R))
+    {
+        return (mpfr_get_flt(y_R, MPFR_RNDN) == fx) ? 0.0 : INFINITY;
+    }
+    mpfr_sub_d(err_R, y_R, fx, MPFR_RNDN);
+    return fabs(mpfr_get_d(err_R, MPFR_RNDN));
+}
+
+static void *
+sweep_thread_main_fp32(void *arg)
+{
+    sweep_thread_fp32 *thread = arg;
+    sweep_work_fp32 *work = thread->work;
+    sweep_result_fp32 *result = &thread->result;
+
+    // Scratch is per thread, the oracle keeps its own thread local state
+    mpfr_t y_R;
+    mpfr_t err_R;
+    mpfr_init2(y_R, ORACLE_PREC);
+    mpfr_init2(err_R, ORACLE_PREC);
+
+    uint64_t start, end;
+    while (sweep_next_chunk(work, &start, &end))
+    {
+        for (uint64_t key = start; key < end; key++)
+        {
+            float x = key_to_float((uint32_t)key);
+            float fx = work->func(x);
+            work->oracle(y_R, x);
+
+            double abs_error = sweep_abs_error_fp32(err_R, y_R, fx);
+            double ulp_error = 0.0;
+            if (abs_error != 0.0)
+            {
+                ulp_error = abs_error / ulp_fp32(mpfr_get_flt(y_R,
+                                                              MPFR_RNDN));
+            }
+
+            result->count += 1;
+            result->histogram[sweep_bin(ulp_error)] += 1;
+            sweep_update(&result->max_abs_error, &result->max_abs_input,
+                         abs_error, x);
+            sweep_update(&result->max_ulp_error, &result->max_ulp_input,
+                         ulp_error, x);
+        }
+    }
+
+    mpfr_clear(y_R);
+    mpfr_clear(err_R);
+    mpfr_free_cache();
+    return NULL;
+}
+
+// Evaluates `func` and `oracle` on every float in [low, high], split over
+// `threads` threads (0 means one per online cpu)
+static void
+sweep_fp32(unop_fp32 func,
+           unop_mpfr_fp32 oracle,
+           float low,
+           float high,
+           size_t threads,
+           sweep_result_fp32 *result)
+{
+    assert(!isnan(low));
+    assert(!isnan(high));
+    assert(low <= high);
+
+    threads = measurement_threads(threads, 0);
+
+    sweep_work_fp32 work;
+    work.func = func;
+    work.oracle = oracle;
+    work.first_key = float_to_key(low);
+    work.last_key = float_to_key(high);
+    work.next_key = work.first_key;
+    pthread_mutex_init(&work.lock, NULL);
+
+    sweep_thread_fp32 *states = xmalloc(threads * sizeof(sweep_thread_fp32));
+    pthread_t *handles = xmalloc(threads * sizeof(pthread_t));
+    char *started = xmalloc(threads * sizeof(char));
+    for (size_t t = 0; t < threads; t++)
+    {
+        memset(&states[t].result, 0, sizeof(sweep_result_fp32));
+        states[t].result.max_abs_input = high;
+        states[t].result.max_ulp_input = high;
+        states[t].work = &work;
+        int err = pthread_create(&handles[t], NULL, sweep_thread_main_fp32,
+                                 &states[t]);
+        started[t] = (err == 0);
+    }
+
+    // Inputs come from a shared queue, so a thread that could not be
+    // started is run here and takes whatever the others have not
+    for (size_t t = 0; t < threads; t++)
+    {
+        if (!started[t])
+        {
+            sweep_thread_main_fp32(&states[t]);
+        }
+    }
+
+    memset(result, 0, sizeof(sweep_result_fp32));
+    result->max_abs_input = high;
+    result->max_ulp_input = high;
+    for (size_t t = 0; t < threads; t++)
+    {
+        if (started[t])
+        {
+            pthread_join(handles[t], NULL);
+        }
+        sweep_merge(result, &states[t].result);
+    }
+
+    pthread_mutex_destroy(&work.lock);
+    xfree(states);
+    xfree(handles);
+    xfree(started);
+}
+
+#endif // #ifndef EXHAUSTIVE_MEASUREMENT_H
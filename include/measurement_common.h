@@ -0,0 +1,93 @@
+#ifndef MEASUREMENT_COMMON_H
+#define MEASUREMENT_COMMON_H
+
+#include <assert.h>
+#include <pthread.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <unistd.h>
+
+#include "xmalloc.h"
+
+typedef double (*unop_fp64)(double);
+typedef float (*unop_fp32)(float);
+
+// Seed for the sample inputs, the oracle and every function measured on a
+// domain must see the same inputs. Passed in by measurement_library.py
+#ifndef MEASUREMENT_SEED
+#error "MEASUREMENT_SEED must be defined with -DMEASUREMENT_SEED=<seed>"
+#endif
+
+static uint64_t
+splitmix64(uint64_t x)
+{
+    x += 0x9e3779b97f4a7c15ull;
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ull;
+    x = (x ^ (x >> 27)) * 0x94d049bb133111ebull;
+    return x ^ (x >> 31);
+}
+
+// The i-th value of the stream for `seed`, uniform in [0, 1).
+// Counter based so any thread can produce any part of the stream and the
+// result does not depend on how the samples are split between threads.
+static double
+random_double_at(uint64_t seed, uint64_t i)
+{
+    uint64_t bits = splitmix64(splitmix64(seed) ^ i);
+    return (double)(bits >> 11) * 0x1p-53;
+}
+
+// Number of threads to use, 0 asks for one per online cpu
+static size_t
+measurement_threads(size_t threads, size_t work)
+{
+    if (threads == 0)
+    {
+        long online = sysconf(_SC_NPROCESSORS_ONLN);
+        threads = (online > 0) ? (size_t)online : 1;
+    }
+    if (work > 0 && threads > work)
+    {
+        threads = work;
+    }
+    return threads;
+}
+
+// Runs `main` once per element of `args` (`count` elements of `arg_size`
+// bytes each), the first on the calling thread and the rest on new threads.
+// Elements whose thread could not be created are also run on the calling
+// thread.
+static void
+run_parallel(void *(*main)(void *), void *args, size_t arg_size, size_t count)
+{
+    assert(count > 0);
+
+    char *base = args;
+    pthread_t *handles = xmalloc(count * sizeof(pthread_t));
+    char *started = xmalloc(count * sizeof(char));
+    started[0] = 0;
+    for (size_t t = 1; t < count; t++)
+    {
+        int err = pthread_create(&handles[t], NULL, main,
+                                 base + t * arg_size);
+        started[t] = (err == 0);
+    }
+    for (size_t t = 0; t < count; t++)
+    {
+        if (!started[t])
+        {
+            main(base + t * arg_size);
+        }
+    }
+    for (size_t t = 1; t < count; t++)
+    {
+        if (started[t])
+        {
+            pthread_join(handles[t], NULL);
+        }
+    }
+    xfree(handles);
+    xfree(started);
+}
+
+#endif // #ifndef MEASUREMENT_COMMON_H
@@ -0,0 +1,147 @@
+#ifndef PERF_COUNTERS_H
+#define PERF_COUNTERS_H
+
+#include <math.h>
+#include <stdint.h>
+#include <string.h>
+
+// Hardware counters through perf_event_open, on other platforms every
+// counter reads as unavailable
+#if defined(__linux__) && defined(__has_include)
+#if __has_include(<linux/perf_event.h>)
+#define PERF_COUNTERS_AVAILABLE 1
+#endif
+#endif
+
+#ifdef PERF_COUNTERS_AVAILABLE
+#include <linux/perf_event.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+#endif
+
+#define PERF_COUNTER_COUNT 4
+
+// Counts per call, nan for counters that could not be opened
+typedef struct
+{
+    double cycles;
+    double instructions;
+    double branch_misses;
+    double cache_misses;
+} perf_result;
+
+typedef struct
+{
+    int fds[PERF_COUNTER_COUNT];
+} perf_counters;
+
+static void
+perf_open(perf_counters *counters)
+{
+#ifdef PERF_COUNTERS_AVAILABLE
+    static const uint64_t configs[PERF_COUNTER_COUNT] = {
+        PERF_COUNT_HW_CPU_CYCLES,
+        PERF_COUNT_HW_INSTRUCTIONS,
+        PERF_COUNT_HW_BRANCH_MISSES,
+        PERF_COUNT_HW_CACHE_MISSES,
+    };
+    for (int i = 0; i < PERF_COUNTER_COUNT; i++)
+    {
+        struct perf_event_attr attr;
+        memset(&attr, 0, sizeof(attr));
+        attr.type = PERF_TYPE_HARDWARE;
+        attr.size = sizeof(attr);
+        attr.config = configs[i];
+        attr.disabled = 1;
+        attr.exclude_kernel = 1;
+        attr.exclude_hv = 1;
+        // Enabled and running times let multiplexed counts be scaled
+        attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED
+                           | PERF_FORMAT_TOTAL_TIME_RUNNING;
+        counters->fds[i] = (int)syscall(SYS_perf_event_open, &attr, 0, -1,
+                                        -1, 0);
+    }
+#else
+    for (int i = 0; i < PERF_COUNTER_COUNT; i++)
+    {
+        counters->fds[i] = -1;
+    }
+#endif
+}
+
+static void
+perf_start(perf_counters *counters)
+{
+#ifdef PERF_COUNTERS_AVAILABLE
+    for (int i = 0; i < PERF_COUNTER_COUNT; i++)
+    {
+        if (counters->fds[i] >= 0)
+        {
+            ioctl(counters->fds[i], PERF_EVENT_IOC_RESET, 0);
+            ioctl(counters->fds[i], PERF_EVENT_IOC_ENABLE, 0);
+        }
+    }
+#else
+    (void)counters;
+#endif
+}
+
+static void
+perf_stop(perf_counters *counters)
+{
+#ifdef PERF_COUNTERS_AVAILABLE
+    for (int i = 0; i < PERF_COUNTER_COUNT; i++)
+    {
+        if (counters->fds[i] >= 0)
+        {
+            ioctl(counters->fds[i], PERF_EVENT_IOC_DISABLE, 0);
+        }
+    }
+#else
+    (void)counters;
+#endif
+}
+
+static double
+perf_read_one(int fd, double calls)
+{
+#ifdef PERF_COUNTERS_AVAILABLE
+    // value, time enabled, time running
+    uint64_t values[3];
+    if (fd < 0 || read(fd, values, sizeof(values)) != sizeof(values)
+        || values[2] == 0)
+    {
+        return NAN;
+    }
+    double scale = (double)values[1] / (double)values[2];
+    return (double)values[0] * scale / calls;
+#else
+    (void)fd;
+    (void)calls;
+    return NAN;
+#endif
+}
+
+// Reads the counters as averages over `calls` calls and closes them
+static void
+perf_finish(perf_counters *counters, double calls, perf_result *result)
+{
+    result->cycles = perf_read_one(counters->fds[0], calls);
+    result->instructions = perf_read_one(counters->fds[1], calls);
+    result->branch_misses = perf_read_one(counters->fds[2], calls);
+    result->cache_misses = perf_read_one(counters->fds[3], calls);
+
+#ifdef PERF_COUNTERS_AVAILABLE
+    for (int i = 0; i < PERF_COUNTER_COUNT; i++)
+    {
+        if (counters->fds[i] >= 0)
+        {
+            close(counters->fds[i]);
+        }
+        counters->fds[i] = -1;
+    }
+#endif
+}
+
+#endif // #ifndef PERF_COUNTERS_H
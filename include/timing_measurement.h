@@ -1,95 +1,488 @@
+#ifndef TIMING_MEASUREMENT_H
+#define TIMING_MEASUREMENT_H
+
+// Needed for CPU affinity, has to come before any system header
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+
 #include <assert.h>
 #include <math.h>
-#include <mpfr.h>
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
 
-typedef double (*unop_fp64)(double);
-typedef float (*unop_fp32)(float);
+#ifdef __linux__
+#include <sched.h>
+#endif
 
-#define MULT_ROUNDING_FACTOR 1e9
+#include "measurement_common.h"
+#include "perf_counters.h"
+#include "xmalloc.h"
 
+// Untimed passes over the inputs before the first trial
+#define TIMING_DEFAULT_WARMUP 2
 
-static void
-init_random_double()
+// Independent inputs measure throughput, in latency mode each input is made
+// to depend on the previous output so calls can not overlap
+#define TIMING_THROUGHPUT 0
+#define TIMING_LATENCY 1
+
+// Every time is in nanoseconds per call
+typedef struct
+{
+    double median;
+    double mad;
+    double min;
+    double max;
+    uint64_t trials;
+    uint64_t samples;
+} timing_result;
+
+// Outputs are folded into this once timing is done, so the calls can not be
+// optimized away
+static volatile double timing_sink;
+
+// Always zero, but read through a volatile so the compiler can not drop the
+// dependency on the previous output. Masking the bits keeps the inputs exact
+// even when an output is inf or nan.
+static volatile uint64_t timing_chain_mask = 0;
+
+static uint64_t
+timing_now_ns(void)
+{
+    struct timespec ts;
+#ifdef CLOCK_MONOTONIC_RAW
+    clock_gettime(CLOCK_MONOTONIC_RAW, &ts);
+#else
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+#endif
+    return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
+
+static int
+timing_compare(const void *a, const void *b)
 {
-    srand(42);
+    double x = *(const double *)a;
+    double y = *(const double *)b;
+    return (x > y) - (x < y);
 }
 
 static double
-random_double()
+timing_median(double *values, size_t count)
 {
-    return ((double)rand()) / ((double)RAND_MAX);
+    qsort(values, count, sizeof(double), timing_compare);
+    if (count % 2 == 1)
+    {
+        return values[count / 2];
+    }
+    return 0.5 * (values[count / 2 - 1] + values[count / 2]);
 }
 
 static void
-time_function_fp64(unop_fp64 func,
-                    double low,
-                    double high,
-                    size_t samples,
-                    size_t iters)
+timing_summarize(double *trial_ns, size_t trials, size_t samples,
+                 timing_result *result)
+{
+    result->trials = trials;
+    result->samples = samples;
+    result->median = timing_median(trial_ns, trials);
+    result->min = trial_ns[0];
+    result->max = trial_ns[trials - 1];
+
+    for (size_t t = 0; t < trials; t++)
+    {
+        trial_ns[t] = fabs(trial_ns[t] - result->median);
+    }
+    result->mad = timing_median(trial_ns, trials);
+}
+
+// Pins the calling thread to `cpu` for the duration of a measurement, a
+// negative cpu (or a platform without affinity) leaves it where it is
+typedef struct
+{
+    int pinned;
+#ifdef __linux__
+    cpu_set_t old;
+#endif
+} timing_affinity;
+
+static void
+timing_pin(int cpu, timing_affinity *saved)
+{
+    saved->pinned = 0;
+#ifdef __linux__
+    if (cpu < 0 || sched_getaffinity(0, sizeof(cpu_set_t), &saved->old) != 0)
+    {
+        return;
+    }
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    CPU_SET(cpu, &set);
+    saved->pinned = (sched_setaffinity(0, sizeof(cpu_set_t), &set) == 0);
+#else
+    (void)cpu;
+#endif
+}
+
+static void
+timing_unpin(timing_affinity *saved)
+{
+#ifdef __linux__
+    if (saved->pinned)
+    {
+        sched_setaffinity(0, sizeof(cpu_set_t), &saved->old);
+    }
+#endif
+    saved->pinned = 0;
+}
+
+// Inputs drawn from the same stream the error measurements use
+static double *
+timing_inputs_fp64(double low, double high, size_t samples)
 {
     assert(isfinite(low));
     assert(isfinite(high));
     assert(low < high);
     assert(samples > 0);
 
+    double *inputs = xmalloc(samples * sizeof(double));
     double span = high - low;
-    init_random_double();
-
-    clock_t start, end;
-    double cpu_time_used, avg_time_per_sample;
+    for (size_t i = 0; i < samples; i++)
+    {
+        inputs[i] = low + span * random_double_at(MEASUREMENT_SEED, i);
+    }
+    return inputs;
+}
 
-    start = clock();
+static void
+timing_consume_fp64(const double *outputs, size_t samples)
+{
+    double sum = 0.0;
+    for (size_t i = 0; i < samples; i++)
+    {
+        sum += outputs[i];
+    }
+    timing_sink = sum;
+}
 
-    for (size_t iter = 0; iter < iters; iter++)
+static void
+timing_pass_fp64(unop_fp64 func,
+                 const double *inputs,
+                 double *outputs,
+                 size_t samples,
+                 int mode,
+                 uint64_t mask)
+{
+    if (mode == TIMING_THROUGHPUT)
     {
         for (size_t i = 0; i < samples; i++)
         {
-            double sample = low + span * random_double();
-            double value = func(sample);
-            
+            outputs[i] = func(inputs[i]);
         }
+        return;
+    }
+
+    double y = 0;
+    for (size_t i = 0; i < samples; i++)
+    {
+        uint64_t x_bits, y_bits;
+        memcpy(&x_bits, &inputs[i], sizeof(x_bits));
+        memcpy(&y_bits, &y, sizeof(y_bits));
+        x_bits ^= y_bits & mask;
+        double x;
+        memcpy(&x, &x_bits, sizeof(x));
+        y = func(x);
+        outputs[i] = y;
     }
-    end = clock();
-    cpu_time_used = ((double)(end - start)) / CLOCKS_PER_SEC;
-    avg_time_per_sample = (double)((cpu_time_used / (iters * samples)) * MULT_ROUNDING_FACTOR);
-    printf("%a", avg_time_per_sample);
 }
 
+// Times `trials` passes of `func` over `samples` inputs, drawn once up front
+// from the same stream the error measurements use, in the given TIMING_ mode
+static void
+timing_fp64(unop_fp64 func,
+            double low,
+            double high,
+            size_t samples,
+            size_t trials,
+            size_t warmup,
+            int mode,
+            int cpu,
+            timing_result *result)
+{
+    assert(trials > 0);
+
+    double *inputs = timing_inputs_fp64(low, high, samples);
+    double *outputs = xmalloc(samples * sizeof(double));
+    double *trial_ns = xmalloc(trials * sizeof(double));
+
+    timing_affinity affinity;
+    timing_pin(cpu, &affinity);
+
+    uint64_t mask = (uint64_t)timing_chain_mask;
+    for (size_t w = 0; w < warmup; w++)
+    {
+        timing_pass_fp64(func, inputs, outputs, samples, mode, mask);
+    }
 
+    for (size_t t = 0; t < trials; t++)
+    {
+        uint64_t start = timing_now_ns();
+        timing_pass_fp64(func, inputs, outputs, samples, mode, mask);
+        uint64_t end = timing_now_ns();
+        trial_ns[t] = (double)(end - start) / (double)samples;
+    }
+
+    timing_unpin(&affinity);
+
+    timing_consume_fp64(outputs, samples);
+
+    timing_summarize(trial_ns, trials, samples, result);
+
+    xfree(inputs);
+    xfree(outputs);
+    xfree(trial_ns);
+}
+
+// Hardware counters per call over `passes` passes, counted apart from the
+// timing trials so reading them never shows up in a time
 static void
-time_function_fp32(unop_fp32 func,
-                    float low,
-                    float high,
+counters_fp64(unop_fp64 func,
+              double low,
+              double high,
+              size_t samples,
+              size_t passes,
+              int mode,
+              int cpu,
+              perf_result *result)
+{
+    assert(passes > 0);
+
+    double *inputs = timing_inputs_fp64(low, high, samples);
+    double *outputs = xmalloc(samples * sizeof(double));
+
+    timing_affinity affinity;
+    timing_pin(cpu, &affinity);
+
+    uint64_t mask = (uint64_t)timing_chain_mask;
+    for (size_t w = 0; w < TIMING_DEFAULT_WARMUP; w++)
+    {
+        timing_pass_fp64(func, inputs, outputs, samples, mode, mask);
+    }
+
+    perf_counters counters;
+    perf_open(&counters);
+    perf_start(&counters);
+    for (size_t p = 0; p < passes; p++)
+    {
+        timing_pass_fp64(func, inputs, outputs, samples, mode, mask);
+    }
+    perf_stop(&counters);
+
+    timing_unpin(&affinity);
+
+    perf_finish(&counters, (double)samples * (double)passes, result);
+    timing_consume_fp64(outputs, samples);
+
+    xfree(inputs);
+    xfree(outputs);
+}
+
+static double
+measure_time_fp64(unop_fp64 func,
+                  double low,
+                  double high,
+                  size_t samples,
+                  size_t iters)
+{
+    timing_result result;
+    timing_fp64(func, low, high, samples, iters, TIMING_DEFAULT_WARMUP,
+                TIMING_THROUGHPUT, -1, &result);
+    return result.median;
+}
+
+static void
+time_function_fp64(unop_fp64 func,
+                    double low,
+                    double high,
                     size_t samples,
                     size_t iters)
+{
+    printf("%a", measure_time_fp64(func, low, high, samples, iters));
+}
+
+
+// Inputs drawn from the same stream the error measurements use
+static float *
+timing_inputs_fp32(float low, float high, size_t samples)
 {
     assert(isfinite(low));
     assert(isfinite(high));
     assert(low < high);
     assert(samples > 0);
 
+    float *inputs = xmalloc(samples * sizeof(float));
     float span = high - low;
-    init_random_double();
-
-    clock_t start, end;
-    double cpu_time_used, avg_time_per_sample;
+    for (size_t i = 0; i < samples; i++)
+    {
+        inputs[i] = low + span * ((float) random_double_at(MEASUREMENT_SEED, i));
+    }
+    return inputs;
+}
 
-    start = clock();
+static void
+timing_consume_fp32(const float *outputs, size_t samples)
+{
+    double sum = 0.0;
+    for (size_t i = 0; i < samples; i++)
+    {
+        sum += outputs[i];
+    }
+    timing_sink = sum;
+}
 
-    for (size_t iter = 0; iter < iters; iter++)
+static void
+timing_pass_fp32(unop_fp32 func,
+                 const float *inputs,
+                 float *outputs,
+                 size_t samples,
+                 int mode,
+                 uint32_t mask)
+{
+    if (mode == TIMING_THROUGHPUT)
     {
         for (size_t i = 0; i < samples; i++)
         {
-            float sample = low + span * ((float) random_double());
-            float value = func(sample);
-            
+            outputs[i] = func(inputs[i]);
         }
+        return;
+    }
+
+    float y = 0;
+    for (size_t i = 0; i < samples; i++)
+    {
+        uint32_t x_bits, y_bits;
+        memcpy(&x_bits, &inputs[i], sizeof(x_bits));
+        memcpy(&y_bits, &y, sizeof(y_bits));
+        x_bits ^= y_bits & mask;
+        float x;
+        memcpy(&x, &x_bits, sizeof(x));
+        y = func(x);
+        outputs[i] = y;
     }
-    end = clock();
-    cpu_time_used = ((double)(end - start)) / CLOCKS_PER_SEC;
-    avg_time_per_sample = (double)((cpu_time_used / (iters * samples)) * MULT_ROUNDING_FACTOR);
-    printf("%a", avg_time_per_sample);
 }
+
+static void
+timing_fp32(unop_fp32 func,
+            float low,
+            float high,
+            size_t samples,
+            size_t trials,
+            size_t warmup,
+            int mode,
+            int cpu,
+            timing_result *result)
+{
+    assert(trials > 0);
+
+    float *inputs = timing_inputs_fp32(low, high, samples);
+    float *outputs = xmalloc(samples * sizeof(float));
+    double *trial_ns = xmalloc(trials * sizeof(double));
+
+    timing_affinity affinity;
+    timing_pin(cpu, &affinity);
+
+    uint32_t mask = (uint32_t)timing_chain_mask;
+    for (size_t w = 0; w < warmup; w++)
+    {
+        timing_pass_fp32(func, inputs, outputs, samples, mode, mask);
+    }
+
+    for (size_t t = 0; t < trials; t++)
+    {
+        uint64_t start = timing_now_ns();
+        timing_pass_fp32(func, inputs, outputs, samples, mode, mask);
+        uint64_t end = timing_now_ns();
+        trial_ns[t] = (double)(end - start) / (double)samples;
+    }
+
+    timing_unpin(&affinity);
+
+    timing_consume_fp32(outputs, samples);
+
+    timing_summarize(trial_ns, trials, samples, result);
+
+    xfree(inputs);
+    xfree(outputs);
+    xfree(trial_ns);
+}
+
+// Hardware counters per call over `passes` passes, counted apart from the
+// timing trials so reading them never shows up in a time
+static void
+counters_fp32(unop_fp32 func,
+              float low,
+              float high,
+              size_t samples,
+              size_t passes,
+              int mode,
+              int cpu,
+              perf_result *result)
+{
+    assert(passes > 0);
+
+    float *inputs = timing_inputs_fp32(low, high, samples);
+    float *outputs = xmalloc(samples * sizeof(float));
+
+    timing_affinity affinity;
+    timing_pin(cpu, &affinity);
+
+    uint32_t mask = (uint32_t)timing_chain_mask;
+    for (size_t w = 0; w < TIMING_DEFAULT_WARMUP; w++)
+    {
+        timing_pass_fp32(func, inputs, outputs, samples, mode, mask);
+    }
+
+    perf_counters counters;
+    perf_open(&counters);
+    perf_start(&counters);
+    for (size_t p = 0; p < passes; p++)
+    {
+        timing_pass_fp32(func, inputs, outputs, samples, mode, mask);
+    }
+    perf_stop(&counters);
+
+    timing_unpin(&affinity);
+
+    perf_finish(&counters, (double)samples * (double)passes, result);
+    timing_consume_fp32(outputs, samples);
+
+    xfree(inputs);
+    xfree(outputs);
+}
+
+static double
+measure_time_fp32(unop_fp32 func,
+                  float low,
+                  float high,
+                  size_t samples,
+                  size_t iters)
+{
+    timing_result result;
+    timing_fp32(func, low, high, samples, iters, TIMING_DEFAULT_WARMUP,
+                TIMING_THROUGHPUT, -1, &result);
+    return result.median;
+}
+
+static void
+time_function_fp32(unop_fp32 func,
+                    float low,
+                    float high,
+                    size_t samples,
+                    size_t iters)
+{
+    printf("%a", measure_time_fp32(func, low, high, samples, iters));
+}
+
+#endif // #ifndef TIMING_MEASUREMENT_H
@@ -0,0 +1,23 @@
+import fpcore
+import lambdas
+
+from interval import Interval
+from lambdas import *
+from numeric_types import FP64
+
+lambda_function_name = "dsl_table_atan"
+
+input_ranges = [Interval("1", "2")]
+
+numeric_type = FP64
+
+reference_function_name = "libm_table_atan"
+reference_code = "\n".join([
+    "#include <math.h>",
+    "double libm_table_atan(double x) { return atan(x); }",
+])
+
+atan = fpcore.parse("(FPCore (x) (atan x))")
+
+# A degree 7 polynomial around the center of each of the 32 entries
+lambda_expression = TablePolynomial(atan, Interval("1", "2"), 5, 7)
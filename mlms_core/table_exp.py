@@ -0,0 +1,44 @@
+import fpcore
+import lambdas
+
+from interval import Interval
+from lambdas import *
+from numeric_types import FP64
+
+lambda_function_name = "dsl_table_exp"
+
+input_ranges = [Interval("-1", "1"),
+                Interval("(- (/ 1 32))", "(/ 1 32)")]
+
+numeric_type = FP64
+
+reference_function_name = "libm_table_exp"
+reference_code = "\n".join([
+    "#include <math.h>",
+    "double libm_table_exp(double x) { return exp(x); }",
+])
+
+exp = fpcore.parse("(FPCore (x) (exp x))")
+
+# 32 entries of width 1/16 leave r in [-1/32, 1/32], where the Taylor
+# polynomial of degree 7 is within 2**-55 of exp
+exp_poly = \
+    Horner(
+        FixedPolynomial(
+            exp,
+            Interval("(- (/ 1 32))", "(/ 1 32)"),
+            [0, 1, 2, 3, 4, 5, 6, 7],
+            ["1",
+             "1",
+             "0.5",
+             "0.166666666666666666667",
+             "0.0416666666666666666667",
+             "0.00833333333333333333333",
+             "0.00138888888888888888889",
+             "0.000198412698412698412698"]))
+
+lambda_expression = \
+    TableReduce(exp_poly,
+                Interval("-1", "1"),
+                5,
+                "additive")
@@ -0,0 +1,49 @@
+import fpcore
+import lambdas
+
+from interval import Interval
+from lambdas import *
+from numeric_types import FP64
+
+lambda_function_name = "dsl_table_log"
+
+input_ranges = [Interval("0.75", "1.5"),
+                Interval("0.984375", "1.0078125")]
+
+numeric_type = FP64
+
+reference_function_name = "libm_table_log"
+reference_code = "\n".join([
+    "#include <math.h>",
+    "double libm_table_log(double x) { return log(x); }",
+])
+
+log = fpcore.parse("(FPCore (x) (log x))")
+x_to_f_remap = fpcore.parse("(FPCore (x) (- x 1))")
+f_log = fpcore.parse("(FPCore (f) (log (+ f 1)))")
+
+# 32 entries of width 3/128 leave x/c within 1/64 of 1, the entry holding 1
+# uses c = 1. There the Taylor polynomial of degree 10 is within 2**-54 of
+# log(1 + f) relative to f
+f_poly = \
+    Horner(
+        FixedPolynomial(
+            f_log,
+            Interval("(- (/ 1 64))", "(/ 1 64)"),
+            [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            ["1",
+             "-0.5",
+             "0.333333333333333333333",
+             "-0.25",
+             "0.2",
+             "-0.166666666666666666667",
+             "0.142857142857142857143",
+             "-0.125",
+             "0.111111111111111111111",
+             "-0.1"]))
+
+lambda_expression = \
+    TableReduce(Recharacterize(log, x_to_f_remap, f_poly),
+                Interval("0.75", "1.5"),
+                5,
+                "multiplicative")
@@ -1,4 +1,5 @@
 
 
 from .result import Result, FailedGenError
-from .dirtyinfnorm import DirtyInfNorm
\ No newline at end of file
+from .dirtyinfnorm import (DirtyInfNorm, DirtyInfNormBatch,
+                           FailedDirtyInfNorm, TimeoutDirtyInfNorm)
\ No newline at end of file
@@ -1,15 +1,13 @@
 
 
 import json
-from os import path
-import shlex
-import subprocess
-import tempfile
 import fpcore
 from interval import Interval
 from utils.logging import Logger
 from utils.timing import Timer
 
+from . import worker
+
 logger = Logger(level=Logger.HIGH, color=Logger.green)
 timer = Timer()
 
@@ -18,20 +16,31 @@ TIMEOUT = 60 * 5
 
 
 class TimeoutDirtyInfNorm(Exception):
-    def __init__(self, func, domain):
+    def __init__(self, func, domain, stdout=""):
         self.func = func
         self.domain = domain
+        self.stdout = stdout
 
     def __str__(self):
         return "\n".join([f"Func: {self.func}",
                           f"Domain: {self.domain}"])
 
 
-def DirtyInfNorm(poly: fpcore.ast.ASTNode,
-                 fpc: fpcore.ast.ASTNode,
-                 domain: Interval,
-                 prec: int = 512,
-                 points: int = 501):
+class FailedDirtyInfNorm(Exception):
+    def __init__(self, func, domain, stderr):
+        self.func = func
+        self.domain = domain
+        self.stderr = stderr
+
+    def __str__(self):
+        return "\n".join([f"Func: {self.func}",
+                          f"Domain: {self.domain}",
+                          f"Stderr: {self.stderr}"])
+
+
+def _dirtyinfnorm_lines(poly: fpcore.ast.ASTNode,
+                       fpc: fpcore.ast.ASTNode,
+                       domain: Interval):
     poly_vars = list(poly.get_variables())
     assert len(poly_vars) == 1
     poly_var = poly_vars[0]
@@ -47,13 +56,44 @@ def DirtyInfNorm(poly: fpcore.ast.ASTNode,
     sollya_fpc = fpc.to_sollya()
     sollya_inf = domain.inf.to_sollya()
     sollya_sup = domain.sup.to_sollya()
-    lines = [
-        f"prec = {prec}!;",
-        f"points = {points}!;",
+    return [
         f"p = {sollya_poly};",
         f"f = {sollya_fpc};",
         f"I = [{sollya_inf};{sollya_sup}];",
         f"din = dirtyinfnorm(f-p, I);",
+    ]
+
+
+def _run_dirtyinfnorm(query: str, timeout: float, func, domain):
+    logger.blog("Query", query)
+
+    # Call Sollya
+    try:
+        stdout, stderr, returncode = worker.run_query(query, timeout)
+    except worker.SollyaTimeout as e:
+        logger.warning("Timeout reached, Sollya was restarted")
+        raise TimeoutDirtyInfNorm(func, domain, e.stdout)
+
+    logger.blog("stdout", stdout)
+    if stderr != "":
+        logger.warning("Sollya printed to stderr")
+        logger.blog("stderr", stderr)
+    logger("Return code: {}", returncode)
+    if returncode != 0:
+        raise FailedDirtyInfNorm(func, domain, stderr)
+
+    return json.loads(stdout)
+
+
+def DirtyInfNorm(poly: fpcore.ast.ASTNode,
+                 fpc: fpcore.ast.ASTNode,
+                 domain: Interval,
+                 prec: int = 512,
+                 points: int = 501):
+    lines = [
+        f"prec = {prec}!;",
+        f"points = {points}!;",
+        *_dirtyinfnorm_lines(poly, fpc, domain),
         'print("{");',
         'print("  \\"din\\" : "@din);',
         'print("}");',
@@ -61,44 +101,65 @@ def DirtyInfNorm(poly: fpcore.ast.ASTNode,
     ]
     query = "\n".join(lines)
 
-    query_name = "din.sollya"
-    with tempfile.TemporaryDirectory("w") as my_dir:
-
-        # Write out the query
-        with open(path.join(my_dir, query_name), "w") as f:
-            f.write(query)
-            f.flush()
-
-        # Put together the Sollya command
-        run_command = "sollya --flush --warnonstderr {}".format(query_name)
-        logger("Command: '{}'", run_command)
-        logger.blog("Query", query)
-
-        # Call Sollya
-        with subprocess.Popen(shlex.split(run_command),
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE,
-                              cwd=my_dir) as p:
-
-            # Make sure that the run is complete and grab output
-            # todo: should there be a timeout? yes....
-            try:
-                raw_out, raw_err = p.communicate(timeout=TIMEOUT)
-            except subprocess.TimeoutExpired:
-                p.kill()
-                logger.warning("Timeout reached, killing Sollya")
-                raise TimeoutDirtyInfNorm(fpc_or_expr,
-                                              domain)
-
-            stdout = raw_out.decode("utf8").strip()
-            stderr = raw_err.decode("utf8").strip()
-            returncode = p.returncode
-
-            logger.blog("stdout", stdout)
-            if stderr != "":
-                logger.warning("Sollya printed to stderr")
-                logger.blog("stderr", stderr)
-            logger("Return code: {}", returncode)
-
-    data = json.loads(stdout)
+    data = _run_dirtyinfnorm(query, TIMEOUT, fpc, domain)
     return data["din"]
+
+
+def DirtyInfNormBatch(triples: list,
+                      prec: int = 512,
+                      points: int = 501):
+    """
+    Run DirtyInfNorm on a list of (poly, fpc, domain) triples with a single
+    Sollya request, the results are returned in the same order.
+    A request gets TIMEOUT seconds like a single DirtyInfNorm. When it runs
+    out the results printed so far are kept, the triple that was running
+    gets None, and the triples after it go in a new request.
+    """
+    results = list()
+    while len(results) < len(triples):
+        rest = triples[len(results):]
+        try:
+            results.extend(_dirtyinfnorm_batch(rest, prec, points))
+        except TimeoutDirtyInfNorm as e:
+            done = _printed_results(e.stdout)[:len(rest)]
+            results.extend(done)
+            if len(done) == len(rest):
+                break
+            _, fpc, domain = rest[len(done)]
+            logger.warning("DirtyInfNorm timed out for {} on {}", fpc, domain)
+            results.append(None)
+    return results
+
+
+def _printed_results(stdout: str):
+    # The lines between "[" and the reply of the triple that timed out
+    results = list()
+    for line in stdout.splitlines()[1:]:
+        try:
+            results.append(json.loads(line.strip().rstrip(",")))
+        except json.decoder.JSONDecodeError:
+            break
+    return results
+
+
+def _dirtyinfnorm_batch(triples: list, prec: int, points: int):
+    lines = [
+        f"prec = {prec}!;",
+        f"points = {points}!;",
+        'print("[");',
+    ]
+    for i, (poly, fpc, domain) in enumerate(triples):
+        lines.extend(_dirtyinfnorm_lines(poly, fpc, domain))
+        sep = "," if i != len(triples) - 1 else ""
+        lines.append(f'print("  "@din@"{sep}");')
+    lines.extend([
+        'print("]");',
+        'quit;'
+    ])
+    query = "\n".join(lines)
+
+    funcs = [fpc for _, fpc, _ in triples]
+    domains = [domain for _, _, domain in triples]
+    data = _run_dirtyinfnorm(query, TIMEOUT, funcs, domains)
+    assert len(data) == len(triples)
+    return data
@@ -1,22 +1,28 @@
 
 
 import json
-import shlex
-import subprocess
-import tempfile
-from os import path
 
 import fpcore
 from interval import Interval
+from utils.disk_cache import DiskCache, normalized_hash
 from utils.logging import Logger
 from utils.timing import Timer
 
+from . import worker
+
 logger = Logger(level=Logger.HIGH, color=Logger.green)
 timer = Timer()
 
 
 TIMEOUT = 60 * 5
 CACHE = dict()
+DISK_CACHE = DiskCache("sollya_result")
+
+# What `Result._try_cache` found, a negative hit is a query that is known to
+# fail and need not be run again
+CACHE_HIT = "hit"
+CACHE_NEGATIVE = "negative"
+CACHE_MISS = "miss"
 
 
 class FailedGenError(Exception):
@@ -57,43 +63,32 @@ class Result():
         timer.start()
 
         # Default query
-        self._generate_query()
-        have_res = self._try_cache()
-        if not have_res:
-            have_res = self._try_run()
+        have_res = self._try_query()
 
         # Try [inf - small, sup]
         if not have_res:
             logger.warning("Sollya call failed, trying [inf - small, sup] ")
             self.domain = Interval(domain.inf - fpcore.ast.Number("0.00390625"),
                                   domain.sup)
-            self._generate_query()
-            have_res = self._try_cache()
-        if not have_res:
-            have_res = self._try_run()
+            have_res = self._try_query()
 
         # Try [inf, sup + small]
         if not have_res:
             logger.warning("Sollya call failed, trying [inf, sup + small]")
             self.domain = Interval(domain.inf,
                                   domain.sup + fpcore.ast.Number("0.00390625"))
-            self._generate_query()
-            have_res = self._try_cache()
-        if not have_res:
-            have_res = self._try_run()
+            have_res = self._try_query()
 
         # Try [inf-small, sup + small]
         if not have_res:
             logger.warning("Sollya call failed, trying [inf - small, sup + small]")
             self.domain = Interval(domain.inf - fpcore.ast.Number("0.00390625"),
                                   domain.sup + fpcore.ast.Number("0.00390625"))
-            self._generate_query()
-            have_res = self._try_cache()
-        if not have_res:
-            have_res = self._try_run()
+            have_res = self._try_query()
 
         el = timer.stop()
         logger("Sollya time: {} sec", el)
+        logger("Sollya disk cache: {}", DISK_CACHE.stats())
 
         if not have_res:
             raise FailedGenError(func, domain)
@@ -105,28 +100,54 @@ class Result():
                                                    repr(self.numeric_type.name),
                                                    repr(self.config))
 
+    def _try_query(self):
+        """
+        Answer the query for the current domain from the caches, running
+        Sollya only when neither has seen it
+        """
+        self._generate_query()
+        state = self._try_cache()
+        if state == CACHE_MISS:
+            return self._try_run()
+        return state == CACHE_HIT
+
     def _try_cache(self):
-        if self.query in CACHE:
+        if self.query not in CACHE:
+            found, cached = DISK_CACHE.lookup(self.query_hash)
+            if not found:
+                return CACHE_MISS
+            logger("Used disk cache")
+            CACHE[self.query] = cached
+        else:
             logger("Used cache")
-            cached = CACHE[self.query]
-            if cached == None:
-                return False
-            self.stdout = cached.stdout
-            self.stderr = cached.stderr
-            self.returncode = cached.returncode
-            self.coefficients = cached.coefficients
-            return True
-        return False
+        cached = CACHE[self.query]
+        if cached == None:
+            logger("Query is known to fail")
+            return CACHE_NEGATIVE
+        self.stdout = cached["stdout"]
+        self.stderr = cached["stderr"]
+        self.returncode = cached["returncode"]
+        self.coefficients = cached["coefficients"]
+        return CACHE_HIT
 
     def _try_run(self):
         try:
             self._run()
             self._parse_output()
-            CACHE[self.query] = self
-            return True
+            cached = {
+                "stdout": self.stdout,
+                "stderr": self.stderr,
+                "returncode": self.returncode,
+                "coefficients": self.coefficients,
+            }
         except json.decoder.JSONDecodeError:
-            CACHE[self.query] = None
-            return False
+            cached = None
+        CACHE[self.query] = cached
+        # A timeout says more about machine load than the query, so only keep
+        # it for this process
+        if self.returncode != -1:
+            DISK_CACHE.store(self.query_hash, cached)
+        return cached is not None
 
     def _generate_query(self):
         monomials_str = ", ".join([str(m) for m in self.monomials])
@@ -166,48 +187,29 @@ class Result():
         lines.extend(more_lines)
 
         self.query = "\n".join(lines)
+        self.query_hash = normalized_hash(self.query)
 
     def _run(self):
-        query_name = "query.sollya"
-        with tempfile.TemporaryDirectory("w") as my_dir:
-
-            # Write out the query
-            with open(path.join(my_dir, query_name), "w") as f:
-                f.write(self.query)
-                f.flush()
-
-            # Put together the Sollya command
-            run_command = "sollya --flush --warnonstderr {}".format(query_name)
-            logger("Command: '{}'", run_command)
-            logger.blog("Query", self.query)
-
-            # Call Sollya
-            with subprocess.Popen(shlex.split(run_command),
-                                  stdout=subprocess.PIPE,
-                                  stderr=subprocess.PIPE,
-                                  cwd=my_dir) as p:
-
-                # Make sure that the run is complete and grab output
-                # todo: should there be a timeout? yes....
-                try:
-                    raw_out, raw_err = p.communicate(timeout=TIMEOUT)
-                except subprocess.TimeoutExpired:
-                    p.kill()
-                    logger.warning("Timeout reached, killing Sollya")
-                    self.stdout = ""
-                    self.stderr = ""
-                    self.returncode = -1
-                    return
-                self.stdout = raw_out.decode("utf8").strip()
-                self.stderr = raw_err.decode("utf8").strip()
-                self.returncode = p.returncode
-                self._compress_stderr()
-
-                logger.blog("stdout", self.stdout)
-                if self.stderr != "":
-                    logger.warning("Sollya printed to stderr")
-                    logger.blog("stderr", self.stderr)
-                logger("Return code: {}", self.returncode)
+        logger.blog("Query", self.query)
+
+        # Call Sollya
+        try:
+            stdout, stderr, returncode = worker.run_query(self.query, TIMEOUT)
+        except worker.SollyaTimeout:
+            self.stdout = ""
+            self.stderr = ""
+            self.returncode = -1
+            return
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self._compress_stderr()
+
+        logger.blog("stdout", self.stdout)
+        if self.stderr != "":
+            logger.warning("Sollya printed to stderr")
+            logger.blog("stderr", self.stderr)
+        logger("Return code: {}", self.returncode)
 
     def _compress_stderr(self):
         warning_0 = "\nWarning: at least one of the given expressions or a subexpression is not correctly typed\nor its evaluation has failed because of some error on a side-effect."
@@ -253,6 +255,8 @@ class Result():
         self.stderr = self.stderr.replace(find, replace)
 
     def _parse_output(self):
+        if self.returncode != 0:
+            raise json.JSONDecodeError("Sollya reported an error", "stdin", -1)
         data = json.loads(self.stdout)
         for coeff in data["coefficients"]:
             if coeff == "NaN":
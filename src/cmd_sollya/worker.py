@@ -0,0 +1,269 @@
+import atexit
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+
+from utils.logging import Logger
+
+logger = Logger(level=Logger.HIGH, color=Logger.green)
+
+
+# Number of interpreters kept alive per process
+POOL_SIZE = int(os.environ.get("MEGALIBM_SOLLYA_WORKERS", "1"))
+
+SOLLYA_COMMAND = "sollya --flush --warnonstderr"
+
+# Printed around every request so the reply can be picked out of the stream
+BEGIN_MARKER = "<<<megalibm-begin-{}>>>"
+END_MARKER = "<<<megalibm-end-{}>>>"
+
+# After an error the end marker may never come, say after a syntax error
+# swallows it, so only wait this long for it
+ERROR_GRACE = 1.0
+
+# How often stderr is checked for errors while waiting for the reply
+POLL_INTERVAL = 0.05
+
+
+class SollyaTimeout(Exception):
+    def __init__(self, query, timeout, stdout=""):
+        self.query = query
+        self.timeout = timeout
+        # What the query printed before it ran out of time
+        self.stdout = stdout
+
+    def __str__(self):
+        return f"Sollya did not answer within {self.timeout} sec"
+
+
+def _is_error(line: str):
+    return line.startswith("Error") or "syntax error" in line
+
+
+def _strip_quit(query: str):
+    # A `quit;` would end the interpreter instead of the request
+    lines = [l for l in query.splitlines() if l.strip() != "quit;"]
+    return "\n".join(lines)
+
+
+class SollyaWorker():
+    """
+    A single long lived Sollya interpreter driven over stdin/stdout.
+
+    Every request is sent as
+      restart; print(begin); <query> print(end);
+    and the reply is the stdout between the two markers.
+    `restart` puts the interpreter back in its initial state so requests can
+    not see each other's variables or display settings.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.process = None
+        self.stdout_lines = None
+        self.stderr_lines = None
+        self._start()
+
+    def _start(self):
+        logger("Starting Sollya worker: '{}'", SOLLYA_COMMAND)
+        self.process = subprocess.Popen(shlex.split(SOLLYA_COMMAND),
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE,
+                                        text=True,
+                                        bufsize=1)
+        self.stdout_lines = queue.Queue()
+        self.stderr_lines = queue.Queue()
+        for stream, lines in [(self.process.stdout, self.stdout_lines),
+                              (self.process.stderr, self.stderr_lines)]:
+            reader = threading.Thread(target=self._pump,
+                                      args=(stream, lines),
+                                      daemon=True)
+            reader.start()
+
+    @staticmethod
+    def _pump(stream, lines):
+        for line in stream:
+            lines.put(line.rstrip("\n"))
+        # None marks EOF, the interpreter has exited
+        lines.put(None)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def restart(self):
+        self.close()
+        self._start()
+
+    def close(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write("quit;\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def _drain_stderr(self):
+        lines = list()
+        while True:
+            try:
+                line = self.stderr_lines.get_nowait()
+            except queue.Empty:
+                break
+            if line is not None:
+                lines.append(line)
+        return "\n".join(lines).strip()
+
+    def run(self, query: str, timeout: float):
+        """
+        Returns a tuple of (stdout, stderr, returncode) like a one-shot run.
+        The returncode is 1 when Sollya reported an error, the interpreter is
+        then restarted so the error can not leak into later requests.
+        Raises SollyaTimeout, after restarting the interpreter, if no answer
+        arrives in time.
+        """
+        if not self.alive():
+            logger.warning("Sollya worker died, restarting")
+            self.restart()
+
+        self.count += 1
+        begin = BEGIN_MARKER.format(self.count)
+        end = END_MARKER.format(self.count)
+        request = "\n".join([
+            "restart;",
+            f'print("{begin}");',
+            _strip_quit(query),
+            f'print("{end}");',
+            "",
+        ])
+
+        # Anything left over belongs to an earlier request
+        self._drain_stderr()
+
+        try:
+            self.process.stdin.write(request)
+            self.process.stdin.flush()
+        except OSError:
+            logger.warning("Unable to write to Sollya worker, restarting")
+            self.restart()
+            return "", self._drain_stderr(), -1
+
+        deadline = time.monotonic() + timeout
+        out_lines = list()
+        err_parts = list()
+        error_deadline = None
+        seen_begin = False
+        while True:
+            err = self._drain_stderr()
+            if err != "":
+                err_parts.append(err)
+                if error_deadline is None and any(_is_error(l)
+                                                   for l in err.splitlines()):
+                    error_deadline = time.monotonic() + ERROR_GRACE
+
+            now = time.monotonic()
+            if error_deadline is not None and now > error_deadline:
+                logger.warning("Sollya reported an error, restarting worker")
+                self.restart()
+                return "\n".join(out_lines).strip(), "\n".join(err_parts), 1
+            if now > deadline:
+                logger.warning("Timeout reached, restarting Sollya worker")
+                self.restart()
+                raise SollyaTimeout(query, timeout,
+                                    "\n".join(out_lines).strip())
+
+            try:
+                line = self.stdout_lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            # The interpreter crashed part way through
+            if line is None:
+                logger.warning("Sollya worker exited, restarting")
+                err_parts.append(self._drain_stderr())
+                self.restart()
+                return "\n".join(out_lines).strip(), "\n".join(err_parts), -1
+
+            if line == begin:
+                seen_begin = True
+            elif line == end:
+                break
+            elif seen_begin:
+                out_lines.append(line)
+
+        err_parts.append(self._drain_stderr())
+        stderr = "\n".join(p for p in err_parts if p != "")
+        if any(_is_error(l) for l in stderr.splitlines()):
+            logger.warning("Sollya reported an error, restarting worker")
+            self.restart()
+            return "\n".join(out_lines).strip(), stderr, 1
+        return "\n".join(out_lines).strip(), stderr, 0
+
+
+class SollyaPool():
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = max(size, 1)
+        self.pid = os.getpid()
+        self.idle = queue.Queue()
+        self.workers = list()
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if len(self.workers) < self.size:
+                worker = SollyaWorker()
+                self.workers.append(worker)
+                return worker
+        return self.idle.get()
+
+    def run(self, query: str, timeout: float):
+        worker = self._acquire()
+        try:
+            return worker.run(query, timeout)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        # Only the process that started the interpreters may stop them
+        if self.pid != os.getpid():
+            return
+        for worker in self.workers:
+            worker.close()
+        self.workers = list()
+
+
+_POOL = None
+
+
+def get_pool():
+    """
+    The pool for this process, forked children get their own interpreters
+    instead of sharing pipes with the parent's
+    """
+    global _POOL
+    if _POOL is None or _POOL.pid != os.getpid():
+        _POOL = SollyaPool()
+    return _POOL
+
+
+def run_query(query: str, timeout: float):
+    return get_pool().run(query, timeout)
+
+
+@atexit.register
+def _close_pool():
+    if _POOL is not None:
+        _POOL.close()
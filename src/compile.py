@@ -1,15 +1,53 @@
 
+import hashlib
+import os
 from os import path
+import platform
 import shlex
 import sys
 import subprocess
 from utils import Logger
+from utils.disk_cache import DEFAULT_CACHE_DIR
 
 logger = Logger(level=Logger.HIGH, color=Logger.green)
 
 THIS_LOC = path.abspath(__file__)
 SRC_DIR = path.split(THIS_LOC)[0]
 GIT_DIR = path.split(SRC_DIR)[0]
+INCLUDE_DIR = path.join(GIT_DIR, "include")
+SHARED_LIBRARY_DIR = path.join(DEFAULT_CACHE_DIR, "shared_objects")
+
+# Defaults for measurement libraries
+DEFAULT_COMPILER = "clang"
+DEFAULT_FLAGS = ["-O3", "-mtune=native", "-fno-builtin", "-DNDEBUG"]
+DEFAULT_LINK_FLAGS = ["-lmpfr", "-lgmp", "-lm"]
+
+
+def fma_flags():
+    """
+    Flags that let explicit fma in generated code become an instruction,
+    without them it is a call to the correctly rounded libm fma.
+    Only x86 needs them, other targets with an fma have it in their base
+    instruction set.
+    """
+    if platform.machine() not in {"x86_64", "AMD64"}:
+        return []
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            has_fma = " fma " in f.read().replace("\n", " ")
+    except OSError:
+        has_fma = False
+    return ["-mfma"] if has_fma else []
+
+
+FMA_FLAGS = fma_flags()
+
+# Code is compiled as written, a*b + c is never contracted into an fma, so
+# results do not depend on the compiler or its defaults
+REPRODUCIBLE_FLAGS = DEFAULT_FLAGS + ["-ffp-contract=off"] + FMA_FLAGS
+
+# Version strings by compiler, so it is only asked once per process
+COMPILER_VERSIONS = dict()
 
 def compile_file(filename: str,
                  compiler: str = None,
@@ -81,3 +119,96 @@ def link_files(filenames: list,
         sys.exit(1)
 
     return binary_name
+
+
+def include_hash():
+    """
+    Hash of all the headers in include, these are part of every compile
+    """
+    hasher = hashlib.sha256()
+    for fname in sorted(os.listdir(INCLUDE_DIR)):
+        hasher.update(fname.encode("utf8"))
+        with open(path.join(INCLUDE_DIR, fname), "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def compiler_version(compiler: str = None):
+    """
+    First line of `compiler --version`, or an empty string if it can not be
+    run
+    """
+    if compiler is None:
+        compiler = DEFAULT_COMPILER
+    if compiler not in COMPILER_VERSIONS:
+        try:
+            p = subprocess.run([compiler, "--version"],
+                               capture_output=True, text=True)
+            version = p.stdout.strip().split("\n")[0]
+        except OSError:
+            version = ""
+        COMPILER_VERSIONS[compiler] = version
+    return COMPILER_VERSIONS[compiler]
+
+
+def compile_shared_library(c_source: str,
+                           compiler: str = None,
+                           flags: list = None,
+                           link_flags: list = None):
+    """
+    Compile and link c_source into a shared library and return its path.
+    Libraries are kept in the cache directory under a hash of the source,
+    headers, compiler and flags so the same code is only ever built once.
+    """
+    # Defaults
+    if compiler is None:
+        compiler = DEFAULT_COMPILER
+    if flags is None:
+        flags = list(DEFAULT_FLAGS)
+    if link_flags is None:
+        link_flags = list(DEFAULT_LINK_FLAGS)
+    flags = ["-fPIC", "-shared", "-pthread", f"-I{INCLUDE_DIR}"] + flags
+
+    # brew puts things in weird places
+    if path.exists("/opt/homebrew/include"):
+        flags.insert(0, "-I/opt/homebrew/include")
+    if path.exists("/opt/homebrew/lib"):
+        link_flags = ["-L/opt/homebrew/lib"] + link_flags
+
+    hasher = hashlib.sha256()
+    for part in [compiler, *flags, *link_flags, include_hash(), c_source]:
+        hasher.update(part.encode("utf8"))
+        hasher.update(b"\0")
+    key = hasher.hexdigest()
+
+    os.makedirs(SHARED_LIBRARY_DIR, exist_ok=True)
+    libname = path.join(SHARED_LIBRARY_DIR, f"lib_{key}.so")
+    if path.exists(libname):
+        logger("Reusing shared library: {}", libname)
+        return libname
+
+    # Build under temporary names so concurrent builders never see a
+    # partially written source or library
+    filename = path.join(SHARED_LIBRARY_DIR, f"lib_{key}.{os.getpid()}.c")
+    with open(filename, "w") as f:
+        f.write(c_source)
+    tmpname = path.join(SHARED_LIBRARY_DIR, f"lib_{key}.{os.getpid()}.so")
+    command = "{} {} {} {} -o {}".format(compiler,
+                                         " ".join(flags),
+                                         filename,
+                                         " ".join(link_flags),
+                                         tmpname)
+
+    p = subprocess.run(shlex.split(command), capture_output=True, text=True)
+
+    if p.returncode != 0:
+        logger.error("Shared library command failed")
+        logger.error("command: '{}'", command)
+        logger.error("stdout:\n{}", p.stdout)
+        logger.error("stderr:\n{}", p.stderr)
+        sys.exit(1)
+
+    os.replace(filename, path.join(SHARED_LIBRARY_DIR, f"lib_{key}.c"))
+    os.replace(tmpname, libname)
+
+    return libname
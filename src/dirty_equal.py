@@ -4,10 +4,20 @@ from interval import Interval
 from utils import Timer, Logger
 
 import mpmath
+import numpy
 
 logger = Logger(Logger.HIGH, color=Logger.blue, def_color=Logger.cyan)
 timer = Timer()
 
+# Points screened in float64 before any high precision work
+PREFILTER_SAMPLES = 4_096
+
+# Float64 results further apart than this (relative) are suspicious
+PREFILTER_TOLERANCE = 2.0**-20
+
+# Suspicious points re-checked at high precision, worst first
+PREFILTER_CONFIRM = 8
+
 
 def dirty_equal(a: fpcore.ast.ASTNode,
                 b: fpcore.ast.ASTNode,
@@ -40,6 +50,11 @@ def dirty_equal(a: fpcore.ast.ASTNode,
         raise ValueError(msg)
     variable_name = a_vars.pop()
 
+    # Lower both once instead of walking the trees at every point
+    a_expr, b_expr = a, b
+    a = a.compile([variable_name])
+    b = b.compile([variable_name])
+
     # 1k of bit is enough precision for anyone, right?
     old_prec = mpmath.mp.prec
     mpmath.mp.prec = 1024
@@ -58,6 +73,15 @@ def dirty_equal(a: fpcore.ast.ASTNode,
         timer.stop()
         raise ValueError("Domain was upside down")
 
+    # Cheap float64 screen, a suspicious point only refutes equality once
+    # the high precision check agrees
+    for point in float_suspects(a_expr, b_expr, variable_name, inf, sup):
+        if not try_point(a, b, variable_name, point):
+            mpmath.mp.prec = old_prec
+            elapsed = timer.stop()
+            logger("Time to refute equality in prefilter: {} sec", elapsed)
+            return False
+
     # Test the endpoints (this gets messed up with infinity)
     if not try_point(a, b, variable_name, inf):
         timer.stop()
@@ -93,13 +117,61 @@ def dirty_equal(a: fpcore.ast.ASTNode,
     return True
 
 
-def try_point(a: fpcore.ast.ASTNode,
-              b: fpcore.ast.ASTNode,
+def float_suspects(a: fpcore.ast.ASTNode,
+                   b: fpcore.ast.ASTNode,
+                   name: str,
+                   inf: mpmath.mpf,
+                   sup: mpmath.mpf) -> list:
+    """
+    Evaluate both expressions in float64 over many points and return the
+    points (as mpf) where they clearly disagree, most different first.
+    Returns an empty list when the expressions can not be vectorized.
+    """
+    try:
+        a_vec = a.compile([name], backend="numpy")
+        b_vec = b.compile([name], backend="numpy")
+    except NotImplementedError:
+        return list()
+
+    low = float(inf)
+    high = float(sup)
+    points = numpy.linspace(low, high, PREFILTER_SAMPLES)
+    a_out = a_vec(points)
+    b_out = b_vec(points)
+
+    with numpy.errstate(all="ignore"):
+        abs_diff = numpy.abs(a_out - b_out)
+        scale = numpy.maximum(numpy.abs(a_out), numpy.abs(b_out))
+        rel_diff = abs_diff / scale
+
+    # Only finite disagreements count, overflow and domain errors in float64
+    # say nothing about the real functions
+    both_finite = numpy.isfinite(a_out) & numpy.isfinite(b_out)
+    suspect = both_finite & (rel_diff > PREFILTER_TOLERANCE)
+    indices = numpy.nonzero(suspect)[0]
+    if len(indices) == 0:
+        return list()
+
+    worst = indices[numpy.argsort(-rel_diff[indices])]
+    # Rounding the endpoints to float64 can step just outside the domain
+    suspects = [mpmath.mpf(float(points[i])) for i in worst]
+    suspects = [p for p in suspects if inf <= p <= sup]
+    return suspects[:PREFILTER_CONFIRM]
+
+
+def try_point(a,
+              b,
               name: str,
               point: mpmath.mpf) -> bool:
+    # Either expressions or their compiled forms are accepted
+    if isinstance(a, fpcore.ast.ASTNode):
+        a = a.compile([name])
+    if isinstance(b, fpcore.ast.ASTNode):
+        b = b.compile([name])
+
     # Run both at the current precision
-    a_out = a.eval(assignment={name: point})
-    b_out = b.eval(assignment={name: point})
+    a_out = a(point)
+    b_out = b(point)
 
     # We are arbitrarily okay if the answers differ by 4 bits
     lost_bits = 4
@@ -115,8 +187,8 @@ def try_point(a: fpcore.ast.ASTNode,
     # then return False
     if a_out == 0.0:
         logger("Unequal at point: {}", point)
-        logger("a(point): {}", point)
-        logger("b(point): {}", point)
+        logger("a(point): {}", a_out)
+        logger("b(point): {}", b_out)
         logger("difference: {}", abs_diff)
         return False
 
@@ -125,8 +197,8 @@ def try_point(a: fpcore.ast.ASTNode,
     res = rel_diff < bound
     if not res:
         logger("Unequal at point: {}", point)
-        logger("a(point): {}", point)
-        logger("b(point): {}", point)
+        logger("a(point): {}", a_out)
+        logger("b(point): {}", b_out)
         logger("difference: {}", abs_diff)
         logger("relative_diff: {}", rel_diff)
     return res
@@ -1,11 +1,49 @@
 
-import subprocess
+import hashlib
 
-import mpmath
+import numpy
 import pandas
-from compile import compile_file, link_files
 import interval
+from compile import include_hash
+from measurement_library import (MEASUREMENT_SEED, ORACLE_THREADS,
+                                 load_measurement_library, load_sweep_library)
 from numeric_types import FP32, FP64, NumericType
+from utils import ArrayCache, Logger
+
+logger = Logger(level=Logger.HIGH, color=Logger.green)
+
+# Oracle tables shared between candidates and runs, memory mapped from disk
+ORACLE_CACHE = ArrayCache("oracle_values")
+
+# Oracle tables kept in this process, oldest entries are dropped first
+ORACLE_DATA = dict()
+ORACLE_DATA_ENTRIES = 16
+
+# Spacing between adjacent values is measured in the function's own type
+_ULP_DTYPES = {
+    FP32: numpy.float32,
+    FP64: numpy.float64,
+}
+
+
+def _two_sum(a, b):
+    """
+    Error free transformation, a + b == s + e exactly, elementwise
+    """
+    s = a + b
+    bb = s - a
+    e = (a - (s - bb)) + (b - bb)
+    return s, e
+
+
+def _dd_sub_abs(hi, lo, x):
+    """
+    |(hi + lo) - x| where the oracle is the double-double hi + lo, the
+    cancellation in hi - x is exact so the result is accurate to about a
+    double rounding
+    """
+    s, e = _two_sum(hi, -x)
+    return numpy.abs(s + (e + lo))
 
 
 def error_function(numeric_type: NumericType,
@@ -14,7 +52,13 @@ def error_function(numeric_type: NumericType,
                    c_code: str,
                    oracle_function_name: str,
                    oracle_code: str,
-                   domain: interval.Interval) -> dict:
+                   domain: interval.Interval,
+                   flags: list = None,
+                   oracle_threads: int = None) -> dict:
+    """
+    Errors of the function against the oracle on `samples` inputs. The
+    oracle runs on `oracle_threads` threads, by default ORACLE_THREADS.
+    """
     if c_function_name is None:
         return None
 
@@ -24,34 +68,120 @@ def error_function(numeric_type: NumericType,
                                 samples,
                                 oracle_function_name,
                                 oracle_code,
-                                domain)
-
-    mpmath.mp.prec = 1024
-    data["oracle"] = (
-        data["correctly_rounded"].map(lambda d: mpmath.mpf(d))
-        + data["diff"].map(lambda d: mpmath.mpf(d))
-        )
-    data.drop(columns=["diff"])
+                                domain,
+                                oracle_threads)
 
     function_data = function_values(numeric_type,
                                     samples,
                                     c_function_name,
                                     c_code,
-                                    domain)
+                                    domain,
+                                    flags)
 
     assert data["input"].equals(function_data["input"])
 
     data["function"] = function_data["function"]
 
-    data["f_abs_error"] = data["oracle"] - data["function"]
-    data["f_abs_error"] = data["f_abs_error"].map(lambda mp: abs(float(mp)))
-    data["f_rel_error"] = data["f_abs_error"] / data["oracle"]
-    data["f_rel_error"] = data["f_rel_error"].map(lambda mp: abs(float(mp)))
+    # The oracle is the double-double correctly_rounded + diff, all of the
+    # error columns are computed on whole columns from that pair
+    hi = data["correctly_rounded"].to_numpy()
+    lo = data["diff"].to_numpy()
+    func = data["function"].to_numpy()
+    oracle = hi + lo
+    data["oracle"] = oracle
+
+    f_abs_error = _dd_sub_abs(hi, lo, func)
+    cr_abs_error = numpy.abs(lo)
+    ulp = numpy.spacing(numpy.abs(hi).astype(_ULP_DTYPES[numeric_type]))
+    ulp = ulp.astype(numpy.float64)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        data["f_abs_error"] = f_abs_error
+        data["f_rel_error"] = numpy.abs(f_abs_error / oracle)
+        data["f_ulp_error"] = f_abs_error / ulp
+
+        data["cr_abs_error"] = cr_abs_error
+        data["cr_rel_error"] = numpy.abs(cr_abs_error / oracle)
+        data["cr_ulp_error"] = cr_abs_error / ulp
+
+    return data
+
+
+def error_sweep(numeric_type: NumericType,
+                c_function_name: str,
+                c_code: str,
+                oracle_function_name: str,
+                oracle_code: str,
+                domain: interval.Interval,
+                threads: int = None,
+                flags: list = None) -> dict:
+    """
+    Exhaustive error over every float in the domain, only FP32 is supported.
+    Returns the exact worst case absolute and ulp errors, where they happen,
+    and a histogram of ulp errors.
+    """
+    if c_function_name is None:
+        return None
+
+    lib = load_sweep_library(numeric_type,
+                             c_function_name,
+                             c_code,
+                             oracle_function_name,
+                             oracle_code,
+                             flags)
 
-    data["cr_abs_error"] = data["oracle"] - data["correctly_rounded"]
-    data["cr_abs_error"] = data["cr_abs_error"].map(lambda mp: abs(float(mp)))
-    data["cr_rel_error"] = data["cr_abs_error"] / data["oracle"]
-    data["cr_rel_error"] = data["cr_rel_error"].map(lambda mp: abs(float(mp)))
+    # Zero lets the C side use every online cpu
+    result = lib.sweep(domain.float_inf, domain.float_sup, threads or 0)
+    return result.to_dict()
+
+
+def raw_values(is_oracle: bool,
+               numeric_type: NumericType,
+               samples: int,
+               function_name: str,
+               code: str,
+               range: interval.Interval,
+               flags: list = None,
+               threads: int = None):
+    """
+    Dictionary of numpy columns in sample order, oracles are run on
+    `threads` threads
+    """
+    # The code is compiled once and reused for every domain
+    lib = load_measurement_library(numeric_type,
+                                   function_name,
+                                   code,
+                                   is_oracle,
+                                   flags)
+
+    low = range.float_inf
+    high = range.float_sup
+
+    if is_oracle:
+        if threads is None:
+            threads = ORACLE_THREADS
+        inputs, correctly_rounded, diffs = lib.oracle_values(low, high,
+                                                             samples,
+                                                             threads)
+        return {
+            "input": inputs,
+            "correctly_rounded": correctly_rounded,
+            "diff": diffs,
+        }
+
+    inputs, outputs = lib.function_values(low, high, samples)
+    return {
+        "input": inputs,
+        "function": outputs,
+    }
+
+
+def values_frame(columns: dict):
+    # FP32 values are widened (exactly) so later steps only see doubles
+    data = pandas.DataFrame({name: numpy.asarray(col, dtype=numpy.float64)
+                             for name, col in columns.items()})
+
+    data.sort_values("input", inplace=True)
 
     return data
 
@@ -61,76 +191,98 @@ def any_values(is_oracle: bool,
                   samples: int,
                   function_name: str,
                   code: str,
-                  range: interval.Interval):
-    # low = numeric_type.num_to_str(range.inf)
-    # high = numeric_type.num_to_str(range.sup)
-
-    low = range.inf.to_libm_c(numeric_type=numeric_type)
-    high = range.sup.to_libm_c(numeric_type=numeric_type)
-
-    value_type = "oracle" if is_oracle else "function"
-
-    if numeric_type == FP64:
-        gen = f"generate_{value_type}_values_fp64"
-    elif numeric_type == FP32:
-        gen = f"generate_{value_type}_values_fp32"
-
-    # print("WTF", numeric_type, gen)
-
-    lines = [
-        '#include "error_measurement.h"',
-        '#include "double_double.h"',
-        '#include "cody_waite_reduction.h"',
-        '',
-        code,
-        '',
-        'int main(int argc, char** argv) {',
-        f'  {gen}({function_name}, {low}, {high}, {samples});',
-        '}'
-    ]
-    c_source = "\n".join(lines)
-
-    fname = f"{function_name}.c"
-    with open(fname, "w") as f:
-        f.write(c_source)
-
-    run_name = f"{function_name}_runner"
-    obj = compile_file(fname)
-    runner = link_files([obj], run_name)
-
-    tsv_name = f"{function_name}.tsv"
-    p = subprocess.run(f"./{runner}", capture_output=True)
-    with open(tsv_name, "wb") as f:
-        f.write(p.stdout)
-    data = pandas.read_csv(tsv_name, sep='\t')
-
-    for c in data.columns:
-        data[c] = data[c].map(lambda s: float.fromhex(s))
+                  range: interval.Interval,
+                  flags: list = None):
+    return values_frame(raw_values(is_oracle,
+                                   numeric_type,
+                                   samples,
+                                   function_name,
+                                   code,
+                                   range,
+                                   flags))
 
-    data.sort_values("input", inplace=True)
 
-    return data
+def oracle_cache_key(numeric_type: NumericType,
+                     samples: int,
+                     code: str,
+                     range: interval.Interval):
+    """
+    The oracle code is generated from the FPCore body, the headers hold the
+    oracle precision and the sample generator
+    """
+    hasher = hashlib.sha256()
+    for part in [numeric_type.name,
+                 code,
+                 include_hash(),
+                 float.hex(float(range.float_inf)),
+                 float.hex(float(range.float_sup)),
+                 str(MEASUREMENT_SEED),
+                 str(samples)]:
+        hasher.update(part.encode("utf8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def cached_oracle_values(numeric_type: NumericType,
+                         samples: int,
+                         function_name: str,
+                         code: str,
+                         range: interval.Interval,
+                         threads: int = None):
+    key = oracle_cache_key(numeric_type, samples, code, range)
+    table = ORACLE_CACHE.lookup(key)
+    if table is not None:
+        logger("Reusing oracle values: {}", key)
+        return values_frame({name: table[name]
+                             for name in table.dtype.names})
+
+    columns = raw_values(True,
+                         numeric_type,
+                         samples,
+                         function_name,
+                         code,
+                         range,
+                         threads=threads)
+    table = numpy.empty(samples, dtype=[(name, col.dtype)
+                                        for name, col in columns.items()])
+    for name, col in columns.items():
+        table[name] = col
+    ORACLE_CACHE.store(key, table)
+    return values_frame(columns)
+
 
 def function_values(numeric_type: NumericType,
                   samples: int,
                   function_name: str,
                   code: str,
-                  range: interval.Interval):
+                  range: interval.Interval,
+                  flags: list = None):
     return any_values(False,
                       numeric_type,
                       samples,
                       function_name,
                       code,
-                      range)
+                      range,
+                      flags)
 
 def oracle_values(numeric_type: NumericType,
                   samples: int,
                   function_name: str,
                   code: str,
-                  range: interval.Interval):
-    return any_values(True,
-                      numeric_type,
-                      samples,
-                      function_name,
-                      code,
-                      range)
+                  range: interval.Interval,
+                  threads: int = None):
+    # The lambda and the reference are compared on the same inputs, so the
+    # oracle table for a domain is computed once and handed out as copies.
+    # The thread count does not change the values, so it is not in the key
+    key = (numeric_type.name, function_name, code,
+           range.float_inf, range.float_sup, samples)
+    if key not in ORACLE_DATA:
+        if len(ORACLE_DATA) >= ORACLE_DATA_ENTRIES:
+            del ORACLE_DATA[next(iter(ORACLE_DATA))]
+        ORACLE_DATA[key] = cached_oracle_values(numeric_type,
+                                                samples,
+                                                function_name,
+                                                code,
+                                                range,
+                                                threads)
+    return ORACLE_DATA[key].copy()
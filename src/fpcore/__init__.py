@@ -6,6 +6,7 @@ from .ast import list_to_repr, list_to_str
 from . import ast
 
 from .ast_methods import (
+    compile,
     copy,
     cross,
     contains,
@@ -20,9 +21,11 @@ from .ast_methods import (
     float,
     get_any_name,
     get_variables,
+    hash_cons,
     interval_eval,
     is_constant,
     remove_let,
+    rounding_error,
     simplify,
     substitute,
     unary_op,
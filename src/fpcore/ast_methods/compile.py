@@ -0,0 +1,258 @@
+import mpmath
+import numpy
+from expect import expect_implemented
+from fpcore.ast import ASTNode, Constant, FPCore, Number, Operation, Variable
+from fpcore.ast_methods.eval import (_BINOP_MAPPING, _CONST_MAPPING,
+                                     _TRIOP_MAPPING, _UNOP_MAPPING)
+from utils import add_method
+
+# Operations emitted as plain python operators, everything else calls into
+# the same mappings `eval` uses
+_INFIX_BINOPS = {"+", "-", "*", "/"}
+
+# Float64 versions for the numpy backend, operations missing here make
+# compilation raise NotImplementedError
+_NUMPY_UNOP_MAPPING = {
+    "-": numpy.negative,
+    "acos": numpy.arccos,
+    "acosh": numpy.arccosh,
+    "asin": numpy.arcsin,
+    "asinh": numpy.arcsinh,
+    "atan": numpy.arctan,
+    "atanh": numpy.arctanh,
+    "cbrt": numpy.cbrt,
+    "ceil": numpy.ceil,
+    "cos": numpy.cos,
+    "cosh": numpy.cosh,
+    "exp": numpy.exp,
+    "exp2": numpy.exp2,
+    "expm1": numpy.expm1,
+    "fabs": numpy.fabs,
+    "floor": numpy.floor,
+    "log": numpy.log,
+    "log10": numpy.log10,
+    "log1p": numpy.log1p,
+    "log2": numpy.log2,
+    "sin": numpy.sin,
+    "sinh": numpy.sinh,
+    "sqrt": numpy.sqrt,
+    "tan": numpy.tan,
+    "tanh": numpy.tanh,
+}
+
+_NUMPY_BINOP_MAPPING = {
+    "!=": numpy.not_equal,
+    "<": numpy.less,
+    "<=": numpy.less_equal,
+    "==": numpy.equal,
+    ">": numpy.greater,
+    ">=": numpy.greater_equal,
+    "atan2": numpy.arctan2,
+    "fdim": lambda a, b: numpy.maximum(0.0, a - b),
+    "fmax": numpy.fmax,
+    "fmin": numpy.fmin,
+    "fmod": numpy.fmod,
+    "hypot": numpy.hypot,
+    "pow": numpy.power,
+}
+
+_NUMPY_TRIOP_MAPPING = {
+    "fma": lambda a, b, c: a*b + c,
+}
+
+_MAPPINGS = {
+    "mpmath": {1: _UNOP_MAPPING, 2: _BINOP_MAPPING, 3: _TRIOP_MAPPING},
+    "numpy": {1: _NUMPY_UNOP_MAPPING,
+              2: _NUMPY_BINOP_MAPPING,
+              3: _NUMPY_TRIOP_MAPPING},
+}
+
+
+class CompiledExpression():
+    """
+    An expression lowered once into a python function over mpmath values.
+    Calling it gives the same answer as `eval` at the current precision
+    without walking the tree.
+    """
+
+    def __init__(self, expr, arguments, source, namespace, numbers):
+        self.expr = expr
+        self.arguments = arguments
+        self.source = source
+        self.func = namespace["_compiled"]
+        # Number literals are parsed at the precision they are used at
+        self.number_sources = numbers
+        self.numbers = None
+        self.numbers_prec = None
+
+    def __repr__(self):
+        return "CompiledExpression({}, {})".format(repr(self.expr),
+                                                   repr(self.arguments))
+
+    def _current_numbers(self):
+        if self.numbers_prec != mpmath.mp.prec:
+            self.numbers = [mpmath.mpf(n) for n in self.number_sources]
+            self.numbers_prec = mpmath.mp.prec
+        return self.numbers
+
+    def __call__(self, *args):
+        if len(args) != len(self.arguments):
+            msg = (f"Compiled expression expected {len(self.arguments)}"
+                   f" arguments, got {len(args)}")
+            raise TypeError(msg)
+        args = [a if type(a) == mpmath.mpf else mpmath.mpf(a) for a in args]
+        return self.func(self._current_numbers(), *args)
+
+    def batch(self, points):
+        """
+        Evaluate at every point, points are values for single argument
+        expressions and tuples of values otherwise
+        """
+        numbers = self._current_numbers()
+        func = self.func
+        mpf = mpmath.mpf
+        if len(self.arguments) == 1:
+            return [func(numbers, p if type(p) == mpf else mpf(p))
+                    for p in points]
+        return [func(numbers, *[a if type(a) == mpf else mpf(a) for a in p])
+                for p in points]
+
+
+class VectorizedExpression():
+    """
+    An expression lowered into float64 numpy operations, arguments are
+    arrays (or floats) and so is the result. Meant for quick screening, the
+    answers have ordinary double rounding errors.
+    """
+
+    def __init__(self, expr, arguments, source, namespace):
+        self.expr = expr
+        self.arguments = arguments
+        self.source = source
+        self.func = namespace["_compiled"]
+
+    def __repr__(self):
+        return "VectorizedExpression({}, {})".format(repr(self.expr),
+                                                     repr(self.arguments))
+
+    def __call__(self, *args):
+        if len(args) != len(self.arguments):
+            msg = (f"Vectorized expression expected {len(self.arguments)}"
+                   f" arguments, got {len(args)}")
+            raise TypeError(msg)
+        args = [numpy.asarray(a, dtype=numpy.float64) for a in args]
+        with numpy.errstate(all="ignore"):
+            out = self.func(None, *args)
+        return numpy.broadcast_to(out, numpy.broadcast(*args).shape)
+
+
+class _Lowering():
+    """
+    State shared while emitting the python expression for one tree
+    """
+
+    def __init__(self, arguments, backend):
+        if backend not in _MAPPINGS:
+            raise ValueError(f"Unknown compile backend '{backend}'")
+        self.backend = backend
+        self.names = {name: f"_x{i}" for i, name in enumerate(arguments)}
+        self.namespace = {"mpmath": mpmath, "numpy": numpy}
+        self.numbers = list()
+        self.number_index = dict()
+
+    def bind(self, prefix, value):
+        name = f"_{prefix}{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def number(self, source):
+        if self.backend == "numpy":
+            return self.bind("c", float(mpmath.mpf(source)))
+        if source not in self.number_index:
+            self.number_index[source] = len(self.numbers)
+            self.numbers.append(source)
+        return f"_n[{self.number_index[source]}]"
+
+
+@add_method(ASTNode)
+def _lower(self, *args, **kwargs):
+    expect_implemented("_lower", self)
+
+
+@add_method(Constant)
+def _lower(self, lowering):
+    try:
+        value = _CONST_MAPPING[self.source]
+    except KeyError:
+        raise NotImplementedError(f"Unknown constant '{self.source}'")
+    if lowering.backend == "numpy":
+        value = float(value)
+    return lowering.bind("c", value)
+
+
+@add_method(Variable)
+def _lower(self, lowering):
+    if self.source not in lowering.names:
+        raise NameError("{} not in compile arguments".format(self.source))
+    return lowering.names[self.source]
+
+
+@add_method(Number)
+def _lower(self, lowering):
+    return lowering.number(self.source)
+
+
+@add_method(Operation)
+def _lower(self, lowering):
+    f_args = [arg._lower(lowering) for arg in self.args]
+
+    if len(f_args) == 1 and self.op == "-":
+        return f"(-{f_args[0]})"
+
+    if len(f_args) == 2 and self.op in _INFIX_BINOPS:
+        return f"({f_args[0]} {self.op} {f_args[1]})"
+
+    mapping = _MAPPINGS[lowering.backend]
+    if len(f_args) in mapping and self.op in mapping[len(f_args)]:
+        func = lowering.bind("f", mapping[len(f_args)][self.op])
+        return f"{func}({', '.join(f_args)})"
+
+    if self.op == "thefunc":
+        if lowering.backend == "numpy":
+            return "numpy.nan"
+        return "mpmath.mpf('NaN')"
+
+    msg = f"Operation not yet supported for compile: '{self.op}'"
+    raise NotImplementedError(msg)
+
+
+@add_method(ASTNode)
+def compile(self, arguments=None, backend="mpmath"):
+    """
+    Lower the expression into a function taking the named variables
+    positionally, by default the sorted free variables.
+    The "mpmath" backend gives a CompiledExpression, "numpy" a float64
+    VectorizedExpression.
+    """
+    if arguments is None:
+        arguments = sorted(self.get_variables())
+    arguments = [str(a) for a in arguments]
+
+    lowering = _Lowering(arguments, backend)
+    body = self._lower(lowering)
+    params = ", ".join(["_n"] + [lowering.names[a] for a in arguments])
+    source = f"def _compiled({params}):\n    return {body}\n"
+    exec(source, lowering.namespace)
+    if backend == "numpy":
+        return VectorizedExpression(self, arguments, source,
+                                    lowering.namespace)
+    return CompiledExpression(self, arguments, source, lowering.namespace,
+                              lowering.numbers)
+
+
+@add_method(FPCore)
+def compile(self, arguments=None, backend="mpmath"):
+    # Same signature as on expressions, arguments default to the FPCore's own
+    if arguments is None:
+        arguments = [a.source for a in self.arguments]
+    return self.body.compile(arguments, backend)
@@ -10,6 +10,7 @@ def doctester():
     A simple constant propagation pass meant to minimally disturb the ast.
     Currently it:
     * replaces (* 1 x) and (* x 1) with x
+    * replaces (fma 1 x y) and (fma x 1 y) with (+ y x)
 
     >>> import fpcore
     >>> fpc = fpcore.parse_expr("(* 1 x)")
@@ -30,6 +31,9 @@ def doctester():
     >>> fpc = fpc.constant_propagate()
     >>> str(fpc)
     '(- x)'
+    >>> fpc = fpcore.parse_expr("(fma 1 x y)")
+    >>> str(fpc.constant_propagate())
+    '(+ y x)'
     """
     # This allows for a docstring that the doctest can find
     raise NotImplementedError("'doctester' should never be called")
@@ -60,6 +64,12 @@ def constant_propagate(self):
         case "*", [other, Operation(op="-", args=(Number(one),))]:
             if better_float_cast(one) == 1.0:
                 return Operation("-", other)
+        case "fma", [Number(one), other, addend]:
+            if better_float_cast(one) == 1.0:
+                return Operation("+", addend, other)
+        case "fma", [other, Number(one), addend]:
+            if better_float_cast(one) == 1.0:
+                return Operation("+", addend, other)
     return Operation(self.op, *tuple(const_args))
 
 
@@ -1,10 +1,17 @@
 from expect import expect_implemented
+import snake_egg_rules
 import template_identities
 from fpcore.ast import ASTNode, FPCore, Operation, Variable
-from utils import Logger, add_method
+from fpcore.ast_methods.simplify import parse_cached
+from utils import DiskCache, Logger, add_method, normalized_hash
 
 logger = Logger()
 
+DISK_CACHE = DiskCache("decompose_identities")
+
+IDENTITIES_VERSION = snake_egg_rules.source_version(
+    template_identities.__file__)
+
 
 def split_s_and_t(iden):
     """
@@ -61,16 +68,64 @@ def decompose_identities(self):
       then we get a dict from <template> names to a set of (s, t_arg) tuples.
     """
     if not hasattr(self, "_decomposed_identities"):
-        identities = template_identities.extract_identities(self)
-        self._decomposed_identities = {
-            "mirror": set(),
-            "periodic": set(),
-        }
-        for iden in identities:
-            opt = split_s_and_t(iden)
-            if opt == None:
-                logger.log("Ignoring identity: {}", iden)
-                continue
-            s, t_name, t_arg = opt
-            self._decomposed_identities[t_name].add((s, t_arg))
+        key = normalized_hash("\n".join([IDENTITIES_VERSION,
+                                         str(template_identities.ITERS),
+                                         str(self)]))
+        found, value = DISK_CACHE.lookup(key)
+        decomposed = None
+        if found:
+            decomposed = from_cache_value(value)
+        if decomposed is None:
+            decomposed = compute_decomposed_identities(self)
+            value = to_cache_value(decomposed)
+            if value is not None:
+                DISK_CACHE.store(key, value)
+        self._decomposed_identities = decomposed
     return self._decomposed_identities
+
+
+def compute_decomposed_identities(func):
+    identities = template_identities.extract_identities(func)
+    decomposed = {
+        "mirror": set(),
+        "periodic": set(),
+    }
+    for iden in identities:
+        opt = split_s_and_t(iden)
+        if opt == None:
+            logger.log("Ignoring identity: {}", iden)
+            continue
+        s, t_name, t_arg = opt
+        decomposed[t_name].add((s.intern(), t_arg.intern()))
+    return decomposed
+
+
+def to_cache_value(decomposed):
+    """
+    Text form of the decomposed identities, or None if some expression does
+    not read back as itself
+    """
+    value = dict()
+    for t_name, pairs in decomposed.items():
+        value[t_name] = list()
+        for s, t_arg in pairs:
+            for expr in [s, t_arg]:
+                if parse_cached(str(expr)) != expr:
+                    return None
+            value[t_name].append([str(s), str(t_arg)])
+        # Sorted so the stored text does not depend on set order
+        value[t_name].sort()
+    return value
+
+
+def from_cache_value(value):
+    decomposed = dict()
+    for t_name, pairs in value.items():
+        decomposed[t_name] = set()
+        for s_text, t_arg_text in pairs:
+            s = parse_cached(s_text)
+            t_arg = parse_cached(t_arg_text)
+            if s is None or t_arg is None:
+                return None
+            decomposed[t_name].add((s.intern(), t_arg.intern()))
+    return decomposed
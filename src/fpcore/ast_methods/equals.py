@@ -17,6 +17,7 @@ def __eq__(self, other):
 def __eq__(self, other):
     return (type(other) == Operation
             and self.op == other.op
+            and len(self.args) == len(other.args)
             and all(a_arg == o_arg for a_arg, o_arg
                     in zip(self.args, other.args)))
 
@@ -24,6 +25,8 @@ def __eq__(self, other):
 @add_method(FPCore)
 def __eq__(self, other):
     return (type(other) == FPCore
+            and len(self.arguments) == len(other.arguments)
+            and len(self.properties) == len(other.properties)
             and all(s_arg == o_arg for s_arg, o_arg
                     in zip(self.arguments, other.arguments))
             and all(s_prop == o_prop for s_prop, o_prop
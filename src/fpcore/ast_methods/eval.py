@@ -1,3 +1,4 @@
+from functools import lru_cache
 import mpmath
 from expect import expect_implemented
 from fpcore.ast import ASTNode, Constant, FPCore, Number, Operation, Variable
@@ -108,8 +109,13 @@ def eval(self, assignment=None):
 
 @add_method(Number)
 def eval(self, assignment=None):
+    return _number_value(self.source, mpmath.mp.prec)
+
+
+@lru_cache(maxsize=1 << 14)
+def _number_value(source, prec):
     # TODO: this _may_ fail for some number representations
-    return mpmath.mpf(self.source)
+    return mpmath.mpf(source)
 
 
 @add_method(Operation)
@@ -0,0 +1,130 @@
+import functools
+import weakref
+
+from fpcore.ast import ASTNode, Atom, FPCore, Operation, Variable
+from utils import add_method
+
+
+# Canonical nodes handed out by `intern`, entries go away with their node
+INTERN_TABLE = weakref.WeakValueDictionary()
+
+
+# Structural hashes agree with the `__eq__` methods in equals.py, so equal
+# expressions find each other in sets, dicts, and `functools.cache`.
+# A node does not know its parents, so only hashes that cannot go stale are
+# cached: those of atoms, dropped whenever one of their public attributes is
+# reassigned, and those of interned nodes, which can not be changed.
+
+@add_method(ASTNode)
+def __setattr__(self, name, value):
+    if not name.startswith("_"):
+        if self.__dict__.get("_interned", False):
+            msg = f"Interned nodes can not be changed, tried to set '{name}'"
+            raise AttributeError(msg)
+        self.__dict__.pop("_hash", None)
+    object.__setattr__(self, name, value)
+
+
+@add_method(ASTNode)
+def __getstate__(self):
+    # String hashes differ between interpreters, and copies are not interned
+    return {k: v for k, v in self.__dict__.items()
+            if k not in {"_hash", "_interned"}
+            and not k.startswith("_cached_")}
+
+
+def interned_cache(method):
+    """
+    Cache the result of `method` on the node when the node is interned,
+    other nodes may change so the method is just called.
+    The cache lives and dies with the node.
+    """
+    attr = f"_cached_{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        if not self.__dict__.get("_interned", False):
+            return method(self, *args)
+        cache = self.__dict__.setdefault(attr, dict())
+        try:
+            return cache[args]
+        except KeyError:
+            cache[args] = method(self, *args)
+            return cache[args]
+    return wrapper
+
+
+@add_method(Atom)
+def __hash__(self):
+    try:
+        return self._hash
+    except AttributeError:
+        self._hash = hash((type(self).__name__, self.source))
+        return self._hash
+
+
+@add_method(Operation)
+def __hash__(self):
+    try:
+        return self._hash
+    except AttributeError:
+        pass
+    value = hash(("Operation", self.op, tuple(self.args)))
+    if self.__dict__.get("_interned", False):
+        self._hash = value
+    return value
+
+
+@add_method(FPCore)
+def __hash__(self):
+    return hash(("FPCore", tuple(self.arguments), self.body))
+
+
+@add_method(ASTNode)
+def intern(self):
+    """
+    Return a shared node equal to this one, so identical subtrees are one
+    object. Interned nodes raise AttributeError when an attribute is set,
+    and their argument lists must not be changed either. The node itself is
+    left as it was, the shared node is a new one the first time. Copies are
+    not interned. Nodes with properties or dimensions are returned as is.
+    """
+    return self
+
+
+@add_method(Atom)
+def intern(self):
+    if self.__dict__.get("_interned", False) or len(self.properties) != 0:
+        return self
+    if type(self) == Variable and (self.dimension is not None or self.isDD):
+        return self
+    key = (type(self).__name__, self.source)
+    canonical = INTERN_TABLE.get(key)
+    if canonical is None:
+        canonical = self.copy()
+        canonical._interned = True
+        INTERN_TABLE[key] = canonical
+    return canonical
+
+
+@add_method(Operation)
+def intern(self):
+    if self.__dict__.get("_interned", False) or len(self.properties) != 0:
+        return self
+    args = [a.intern() for a in self.args]
+    # The children are canonical, so their identity stands in for them
+    key = ("Operation", self.op, tuple(id(a) for a in args))
+    canonical = INTERN_TABLE.get(key)
+    if canonical is None:
+        canonical = Operation(self.op, *args)
+        canonical._interned = True
+        INTERN_TABLE[key] = canonical
+    return canonical
+
+
+@add_method(FPCore)
+def intern(self):
+    return FPCore(self.name,
+                  self.arguments,
+                  self.properties,
+                  self.body.intern())
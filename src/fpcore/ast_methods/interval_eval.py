@@ -75,6 +75,10 @@ _BINOP_MAPPING = {
     "pow": lambda a, b: iv.power(a, b),
 }
 
+_TRIOP_MAPPING = {
+    "fma": lambda a, b, c: a*b + c,
+}
+
 
 @add_method(ASTNode)
 def interval_eval(self, *args, **kwargs):
@@ -120,6 +124,9 @@ def interval_eval(self, assignment):
     if len(f_args) == 2 and self.op in _BINOP_MAPPING:
         return _BINOP_MAPPING[self.op](f_args[0], f_args[1])
 
+    if len(f_args) == 3 and self.op in _TRIOP_MAPPING:
+        return _TRIOP_MAPPING[self.op](f_args[0], f_args[1], f_args[2])
+
     # TODO: What if we want the function to be interval_evaluated?
     if self.op == "thefunc":
         return iv.mpf("NaN")
@@ -0,0 +1,111 @@
+import mpmath
+from expect import expect_implemented
+from fpcore.ast import ASTNode, Constant, FPCore, Number, Operation, Variable
+from utils import add_method
+
+
+def doctester():
+    """
+    First order bound on the absolute rounding error of evaluating an
+    expression in floating point with `precision` bits, for inputs in the
+    given ranges. Inputs are taken as exact and every operation rounds once,
+    so an fma is one rounding where (+ c (* a b)) is two.
+    Returns the interval of exact values and the error bound.
+
+    >>> import fpcore
+    >>> from interval import Interval
+    >>> x = {"x": Interval("1", "2")}
+    >>> e = fpcore.parse_expr("(+ 1 (* x 3))")
+    >>> round(e.rounding_error(x, 53)[1] / 2**-53, 6)
+    13.0
+    >>> e = fpcore.parse_expr("(fma x 3 1)")
+    >>> round(e.rounding_error(x, 53)[1] / 2**-53, 6)
+    7.0
+    """
+    # This allows for a docstring that the doctest can find
+    raise NotImplementedError("'doctester' should never be called")
+
+
+def _magnitude(value):
+    return float(abs(value).b)
+
+
+def _rounded(value, error, precision):
+    # The result is rounded once, relative to its computed magnitude
+    return value, error + (_magnitude(value) + error) * 2.0**-precision
+
+
+@add_method(ASTNode)
+def rounding_error(self, *args, **kwargs):
+    expect_implemented("rounding_error", self)
+
+
+@add_method(Constant)
+def rounding_error(self, assignment, precision):
+    return _rounded(self.interval_eval(assignment), 0.0, precision)
+
+
+@add_method(Variable)
+def rounding_error(self, assignment, precision):
+    return self.interval_eval(assignment), 0.0
+
+
+@add_method(Number)
+def rounding_error(self, assignment, precision):
+    value = self.interval_eval(assignment)
+    exact = mpmath.mpf(self.source)
+    with mpmath.workprec(precision):
+        representable = (+exact) == exact
+    if representable:
+        return value, 0.0
+    return _rounded(value, 0.0, precision)
+
+
+@add_method(Operation)
+def rounding_error(self, assignment, precision):
+    results = [arg.rounding_error(assignment, precision) for arg in self.args]
+    values = [value for value, _ in results]
+    errors = [error for _, error in results]
+    mags = [_magnitude(value) for value in values]
+
+    if len(values) == 1 and self.op == "-":
+        return -values[0], errors[0]
+
+    if len(values) == 2 and self.op in {"+", "-"}:
+        value = values[0] + values[1] if self.op == "+" else values[0] - values[1]
+        return _rounded(value, errors[0] + errors[1], precision)
+
+    if len(values) in {2, 3} and self.op in {"*", "fma"}:
+        if (len(values) == 3) != (self.op == "fma"):
+            msg = f"Wrong number of arguments for '{self.op}': {len(values)}"
+            raise ValueError(msg)
+        value = values[0] * values[1]
+        error = mags[0]*errors[1] + errors[0]*mags[1] + errors[0]*errors[1]
+        # The product is not rounded before the add
+        if self.op == "fma":
+            value = value + values[2]
+            error += errors[2]
+        return _rounded(value, error, precision)
+
+    msg = ("Operation not yet supported for rounding_error with"
+           f" {len(values)} arguments: '{self.op}'")
+    raise NotImplementedError(msg)
+
+
+@add_method(FPCore)
+def rounding_error(self, *args, precision=53):
+    # Check that arity matches
+    expected = len(self.arguments)
+    actual = len(args)
+    if expected != actual:
+        msg = f"FPCore expected {expected} arguments, got {actual}"
+        raise TypeError(msg)
+
+    # Assign variables to ranges and bound the error
+    assignment = {name.source: arg for name, arg in zip(self.arguments, args)}
+    return self.body.rounding_error(assignment, precision)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
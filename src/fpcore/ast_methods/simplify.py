@@ -1,23 +1,59 @@
 from functools import cache
 from expect import expect_implemented
 from fpcore.ast import ASTNode, Atom, FPCore, Operation
-from utils import add_method
+from fpcore.parser import FPCoreParseError, parse_expr
+from fpcore.lexer import FPCoreLexError
+from utils import DiskCache, add_method, normalized_hash
 import snake_egg
 import snake_egg_rules
 
+ITER_LIMIT = 10
+TIME_LIMIT = 600
+NODE_LIMIT = 20_000
+
+DISK_CACHE = DiskCache("simplify")
+
+
+def disk_cache_key(expr):
+    return normalized_hash("\n".join([snake_egg_rules.RULES_VERSION,
+                                       str(ITER_LIMIT),
+                                       str(TIME_LIMIT),
+                                       str(NODE_LIMIT),
+                                       str(expr)]))
+
+
+def parse_cached(text):
+    try:
+        return parse_expr(text)
+    except (FPCoreLexError, FPCoreParseError):
+        return None
+
 
 @cache
 def simplify_with_egraph(expr):
+    # Results are shared on disk between processes and runs
+    key = disk_cache_key(expr)
+    found, text = DISK_CACHE.lookup(key)
+    if found:
+        cached = parse_cached(text)
+        if cached is not None:
+            return cached.intern()
+
     egraph = snake_egg.EGraph(snake_egg_rules.eval)
     body = expr.to_snake_egg(to_rule=False)
     id = egraph.add(body)
     egraph.run(snake_egg_rules.rules,
-               iter_limit=10,
-               time_limit=600,
-               node_limit=20_000,
+               iter_limit=ITER_LIMIT,
+               time_limit=TIME_LIMIT,
+               node_limit=NODE_LIMIT,
                use_simple_scheduler=False)
     simplified = egraph.extract(id)
-    return snake_egg_rules.egg_to_fpcore(simplified)
+    result = snake_egg_rules.egg_to_fpcore(simplified)
+
+    # Only keep results that read back as the same expression
+    if parse_cached(str(result)) == result:
+        DISK_CACHE.store(key, str(result))
+    return result.intern()
 
 
 @add_method(ASTNode)
@@ -32,7 +68,9 @@ def simplify(self):
 
 @add_method(Operation)
 def simplify(self):
-    return simplify_with_egraph(self)
+    # Results are interned, so the many equal expressions the synthesis
+    # simplifies share their translations and hashes. They can not be changed
+    return simplify_with_egraph(self.intern())
 
 
 @add_method(FPCore)
@@ -110,6 +110,11 @@ def to_libm_c(self, numeric_type=FP64):
         if len(c_args) == 2 and self.op in {"+", "-", "*", "/"}:
             return "({} {} {})".format(c_args[0], self.op, c_args[1])
 
+        # The builtin is still an instruction when compiling with -fno-builtin
+        if len(c_args) == 3 and self.op == "fma":
+            return "__builtin_{}{}({})".format(self.op, numeric_type.suffix,
+                                               ", ".join(c_args))
+
         if numeric_type == FP64:
             return "{}({})".format(self.op, ", ".join(c_args))
         elif numeric_type == FP32:
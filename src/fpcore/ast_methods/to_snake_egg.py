@@ -4,6 +4,7 @@ from expect import expect_implemented
 from fpcore.ast import ASTNode, Constant, FPCore, Number, Operation, Variable
 from snake_egg import Var
 from snake_egg_rules import operations
+from fpcore.ast_methods.hash_cons import interned_cache
 from utils import add_method
 
 _CONST_MAPPING = {
@@ -104,6 +105,12 @@ def to_snake_egg(self, to_rule):
 
 @add_method(Operation)
 def to_snake_egg(self, to_rule):
+    return _operation_to_snake_egg(self, to_rule)
+
+
+# Interned subexpressions are only translated once
+@interned_cache
+def _operation_to_snake_egg(self, to_rule):
     se_args = [a.to_snake_egg(to_rule) for a in self.args]
 
     if len(se_args) == 1 and self.op in _UNOP_MAPPING:
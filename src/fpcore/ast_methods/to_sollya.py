@@ -1,5 +1,6 @@
 from expect import expect_implemented
 from fpcore.ast import ASTNode, Atom, Constant, FPCore, Operation
+from fpcore.ast_methods.hash_cons import interned_cache
 from utils import add_method
 
 
@@ -29,6 +30,12 @@ def to_sollya(self):
 
 @add_method(Operation)
 def to_sollya(self):
+    return _operation_to_sollya(self)
+
+
+# Interned subexpressions are only translated once
+@interned_cache
+def _operation_to_sollya(self):
     s_args = [arg.to_sollya() for arg in self.args]
 
     if len(s_args) == 1 and self.op in {"+", "-"}:
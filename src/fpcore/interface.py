@@ -90,4 +90,4 @@ def _make_triop(op, x, y,z):
     return fpcore.ast.Operation(op, x, y, z)
 
 
-def fma(x, y, z): return _make_triop("fma", z, y, z)
+def fma(x, y, z): return _make_triop("fma", x, y, z)
@@ -16,7 +16,7 @@ from .horner import Horner
 from .inflection_left import InflectionLeft
 from .inflection_right import InflectionRight, ExprIfLess
 from .lambda_utils import (generate_c_code, generate_libm_c_code,
-                           generate_mpfr_c_code)
+                           generate_mpfr_c_code, generate_vec_c_code)
 from .minimax_polynomial import MinimaxPolynomial
 from .mirror_left import MirrorLeft
 from .mirror_right import MirrorRight
@@ -32,4 +32,6 @@ from .repeat_exp import RepeatExp
 from .rewrite import Rewrite
 from .split_domain import SplitDomain
 from .sub import Sub
+from .table_polynomial import TablePolynomial
+from .table_reduce import TableReduce
 from .neg import Neg
@@ -36,7 +36,10 @@ class Add(types.Transform):
         if self == search:
             return replace
         new_in_node = self.in_node.replace_lambda(search, replace)
-        return Add(self.expr, self.in_node)
+        return Add(self.expr, new_in_node, useDD=self.useDD)
+
+    def cost_ops(self):
+        return 1 + types.count_ops(self.expr)
 
     def type_check(self):
         if self.type_check_done:
@@ -32,17 +32,29 @@ class Approx(types.Transform):
                  new_function: fpcore.ast.FPCore,
                  new_domain: Interval,
                  epsilon: float,
-                 in_node: types.Node):
+                 in_node: types.Node,
+                 infnorm: float = None):
+        """
+        epsilon: The bound on the approximation error that is checked
+        infnorm: The measured error, when known, that epsilon was rounded
+                 up from
+        """
         super().__init__(in_node)
         self.new_function = new_function
         self.new_domain = new_domain
         self.epsilon = epsilon
+        self.infnorm = infnorm
 
     def replace_lambda(self, search, replace):
         if self == search:
             return replace
         new_in_node = self.in_node.replace_lambda(search, replace)
-        return Approx(self.new_function, self.new_domain, self.epsilon, new_in_node)
+        return Approx(self.new_function, self.new_domain, self.epsilon,
+                      new_in_node, self.infnorm)
+
+    def cost_ops(self):
+        # The polynomial is charged for its terms
+        return 0
 
     def type_check(self):
         if self.type_check_done:
@@ -15,6 +15,12 @@ class TypeCast(types.Transform):
         self.cast_in = frm
         self.cast_out = to
 
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return TypeCast(new_in_node, self.cast_in, self.cast_out)
+
     def type_check(self):
         """ Check that the input is a polynomial """
         self.in_node.type_check()
@@ -42,16 +42,38 @@ class CodyWaite(types.Transform):
     def replace_lambda(self, search, replace):
         if self == search:
             return replace
-        new_in_node = self.in_node.replace_lambda(search, replace)
+        # The in_node is the target function when there are cases
+        new_in_node = self.in_node
+        if isinstance(self.in_node, types.Node):
+            new_in_node = self.in_node.replace_lambda(search, replace)
         new_cases = None
         if self.mod_cases is not None:
             new_cases = dict()
-            for k, body in self.cases.items():
+            for k, body in self.mod_cases.items():
                 new_cases[k] = body.replace_lambda(search, replace)
         return self.__class__(new_in_node,
                               constant=self.constant,
                               mod_cases=new_cases,
-                              reconstruction=self.reconstruction)
+                              bits_per=self.bits_per,
+                              entries=self.entries)
+
+    def find_lambdas(self, pred, _found=None):
+        # Setup default args
+        if _found is None:
+            _found = set()
+
+        # Recurse, the cases are what gets generated
+        if isinstance(self.in_node, types.Node):
+            self.in_node.find_lambdas(pred, _found)
+        if self.mod_cases is not None:
+            for body in self.mod_cases.values():
+                body.find_lambdas(pred, _found)
+
+        # Mark this node
+        if pred(self):
+            _found.add(self)
+
+        return _found
 
     def type_check(self):
         """
@@ -14,7 +14,8 @@ class Estrin(types.Transform):
 
     def __init__(self,
                  in_node: types.Node,
-                 split: int = 0):
+                 split: int = 0,
+                 fma: bool = False):
         # Run Transform initialization
         super().__init__(in_node)
 
@@ -23,6 +24,17 @@ class Estrin(types.Transform):
         if split < 0:
             raise ValueError(f"'split' must be positive, given: {split}")
         self.split = split
+        self.fma = fma
+
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return Estrin(new_in_node, split=self.split, fma=self.fma)
+
+    def cost_ops(self):
+        # The polynomial is charged for its terms
+        return 0
 
     def type_check(self):
         # Only check once
@@ -61,7 +73,8 @@ class Estrin(types.Transform):
                              out_names=[p_name],
                              monomials=self.in_node.p_monomials,
                              coefficients=self.in_node.p_coefficients,
-                             split=self.split)
+                             split=self.split,
+                             fma=self.fma)
         block_list.append(p)
 
         # If there is a second polynomial create it
@@ -72,7 +85,8 @@ class Estrin(types.Transform):
                             out_names=[q_name],
                             monomials=self.in_node.q_monomials,
                             coefficients=self.in_node.q_coefficients,
-                            split=self.split)
+                            split=self.split,
+                            fma=self.fma)
             block_list.append(q)
 
             # Combine polynomials
@@ -12,9 +12,24 @@ from lambdas import types
 
 class General(types.Transform):
 
-    def __init__(self, in_node: types.Node):
+    def __init__(self,
+                 in_node: types.Node,
+                 order: str = "ascending",
+                 fma: bool = False):
         # Run Transform initialization
         super().__init__(in_node)
+        self.order = order
+        self.fma = fma
+
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return General(new_in_node, order=self.order, fma=self.fma)
+
+    def cost_ops(self):
+        # The polynomial is charged for its terms
+        return 0
 
     def type_check(self):
         # Only check once
@@ -47,7 +62,9 @@ class General(types.Transform):
                          in_names=[g_name],
                          out_names=[p_name],
                          monomials=self.in_node.p_monomials,
-                         coefficients=self.in_node.p_coefficients)
+                         coefficients=self.in_node.p_coefficients,
+                         order=self.order,
+                         fma=self.fma)
         block_list.append(p)
 
         # If there is a second polynomial create it
@@ -57,7 +74,9 @@ class General(types.Transform):
                              in_names=[g_name],
                              out_names=[q_name],
                              monomials=self.in_node.q_monomials,
-                             coefficients=self.in_node.q_coefficients)
+                             coefficients=self.in_node.q_coefficients,
+                             order=self.order,
+                             fma=self.fma)
             block_list.append(q)
 
             # Combine polynomials
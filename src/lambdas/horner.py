@@ -15,7 +15,8 @@ class Horner(types.Transform):
                  split: int = 0,
                  numeric_type: NumericType = FP64,                 
                  useDD: bool = False,
-                 split_expr=None):
+                 split_expr=None,
+                 fma: bool = False):
         # Run Transform initialization
         super().__init__(in_node, numeric_type)
 
@@ -26,7 +27,19 @@ class Horner(types.Transform):
         self.split = split
         self.useDD = useDD
         self.split_expr = split_expr
+        self.fma = fma
 
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return Horner(new_in_node, split=self.split,
+                      numeric_type=self.numeric_type, useDD=self.useDD,
+                      split_expr=self.split_expr, fma=self.fma)
+
+    def cost_ops(self):
+        # The polynomial is charged for its terms
+        return 0
 
     def type_check(self):
         # Only check once
@@ -72,7 +85,8 @@ class Horner(types.Transform):
                          monomials=self.in_node.p_monomials,
                          coefficients=self.in_node.p_coefficients,
                          split=self.split,
-                         split_expr=self.split_expr)
+                         split_expr=self.split_expr,
+                         fma=self.fma)
         block_list.append(p)
 
         # If there is a second polynomial create it
@@ -84,7 +98,8 @@ class Horner(types.Transform):
                              out_names=[q],
                              monomials=self.in_node.q_monomials,
                              coefficients=self.in_node.q_coefficients,
-                             split=self.split)
+                             split=self.split,
+                             fma=self.fma)
             block_list.append(q)
 
             # Combine polynomials
@@ -54,7 +54,12 @@ class InflectionRight(types.Transform):
         if self == search:
             return replace
         new_in_node = self.in_node.replace_lambda(search, replace)
-        return InflectionRight(new_in_node, self.reduction, self.reconstruction, synthesize=True)
+        return InflectionRight(new_in_node, self.reduction, self.reconstruction,
+                               useDD=self.useDD, synthesize=self.synthesize)
+
+    def cost_ops(self):
+        ops = types.count_ops([self.reduction, self.reconstruction])
+        return ops if ops != 0 else types.TRANSFORM_OPS
 
     def type_check(self):
         if self.type_check_done:
@@ -78,6 +78,39 @@ def generate_c_code(lam, name, numeric_type=FP64, func_type=FP64):
     return signature_h, lines
 
 
+def generate_vec_c_code(lam, name, numeric_type=FP64, func_type=FP64):
+    """
+    Like `generate_c_code`, but the function evaluates a whole array,
+    `void name(const T *in, T *out, size_t n)`. The loop body has no
+    branches so the compiler can vectorize it.
+    """
+    passes = lam.generate(numeric_type=numeric_type)
+    in_type = func_type.c_type
+    in_name = passes[0].in_names[0]
+    out_type = func_type.c_type
+    out_name = passes[-1].out_names[0]
+    signature = ("void {}(const {} *restrict vec_in, {} *restrict vec_out,"
+                 " size_t vec_n)").format(name, in_type, out_type)
+    signature_h = signature + ";"
+
+    lines = [
+        signature,
+        "{",
+        "// {}".format(lam),
+        "    for (size_t vec_i = 0; vec_i < vec_n; vec_i++)",
+        "    {",
+        "        {} {} = vec_in[vec_i];".format(in_type, in_name),
+    ]
+
+    for p in passes:
+        lines += ["        " + l for l in p.to_vec_c()]
+    lines.append("        vec_out[vec_i] = {};".format(out_name))
+    lines.append("    }")
+    lines.append("}")
+
+    return signature_h, lines
+
+
 def generate_libm_c_code(typ, name, numeric_type=FP64):
     func = typ.function
     in_type = numeric_type.c_type
@@ -111,12 +144,13 @@ def generate_mpfr_c_code(impl: lambdas.types.Impl,
 
     lines = [signature,
              "{",
-             "  static int init_called = 0;",
-             "  static mpfr_t {};".format(in_name),
+             # Thread local so the oracle can be run from many threads
+             "  static _Thread_local int init_called = 0;",
+             "  static _Thread_local mpfr_t {};".format(in_name),
              ]
 
     for temp_name in temps:
-        lines.append("  static mpfr_t {};".format(temp_name))
+        lines.append("  static _Thread_local mpfr_t {};".format(temp_name))
 
     lines.append("  if (!init_called) {")
     lines.append("    mpfr_init2({}, ORACLE_PREC);".format(in_name))
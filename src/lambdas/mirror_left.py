@@ -37,6 +37,10 @@ class MirrorLeft(types.Transform):
         new_in_node = self.in_node.replace_lambda(search, replace)
         return MirrorLeft(new_in_node, self.s_expr)
 
+    def cost_ops(self):
+        # The reflection about the mirror point and the reconstruction
+        return 1 + types.count_ops(self.s_expr)
+
     def type_check(self):
         """ Check that (mirror domain.inf) is an identity """
         if self.type_check_done:
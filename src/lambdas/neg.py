@@ -23,7 +23,10 @@ class Neg(types.Transform):
         if self == search:
             return replace
         new_in_node = self.in_node.replace_lambda(search, replace)
-        return self.__class__(new_in_node, self.reduction, self.reconstruction)
+        return self.__class__(new_in_node)
+
+    def cost_ops(self):
+        return types.count_ops(self.expr)
 
     def type_check(self):
         if self.type_check_done:
@@ -40,6 +40,10 @@ class PeriodicRecons(types.Transform):
         new_in_node = self.in_node.replace_lambda(search, replace)
         return PeriodicRecons(new_in_node, period=self.period, recons_expr=self.recons_expr)
 
+    def cost_ops(self):
+        # Finding the period count is not an expression we keep
+        return types.count_ops(self.recons_expr) + types.TRANSFORM_OPS
+
     def type_check(self):
         """
         Check that the function has the stated period and the implementation
@@ -16,6 +16,7 @@ from numeric_types import FP64, FPDD, NumericType
 def Polynomial(monomials_to_coefficients: dict,
                scheme: str = "horner",
                split: int = 0,
+               fma: bool = False,
                ):
     # turn m,c into fpcore expression
     m_c = [(m, c) for m, c in monomials_to_coefficients.items()]
@@ -34,10 +35,10 @@ def Polynomial(monomials_to_coefficients: dict,
         [t[1] for t in m_c])
 
     if scheme == "general":
-        return lambdas.General(poly)
+        return lambdas.General(poly, fma=fma)
     elif scheme == "horner":
-        return lambdas.Horner(poly, split)
+        return lambdas.Horner(poly, split, fma=fma)
     elif scheme == "estrin":
-        return lambdas.Estrin(poly, split)
+        return lambdas.Estrin(poly, split, fma=fma)
     else:
         raise TypeError(f"scheme must be one of general, horner, or estrin, given '{scheme}'")
@@ -65,7 +65,7 @@ class Recharacterize(types.Transform):
         new_in_node = self.in_node.replace_lambda(search, replace)
         return Recharacterize(self.out_function,
                               self.remapping_function,
-                              self.in_node)
+                              new_in_node)
 
     def type_check(self):
         if self.type_check_done:
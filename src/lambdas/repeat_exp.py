@@ -34,6 +34,12 @@ class RepeatExp(types.Transform):
         self.bits_per = bits_per
         self.entries = entries
 
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return RepeatExp(new_in_node, self.bits_per, self.entries)
+
     def type_check(self):
         self.in_node.type_check()
         our_in_type = self.in_node.out_type
@@ -43,7 +43,7 @@ class Rewrite(types.Transform):
         if self == search:
             return replace
         new_in_node = self.in_node.replace_lambda(search, replace)
-        return Rewrite(self.expr, self.in_node)
+        return Rewrite(self.from_expr, self.to_expr, new_in_node)
 
     def type_check(self):
         if self.type_check_done:
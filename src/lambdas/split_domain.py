@@ -42,11 +42,13 @@ class SplitDomain(types.Transform):
         return _found
 
     def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
         new_d_to_i = dict()
         for dom, impl in self.domains_to_impls.items():
             new_impl = impl.replace_lambda(search, replace)
             new_d_to_i[dom] = new_impl
-        return SplitDomain(new_d_to_i)
+        return SplitDomain(new_d_to_i, useDD=self.useDD)
 
     def type_check(self):
         if self.type_check_done:
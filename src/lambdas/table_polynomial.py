@@ -0,0 +1,116 @@
+import mpmath
+
+import fpcore
+import lego_blocks
+from fpcore.ast import FPCore
+from interval import Interval
+from lambdas import types
+from lambdas.table_reduce import table_entries
+from numeric_types import FP64
+from utils import Logger
+
+logger = Logger(level=Logger.HIGH)
+
+
+class TablePolynomial(types.Source):
+
+    def __init__(self,
+                 function: FPCore,
+                 domain: Interval,
+                 bits: int,
+                 degree: int):
+        """
+        Split the domain into 2**bits entries, each with its own polynomial
+        in r = x - c around the entry center c, kept in a table.
+
+        bits: log2 of the number of table entries
+        degree: degree of the polynomial of every entry
+        """
+        super().__init__(function, domain)
+        self.bits = bits
+        self.degree = degree
+
+    def __str__(self):
+        return ("(TablePolynomial"
+                f" {self.out_type.function}"
+                f" {self.out_type.domain}"
+                f" {self.bits} {self.degree})")
+
+    def __repr__(self):
+        return ("TablePolynomial("
+                f"{repr(self.out_type.function)}, "
+                f"{repr(self.out_type.domain)}, "
+                f"{self.bits}, {self.degree})")
+
+    def type_check(self):
+        if self.type_check_done:
+            return
+
+        # TODO: Turn assert into exception
+        assert self.out_type.domain.isfinite()
+        assert self.degree >= 0
+
+        self.type_check_done = True
+
+    def entry_coefficients(self):
+        """
+        Center and coefficients, lowest degree first, of every entry.
+        The polynomials are Chebyshev fits, close to minimax for smooth
+        functions.
+        """
+        func = self.out_type.function.compile()
+        entries = list()
+        worst = 0.0
+        with mpmath.workprec(128):
+            for low, center, high in table_entries(self.out_type.domain,
+                                                   self.bits):
+                c = mpmath.mpf(center)
+                coeffs, err = mpmath.chebyfit(lambda r: func(c + r),
+                                              [low - center, high - center],
+                                              self.degree + 1,
+                                              error=True)
+                worst = max(worst, float(err))
+                entries.append((center, [float(a) for a in coeffs[::-1]]))
+        logger("Worst table polynomial error: {}", worst)
+        return entries
+
+    def generate(self, numeric_type=FP64):
+        # i = entry of in
+        # r = in - table[i][0]
+        # out = table[i][1] + r*(table[i][2] + r*(...))
+        self.type_check()
+
+        rows = [[center.hex()] + [a.hex() for a in coeffs]
+                for center, coeffs in self.entry_coefficients()]
+
+        in_name = self.gensym("in")
+        r = self.gensym("r")
+        coeff_names = [self.gensym("a") for _ in range(self.degree + 1)]
+        domain = self.out_type.domain
+        inv_width = 2**self.bits / (domain.float_sup - domain.float_inf)
+        lookup = lego_blocks.TableLookup(numeric_type,
+                                         [in_name],
+                                         [r] + coeff_names,
+                                         domain.float_inf.hex(),
+                                         inv_width.hex(),
+                                         rows,
+                                         "additive",
+                                         self.gensym)
+
+        args = ["r"] + [f"a{i}" for i in range(self.degree + 1)]
+        body = args[-1]
+        for a in args[-2:0:-1]:
+            body = f"(+ {a} (* r {body}))"
+        horner = fpcore.parse(f"(FPCore ({' '.join(args)}) {body})")
+        out = self.gensym("out")
+        poly = lego_blocks.LegoFPCore(numeric_type,
+                                      [r] + coeff_names,
+                                      [out],
+                                      horner)
+
+        return [lookup, poly]
+
+    @classmethod
+    def generate_hole(cls, out_type):
+        # Table sizes are picked by hand for now
+        return list()
@@ -0,0 +1,217 @@
+from decimal import Decimal
+
+import mpmath
+
+import fpcore
+import lego_blocks
+from calculate_cody_waite_constants import calculate_cody_waite_constants
+from expect import expect_type
+from fpcore.ast import FPCore, Number, Operation
+from interval import Interval
+from lambdas import types
+from numeric_types import FP64
+from utils import Logger
+
+logger = Logger(level=Logger.HIGH)
+
+# How f(c) and the inner result combine back into f(x) for each reduction
+DEFAULT_RECONS = {
+    # f(c + r) = f(c) * f(r), like exp
+    "additive": "(FPCore (y hi lo) (+ (* hi y) (* lo y)))",
+    # f(c * r) = f(c) + f(r), like log
+    "multiplicative": "(FPCore (y hi lo) (+ hi (+ lo y)))",
+}
+
+
+def exact_number(f: float):
+    # Numbers are parsed as decimals, so give every digit of the double
+    return fpcore.interface.num(str(Decimal(f)))
+
+
+def table_entries(domain: Interval, bits: int):
+    """
+    Split the domain into 2**bits even entries, giving (low edge, center,
+    high edge) of each as doubles
+    """
+    inf = domain.float_inf
+    width = (domain.float_sup - inf) / 2**bits
+    return [(inf + i*width, inf + (i + 0.5)*width, inf + (i + 1)*width)
+            for i in range(2**bits)]
+
+
+class TableReduce(types.Transform):
+
+    def __init__(self,
+                 in_node: types.Node,
+                 domain: Interval,
+                 bits: int,
+                 reduction: str = "additive",
+                 recons: FPCore = None):
+        """
+        Split the domain into 2**bits entries and reduce the input against
+        the center c of its entry, using a table of f(c) in double double.
+
+        in_node: An implementation valid on the reduced range, around 0 for
+                 additive reduction and around 1 for multiplicative
+        domain: The domain of the resulting implementation
+        bits: log2 of the number of table entries
+        reduction: "additive" for r = x - c, "multiplicative" for r = x/c.
+                   Multiplicative entries that touch 1 use c = 1, so f(x)
+                   near 1 keeps the accuracy of in_node, and the rounding
+                   error of r is added to f(c) to first order
+        recons: FPCore of (y hi lo) giving f(x) from y = f(r) and
+                f(c) = hi + lo, by default the identity matching reduction
+        """
+        expect_type("domain", domain, Interval)
+        if reduction not in DEFAULT_RECONS:
+            msg = ("reduction must be one of"
+                   f" {', '.join(DEFAULT_RECONS)}, given: {reduction}")
+            raise ValueError(msg)
+        if recons is None:
+            recons = fpcore.parse(DEFAULT_RECONS[reduction])
+        expect_type("recons", recons, FPCore)
+        if len(recons.arguments) != 3:
+            msg = ("'recons' FPCore must take in 3 arguments, given: "
+                   f"{len(recons.arguments)} arguments")
+            raise ValueError(msg)
+
+        self.domain = domain
+        self.bits = bits
+        self.reduction = reduction
+        self.recons = recons
+        super().__init__(in_node)
+
+    def __str__(self):
+        inner = str(self.in_node)
+        return (f"(TableReduce [{self.domain.inf}, {self.domain.sup}]"
+                f" {self.bits} {self.reduction} {inner})")
+
+    def __repr__(self):
+        return (f"TableReduce({repr(self.in_node)}, {repr(self.domain)},"
+                f" {self.bits}, {repr(self.reduction)}, {repr(self.recons)})")
+
+    def replace_lambda(self, search, replace):
+        if self == search:
+            return replace
+        new_in_node = self.in_node.replace_lambda(search, replace)
+        return TableReduce(new_in_node, self.domain, self.bits,
+                           self.reduction, self.recons)
+
+    def reduction_constants(self):
+        """
+        Per entry (low edge, high edge, constant in the table, center the
+        table value is for), the center is an expression
+        """
+        constants = list()
+        for low, center, high in table_entries(self.domain, self.bits):
+            if self.reduction == "additive":
+                constants.append((low, high, center, exact_number(center)))
+            else:
+                # c = 1 avoids cancelling f(c) against f(r) near f(1) = 0
+                inv_center = 1.0 if low <= 1.0 <= high else 1.0 / center
+                exact = Operation("/", Number("1"), exact_number(inv_center))
+                constants.append((low, high, inv_center, exact))
+        return constants
+
+    def reduced_range(self):
+        reduced = list()
+        for low, high, constant, _ in self.reduction_constants():
+            if self.reduction == "additive":
+                reduced += [low - constant, high - constant]
+            else:
+                reduced += [low * constant, high * constant]
+        return min(reduced), max(reduced)
+
+    def type_check(self):
+        """
+        Check that the inner implementation covers the reduced range and that
+        the reconstruction holds at the entry edges
+        """
+        if self.type_check_done:
+            return
+
+        self.in_node.type_check()
+        our_in_type = self.in_node.out_type
+
+        # TODO: Turn assert into exception
+        assert type(our_in_type) == types.Impl
+        assert self.domain.isfinite()
+        if self.reduction == "multiplicative":
+            assert self.domain.float_inf > 0.0
+
+        low, high = self.reduced_range()
+        assert our_in_type.domain.contains(low)
+        assert our_in_type.domain.contains(high)
+
+        func = our_in_type.function
+        constants = self.reduction_constants()
+        step = max(1, len(constants) // 4)
+        with mpmath.workprec(128):
+            for low, high, constant, center in constants[::step]:
+                f_c = func.body.substitute(func.arguments[0], center).eval({})
+                for x in [low, high]:
+                    if self.reduction == "additive":
+                        r = mpmath.mpf(x) - constant
+                    else:
+                        r = mpmath.mpf(x) * constant
+                    expected = func.eval(x)
+                    actual = self.recons.eval(func.eval(r), f_c, 0)
+                    diff = abs(expected - actual)
+                    if diff > 2**-40 * max(1, abs(expected)):
+                        logger.warning("Table reconstruction fails at {}", x)
+                        assert False, "recons does not hold for this function"
+
+        self.out_type = types.Impl(func, self.domain)
+        self.type_check_done = True
+
+    def generate(self, numeric_type=FP64):
+        # i = entry of in
+        # r = in - table[i][0]  or  in * table[i][0]
+        # ...
+        # y = ...
+        # out = recons(y, table[i][1], table[i][2])
+        self.type_check()
+        so_far = super().generate(numeric_type=numeric_type)
+
+        func = self.out_type.function
+        rows = list()
+        for _, _, constant, center in self.reduction_constants():
+            f_c = func.body.substitute(func.arguments[0], center)
+            hi, lo = calculate_cody_waite_constants(f_c, 53, 2)
+            rows.append([constant.hex(), hi, lo])
+
+        in_name = self.gensym("table_in")
+        r = so_far[0].in_names[0]
+        hi = self.gensym("table_hi")
+        lo = self.gensym("table_lo")
+        inf = self.domain.float_inf
+        inv_width = 2**self.bits / (self.domain.float_sup - inf)
+        remainder_scale = None
+        if self.reduction == "multiplicative":
+            # f(x) = f(c) + f(r + e) ~ f(c) + f(r) + f'(1)*e, as r is near 1
+            with mpmath.workprec(128):
+                slope = mpmath.diff(lambda t: func.eval(t), 1)
+            remainder_scale = float(slope).hex()
+        lookup = lego_blocks.TableLookup(numeric_type,
+                                         [in_name],
+                                         [r, hi, lo],
+                                         inf.hex(),
+                                         inv_width.hex(),
+                                         rows,
+                                         self.reduction,
+                                         self.gensym,
+                                         remainder_scale)
+
+        y = so_far[-1].out_names[0]
+        out = self.gensym("table_out")
+        recons = lego_blocks.LegoFPCore(numeric_type,
+                                        [y, hi, lo],
+                                        [out],
+                                        self.recons)
+
+        return [lookup] + so_far + [recons]
+
+    @classmethod
+    def generate_hole(cls, out_type):
+        # Table sizes and identities are picked by hand for now
+        return list()
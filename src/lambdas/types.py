@@ -3,9 +3,32 @@
 import copy
 from expect import expect_implemented, expect_implemented_class, expect_subclass, expect_type
 import fpcore
-from fpcore.ast import FPCore, Variable
+from fpcore.ast import FPCore, Operation, Variable
 from interval import Interval
 from numeric_types import NumericType, FP64
+from utils.expr_if_less import ExprIfLess
+
+
+# Ops charged for a transform whose reduction is not an expression we can
+# count, like the quadrant switch of Periodic
+TRANSFORM_OPS = 4
+
+
+def count_ops(value):
+    """
+    Operations in an expression, FPCore or list of them. A choice between
+    two expressions costs the compare and the larger one
+    """
+    if isinstance(value, FPCore):
+        return count_ops(value.body)
+    if isinstance(value, Operation):
+        return 1 + sum(count_ops(arg) for arg in value.args)
+    if isinstance(value, ExprIfLess):
+        return 1 + max(count_ops(value.true_expr),
+                       count_ops(value.false_expr))
+    if isinstance(value, (list, tuple)):
+        return sum(count_ops(v) for v in value)
+    return 0
 
 
 # Each lambda has an out type of either an implantation or a polynomial
@@ -192,6 +215,13 @@ class Transform(Node):
     def generate(self, numeric_type=FP64):
         return self.in_node.generate(numeric_type=numeric_type)
 
+    def cost_ops(self):
+        """
+        Operations in the reduction and reconstruction of this transform,
+        used to order the synthesis search
+        """
+        return TRANSFORM_OPS
+
 
 class VariableRequest:
     def __init__(self, var: fpcore.ast.Variable):
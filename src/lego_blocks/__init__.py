@@ -21,4 +21,5 @@ from .power import Pow
 from .set_exp import SetExp
 from .simple_additive import SimpleAdditive
 from .split_domain import SplitDomain
+from .table_lookup import TableLookup
 from .neg import Neg
@@ -56,3 +56,25 @@ class Case(lego_blocks.LegoBlock):
         lines += final_case
 
         return lines
+
+    def to_vec_c(self):
+        # Selects instead of a switch, the case is the mathematical k mod m
+        fmt = {
+            "k": self.in_names[1],
+            "mod": self.mod,
+            "out": self.out_names[0],
+            "type": self.numeric_type.c_type,
+        }
+        fmt["sel"] = "{}_case".format(fmt["out"])
+
+        lines = [
+            "int {sel} = (({k}%{mod}) + {mod})%{mod};".format(**fmt),
+            "{type} {out} = {val};".format(val=self.cases[0], **fmt),
+        ]
+
+        for c in sorted(self.cases.keys())[1:]:
+            val = self.cases[c]
+            lines.append("{} = ({} == {}) ? ({}) : {};".format(
+                fmt["out"], fmt["sel"], c, val, fmt["out"]))
+
+        return lines
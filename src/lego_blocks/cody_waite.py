@@ -3,6 +3,7 @@ from better_float_cast import better_float_cast
 from calculate_cody_waite_constants import calculate_cody_waite_constants
 import lego_blocks
 import fpcore
+from numeric_types import FP32, FP64
 
 
 class CodyWaite(lego_blocks.LegoBlock):
@@ -36,3 +37,41 @@ class CodyWaite(lego_blocks.LegoBlock):
         ]
 
         return source_lines
+
+    def to_vec_c(self):
+        # k is rounded to nearest by adding 1.5 * 2^(mantissa bits), which
+        # leaves it in the low bits of the sum, instead of going through int
+        # conversions and signbit
+        cdecl = self.numeric_type.c_type
+
+        cw_in = self.in_names[0]
+        r = self.out_names[0]
+        k = self.out_names[1]
+        shifted = self.gensym("shifted")
+        shifted_bits = self.gensym("shifted_bits")
+        dk = self.gensym("dk")
+
+        if self.numeric_type == FP64:
+            uint = "uint64_t"
+            magic = "0x1.8p52"
+            magic_bits = "0x4338000000000000ull"
+        elif self.numeric_type == FP32:
+            uint = "uint32_t"
+            magic = "0x1.8p23f"
+            magic_bits = "0x4b400000u"
+        else:
+            raise NotImplementedError("Vectorized Cody-Waite reduction needs"
+                                      f" FP64 or FP32, not {self.numeric_type}")
+
+        source_lines = [
+            f"{cdecl} {shifted} = {cw_in} * {self.inv_period} + {magic};",
+            f"{uint} {shifted_bits};",
+            f"__builtin_memcpy(&{shifted_bits}, &{shifted}, sizeof({shifted_bits}));",
+            f"int {k} = (int)({shifted_bits} - {magic_bits});",
+            f"{cdecl} {dk} = {shifted} - {magic};",
+            f"{cdecl} {r} = {cw_in};",
+        ]
+        for period in self.period_strs:
+            source_lines.append(f"{r} -= {dk} * {period};")
+
+        return source_lines
@@ -7,12 +7,13 @@ import fpcore
 from fpcore.ast import (ASTNode, Atom, Constant, FPCore, Number, Operation,
                         Variable)
 from lego_blocks import forms
-from lego_blocks.forms.horner import tree_pow
+from lego_blocks.forms.horner import mul_add, tree_pow
 
 
 def expr_estrin(x: fpcore.ast.Expr,
                 mons: list,
-                coeffs: list):
+                coeffs: list,
+                fma: bool = False):
     """
     Constructs an FPCore.ast expression representing the given polynomial using
     Estrin's scheme
@@ -20,6 +21,7 @@ def expr_estrin(x: fpcore.ast.Expr,
     x- base
     mons- integer monomials for base 'x', must be full rank
     coeffs- fpcore coefficients for polynomial terms
+    fma- pair off terms with fma
 
     >>> x = fpcore.ast.Variable("g")
     >>> cast = lambda l: [fpcore.ast.Number(str(n)) for n in l]
@@ -37,6 +39,8 @@ def expr_estrin(x: fpcore.ast.Expr,
     ...                 [0, 1, 2, 3, 4, 5],
     ...                 cast([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])))
     '(+ (+ (+ 1.0 (* 2.0 g)) (* (+ 3.0 (* 4.0 g)) (* g g))) (* (+ 5.0 (* 6.0 g)) (* (* g g) (* g g))))'
+    >>> str(expr_estrin(x, [0, 1, 2, 3], cast([1.0, 2.0, 3.0, 4.0]), True))
+    '(fma (fma 4.0 g 3.0) (* g g) (fma 2.0 g 1.0))'
     """
     # TODO: figure out how to fit doctest within 80 columns
     # Check x
@@ -68,14 +72,14 @@ def expr_estrin(x: fpcore.ast.Expr,
     if len(mons) == 1:
         return coeffs[0]
     if len(mons) == 2:
-        return coeffs[0] + coeffs[1] * x
+        return mul_add(coeffs[1], x, coeffs[0], fma)
 
     # Pair off
     n = floor(len(mons) / 2)
     next_mons = list()
     next_coeffs = list()
     for i in range(n):
-        d = coeffs[2 * i] + coeffs[2 * i + 1] * x
+        d = mul_add(coeffs[2 * i + 1], x, coeffs[2 * i], fma)
         next_mons.append(i)
         next_coeffs.append(d)
 
@@ -84,7 +88,7 @@ def expr_estrin(x: fpcore.ast.Expr,
         next_mons.append(n)
         next_coeffs.append(coeffs[-1])
 
-    return expr_estrin(x*x, next_mons, next_coeffs)
+    return expr_estrin(x*x, next_mons, next_coeffs, fma)
 
 class Estrin(forms.Form):
 
@@ -94,7 +98,8 @@ class Estrin(forms.Form):
                  out_names: list,
                  monomials: list,
                  coefficients: list,
-                 split: int=0):
+                 split: int=0,
+                 fma: bool=False):
         # Run Form initialization
         super().__init__(numeric_type, in_names, out_names)
 
@@ -111,6 +116,7 @@ class Estrin(forms.Form):
         self.monomials = monomials
         self.coefficients = [fpcore.parse_expr(str(c)) for c in coefficients]
         self.split = split
+        self.fma = fma
 
     def __repr__(self):
         return ("Estrin("
@@ -119,10 +125,17 @@ class Estrin(forms.Form):
                 f"[{fpcore.ast.list_to_repr(self.out_names)}], "
                 f"[{fpcore.ast.list_to_repr(self.monomials)}], "
                 f"[{fpcore.ast.list_to_repr(self.coefficients)}], "
-                f"{self.split}"
+                f"{self.split}, "
+                f"fma={self.fma}"
                 ")")
 
     def to_c(self):
+        c_type = self.numeric_type.c_type
+        body = self.expr().to_libm_c(numeric_type=self.numeric_type)
+        code = f"{c_type} {self.out_names[0]} = {body};"
+        return [code]
+
+    def expr(self):
         # Build the estrin polynomial as an fpcore ast expression
 
         # Local names for things
@@ -169,21 +182,22 @@ class Estrin(forms.Form):
             mons = [m // 2 for m in mons]
 
         # Use the estrin helper then apply any of the after things
-        poly = expr_estrin(estrin_x, mons, coeffs)
-        if mult_term is not None:
-            poly = mult_term * poly
-        if const_term is not None:
-            poly = const_term + poly
+        poly = expr_estrin(estrin_x, mons, coeffs, self.fma)
+        if mult_term is not None and const_term is not None and self.fma:
+            poly = mul_add(mult_term, poly, const_term, True)
+        else:
+            if mult_term is not None:
+                poly = mult_term * poly
+            if const_term is not None:
+                poly = const_term + poly
 
         # Now build up the general form
         while len(general_mons) > 0:
             x_pow = tree_pow(x, general_mons.pop())
-            new_term = x_pow * general_coeffs.pop()
-            poly = new_term + poly
+            if self.fma:
+                poly = mul_add(x_pow, general_coeffs.pop(), poly, True)
+            else:
+                new_term = x_pow * general_coeffs.pop()
+                poly = new_term + poly
 
-        # Use the fpcore C generation
-        poly = poly.constant_propagate()
-        c_type = self.numeric_type.c_type
-        body = poly.to_libm_c(numeric_type=self.numeric_type)
-        code = f"{c_type} {self.out_names[0]} = {body};"
-        return [code]
+        return poly.constant_propagate()
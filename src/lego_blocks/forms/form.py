@@ -9,3 +9,13 @@ class Form(lego_blocks.LegoBlock):
         super().__init__(numeric_type, in_names, out_names)
         assert (len(self.in_names) == 1 or len(self.in_names)==2)
         assert (len(self.out_names) == 1)
+
+    def rounding_error(self, domain):
+        """
+        Bound on the rounding error of evaluating the form for inputs in
+        domain, from the expression `expr` builds
+        """
+        expr = self.expr()
+        assignment = {name: domain for name in expr.get_variables()}
+        _, error = expr.rounding_error(assignment, self.numeric_type.precision)
+        return error
@@ -2,7 +2,7 @@
 
 import fpcore
 from lego_blocks import forms
-from lego_blocks.forms.horner import tree_pow
+from lego_blocks.forms.horner import mul_add, tree_pow
 
 
 class General(forms.Form):
@@ -12,7 +12,9 @@ class General(forms.Form):
                  in_names,
                  out_names,
                  monomials,
-                 coefficients):
+                 coefficients,
+                 order="ascending",
+                 fma=False):
         # Run Form initialization
         super().__init__(numeric_type, in_names, out_names)
 
@@ -28,6 +30,12 @@ class General(forms.Form):
         # No need to run checks here, the lambdas should have done that
         self.monomials = monomials
         self.coefficients = [fpcore.parse_expr(str(c)) for c in coefficients]
+        if order not in {"ascending", "descending"}:
+            msg = ("'order' must be ascending or descending, given:"
+                   f" {order}")
+            raise ValueError(msg)
+        self.order = order
+        self.fma = fma
 
     def __repr__(self):
         return ("General("
@@ -40,17 +48,30 @@ class General(forms.Form):
                 ")")
 
     def to_c(self):
+        c_type = self.numeric_type.c_type
+        body = self.expr().to_libm_c(numeric_type=self.numeric_type)
+        code = f"{c_type} {self.out_names[0]} = {body};"
+        return [code]
+
+    def expr(self):
         # Local names for things
         x = fpcore.ast.Variable(self.in_names[0])
         mons = self.monomials.copy()
         coeffs = self.coefficients.copy()
 
-        terms = [c * tree_pow(x, m) for c,m in zip(coeffs, mons)]
-        poly = sum(terms)
+        pairs = [(c, tree_pow(x, m)) for c,m in zip(coeffs, mons)]
 
-        # Use the fpcore C generation
-        poly = poly.constant_propagate()
-        c_type = self.numeric_type.c_type
-        body = poly.to_libm_c(numeric_type=self.numeric_type)
-        code = f"{c_type} {self.out_names[0]} = {body};"
-        return [code]
+        # Adding the high degree terms first sums the small terms together
+        # before the large ones
+        if self.order == "descending":
+            pairs.reverse()
+
+        if self.fma:
+            c, x_pow = pairs[0]
+            poly = c * x_pow
+            for c, x_pow in pairs[1:]:
+                poly = mul_add(c, x_pow, poly, True)
+        else:
+            poly = sum(c * x_pow for c, x_pow in pairs)
+
+        return poly.constant_propagate()
@@ -49,6 +49,25 @@ def tree_pow(x: fpcore.ast.Expr,
     return _tree_pow(x, n)
 
 
+def mul_add(a: fpcore.ast.Expr,
+            b: fpcore.ast.Expr,
+            c: fpcore.ast.Expr,
+            fma: bool):
+    """
+    Constructs an FPCore.ast expression for a*b + c, as a single fma when
+    'fma' is set
+
+    >>> a, b, c = [fpcore.ast.Variable(n) for n in "abc"]
+    >>> str(mul_add(a, b, c, False))
+    '(+ c (* a b))'
+    >>> str(mul_add(a, b, c, True))
+    '(fma a b c)'
+    """
+    if fma:
+        return fpcore.ast.Operation("fma", a, b, c)
+    return c + a * b
+
+
 class Horner(forms.Form):
 
     def __init__(self,
@@ -58,7 +77,8 @@ class Horner(forms.Form):
                  monomials: list,
                  coefficients: list,
                  split: int=0,
-                 split_expr=None):
+                 split_expr=None,
+                 fma: bool=False):
         # Run Form initialization
         super().__init__(numeric_type, in_names, out_names)
 
@@ -76,6 +96,7 @@ class Horner(forms.Form):
         self.coefficients = [fpcore.parse_expr(str(c)) for c in coefficients]
         self.split = split
         self.split_expr = split_expr
+        self.fma = fma
 
     def __repr__(self):
         return ("Horner("
@@ -84,7 +105,8 @@ class Horner(forms.Form):
                 f"[{fpcore.ast.list_to_repr(self.out_names)}], "
                 f"[{fpcore.ast.list_to_repr(self.monomials)}], "
                 f"[{fpcore.ast.list_to_repr(self.coefficients)}], "
-                f"{self.split}"
+                f"{self.split}, "
+                f"fma={self.fma}"
                 ")")
 
     def to_c(self):
@@ -104,7 +126,16 @@ class Horner(forms.Form):
         ['double poly = (1.23+(x*4.56));']
         >>> doit([0], ["1.23"], 0)
         ['double poly = 1.23;']
+        >>> Horner(numeric_types.FP64, ["x"], ["poly"], [0, 1, 2],
+        ...        [1, 2, 3], fma=True).to_c()
+        ['double poly = __builtin_fma(x, __builtin_fma(x, 3.0, 2.0), 1.0);']
         """
+        c_type = self.numeric_type.c_type
+        body = self.expr().to_libm_c(numeric_type=self.numeric_type)
+        code = f"{c_type} {self.out_names[0]} = {body};"
+        return [code]
+
+    def expr(self):
         # Build the horner polynomial as an fpcore ast expression
 
         # Local names for things
@@ -123,13 +154,7 @@ class Horner(forms.Form):
         # Handle length 1
         if len(mons) == 1:
             poly = coeffs.pop() * tree_pow(x, mons.pop())
-
-            # Use the fpcore C generation
-            poly = poly.constant_propagate()
-            c_type = self.numeric_type.c_type
-            body = poly.to_libm_c(numeric_type=self.numeric_type)
-            code = f"{c_type} {self.out_names[0]} = {body};"
-            return [code]
+            return poly.constant_propagate()
 
         # We want 'split' terms in general form
         general_mons = mons[0:self.split]
@@ -148,8 +173,7 @@ class Horner(forms.Form):
             x_pow = tree_pow(x, mon_diff)
 
             # Multiply it then add the next coefficient
-            poly = x_pow * poly
-            poly = coeffs.pop() + poly
+            poly = mul_add(x_pow, poly, coeffs.pop(), self.fma)
 
             # Update old monomial
             old_mon = mon
@@ -174,15 +198,13 @@ class Horner(forms.Form):
             x_pow = tree_pow(x, mon)
 
             # Add new term
-            new_term = general_coeffs.pop() * x_pow
-            poly = new_term + poly
+            if self.fma:
+                poly = mul_add(general_coeffs.pop(), x_pow, poly, True)
+            else:
+                new_term = general_coeffs.pop() * x_pow
+                poly = new_term + poly
 
-        # Use the fpcore C generation
-        poly = poly.constant_propagate()
-        c_type = self.numeric_type.c_type
-        body = poly.to_libm_c(numeric_type=self.numeric_type)
-        code = f"{c_type} {self.out_names[0]} = {body};"
-        return [code]
+        return poly.constant_propagate()
 
 
 if __name__ == "__main__":
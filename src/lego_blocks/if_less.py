@@ -57,3 +57,25 @@ class IfLess(lego_blocks.LegoBlock):
             lines.append("{ret} {var} = {val}".format(**fmt))
 
         return lines
+
+    def to_vec_c(self):
+        # Both sides are computed up front so the choice is a plain select
+        out = self.out_names[0].to_libm_c()
+        fmt = {
+            "in": self.in_names[0].to_libm_c(),
+            "bound": self.bound,
+            "true_val": self.true_val,
+            "false_val": self.false_val,
+            "out": out,
+            "type": self.return_type,
+        }
+
+        lines = [
+            "{type} {out}_true = {true_val};".format(**fmt),
+            "{type} {out}_false = {false_val};".format(**fmt),
+            "{type} {out} = {in} <= {bound} ? {out}_true : {out}_false;".format(
+                **fmt),
+        ]
+
+        # The double double parts are the same as in the scalar code
+        return lines + self.to_c()[1:]
@@ -22,3 +22,11 @@ class LegoBlock():
 
     def to_c(self):
         expect_implemented("to_c", self)
+
+    def to_vec_c(self):
+        """
+        Lines for the body of a loop over an array, written so the loop can
+        be vectorized. Defaults to the scalar code, which is already straight
+        line for most blocks.
+        """
+        return self.to_c()
@@ -39,3 +39,38 @@ class ModSwitch(lego_blocks.LegoBlock):
         source_lines.append("}")
 
         return source_lines
+
+    def to_vec_c(self):
+        # Every case is computed and the result picked with selects. The
+        # case is the mathematical k mod m, so negative k picks a case too.
+        cdecl = self.numeric_type.c_type
+
+        r = self.in_names[0]
+        k = self.in_names[1]
+        switch_out = self.out_names[0]
+        sel = f"{switch_out}_case"
+        acc = f"{switch_out}_sel"
+
+        mod = len(self.mod_to_lego)
+
+        source_lines = [
+            f"int {sel} = (({k} % {mod}) + {mod}) % {mod};",
+            f"{cdecl} {acc};",
+        ]
+
+        for i in range(mod):
+            legos = self.mod_to_lego[i]
+            source_lines.append("{")
+            source_lines.append(f"    {cdecl} {legos[0].in_names[0]} = {r};")
+            for le in legos:
+                source_lines += ["    " + l for l in le.to_vec_c()]
+            case_out = legos[-1].out_names[0]
+            if i == 0:
+                source_lines.append(f"    {acc} = {case_out};")
+            else:
+                source_lines.append(f"    {acc} = ({sel} == {i}) ? {case_out} : {acc};")
+            source_lines.append("}")
+
+        source_lines.append(f"{cdecl} {switch_out} = {acc};")
+
+        return source_lines
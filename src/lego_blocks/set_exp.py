@@ -21,3 +21,20 @@ class SetExp(lego_blocks.LegoBlock):
         ]
 
         return lines
+
+    def to_vec_c(self):
+        # 2^n is built directly from its exponent bits
+        c_type = self.numeric_type.c_type
+        arg = self.in_names[0]
+        n = self.in_names[1]
+        out = self.out_names[0]
+
+        assert self.numeric_type == FP64
+        lines = [
+            f"uint64_t {out}_scale_bits = ((uint64_t)(({n} + 1023) & 0x7ff)) << 52;",
+            f"{c_type} {out}_scale;",
+            f"__builtin_memcpy(&{out}_scale, &{out}_scale_bits, sizeof({out}_scale));",
+            f"{c_type} {out} = {arg} * {out}_scale;",
+        ]
+
+        return lines
@@ -63,4 +63,43 @@ class SplitDomain(lego_blocks.LegoBlock):
                 break
         source_lines[-1] = "}"
 
-        return source_lines
\ No newline at end of file
+        return source_lines
+
+    def to_vec_c(self):
+        # Every piece is computed and the result picked with selects, in
+        # reverse so the first matching domain wins as in `to_c`
+        cdecl = self.numeric_type.c_type
+        out_cdecl = cdecl
+        if self.useDD:
+            out_cdecl = FPDD.c_type
+        x = self.in_names[0]
+        out = self.out_names[0]
+        acc = f"{out}_sel"
+
+        points = [(dom, lego) for dom, lego in self.domains_to_lego.items()
+                  if dom.inf == dom.sup]
+        points.sort(key=lambda tup: tup[0].inf)
+        non_points = [(dom, lego) for dom, lego in self.domains_to_lego.items()
+                      if dom.inf != dom.sup]
+        pieces = points + non_points
+
+        source_lines = [f"{out_cdecl} {acc};"]
+        for i in range(len(pieces)-1, -1, -1):
+            dom, lego = pieces[i]
+            inf = self.numeric_type.num_to_str(dom.inf)
+            sup = self.numeric_type.num_to_str(dom.sup)
+            source_lines.append("{")
+            source_lines.append(f"    {cdecl} {lego[0].in_names[0]} = {x};")
+            for le in lego:
+                source_lines += ["    " + l for l in le.to_vec_c()]
+            piece_out = lego[-1].out_names[0]
+            if i == len(pieces) - 1:
+                source_lines.append(f"    {acc} = {piece_out};")
+            elif dom.inf == dom.sup:
+                source_lines.append(f"    {acc} = ({x} == {inf}) ? {piece_out} : {acc};")
+            else:
+                source_lines.append(f"    {acc} = ({inf} <= {x} && {x} <= {sup}) ? {piece_out} : {acc};")
+            source_lines.append("}")
+        source_lines.append(f"{out_cdecl} {out} = {acc};")
+
+        return source_lines
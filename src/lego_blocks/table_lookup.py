@@ -0,0 +1,84 @@
+import lego_blocks
+from numeric_types import FP64
+
+
+class TableLookup(lego_blocks.LegoBlock):
+    """
+    Find the table entry of the input, reduce the input against the entry's
+    first column and read the other columns.
+    Entries split [inf, inf + len(rows)/inv_width] evenly, inputs outside
+    use the closest entry.
+    With multiplicative reduction and a `remainder_scale`, the rounding error
+    of the reduced input, found exactly with an fma, is scaled by it and
+    added to the last column.
+    """
+
+    def __init__(self, numeric_type, in_names, out_names,
+                 inf, inv_width, rows, reduction, gensym,
+                 remainder_scale=None):
+        super().__init__(numeric_type, in_names, out_names)
+        assert (len(self.in_names) == 1)
+        assert (len(rows) > 0)
+        assert (all(len(row) == len(self.out_names) for row in rows))
+        assert (reduction in {"additive", "multiplicative"})
+        self.inf = inf
+        self.inv_width = inv_width
+        self.rows = rows
+        self.reduction = reduction
+        self.gensym = gensym
+        self.remainder_scale = remainder_scale
+
+    def __repr__(self):
+        return "TableLookup({}, {}, {}, {}, {}, {}, {}, {})".format(
+            repr(self.numeric_type),
+            repr(self.in_names),
+            repr(self.out_names),
+            repr(self.inf),
+            repr(self.inv_width),
+            repr(self.rows),
+            repr(self.reduction),
+            repr(self.remainder_scale))
+
+    def to_c(self):
+        cdecl = self.numeric_type.c_type
+        assert self.numeric_type == FP64, "Only double currently supported"
+
+        x = self.in_names[0]
+        r = self.out_names[0]
+        table = self.gensym("table")
+        pos = self.gensym("table_pos")
+        i = self.gensym("table_i")
+        last = len(self.rows) - 1
+
+        source_lines = [
+            f"static const {cdecl} {table}[{len(self.rows)}][{len(self.out_names)}] = {{",
+        ]
+        source_lines += ["    {" + ", ".join(row) + "},"
+                         for row in self.rows]
+        source_lines += [
+            "};",
+            # Clamped before the conversion, which is undefined for NaN and
+            # out of range values. NaN fails the first compare and uses 0
+            f"{cdecl} {pos} = ({x} - {self.inf}) * {self.inv_width};",
+            f"{pos} = {pos} > 0.0 ? {pos} : 0.0;",
+            f"{pos} = {pos} < {last}.0 ? {pos} : {last}.0;",
+            f"int {i} = (int){pos};",
+        ]
+
+        if self.reduction == "additive":
+            source_lines.append(f"{cdecl} {r} = {x} - {table}[{i}][0];")
+        else:
+            source_lines.append(f"{cdecl} {r} = {x} * {table}[{i}][0];")
+
+        for col, name in enumerate(self.out_names[1:], 1):
+            source_lines.append(f"{cdecl} {name} = {table}[{i}][{col}];")
+
+        if self.reduction == "multiplicative" and self.remainder_scale:
+            rem = self.gensym("table_rem")
+            last_out = self.out_names[-1]
+            source_lines += [
+                f"{cdecl} {rem} = __builtin_fma({x}, {table}[{i}][0], -{r});",
+                f"{last_out} += {self.remainder_scale} * {rem};",
+            ]
+
+        return source_lines
@@ -32,6 +32,12 @@ def format_float(number):
         # Format the number with 2 digits after the decimal
         return "{:.2f}".format(number)
 
+def format_column(row, key):
+    # Data from before a column existed shows a dash
+    if key not in row or row[key] is None:
+        return "-"
+    return format_float(row[key])
+
 def make_benchmark_page(benchmark_data, benchmark_body,
                          abs_err_images, benchmark_name):
     #TODO GET NAME AND BODY
@@ -97,12 +103,19 @@ def make_func_rows(funcs, lib, accumulator):
             err_lib = format_float(row['Reference error'])
             time_mlm = format_float(row['MLM time'])
             time_lib = format_float(row['Reference time'])
+            latency_mlm = format_column(row, 'MLM latency')
+            latency_lib = format_column(row, 'Reference latency')
+            has_latency = 'MLM latency' in row and 'Reference latency' in row
+            is_latency_mlm_better = has_latency and row['MLM latency'] <= row['Reference latency']
+            is_latency_lib_better = has_latency and not is_latency_mlm_better
             is_err_mlm_better = err_mlm <= err_lib
             is_time_mlm_better = time_mlm <= time_lib
             text_mlm_err = r"\textbf{" + f"{err_mlm}" + r"}" if is_err_mlm_better else f"{err_mlm}"
             text_mlm_time =  r"\textbf{" + f"{time_mlm}" + r"}" if is_time_mlm_better else f"{time_mlm}"
             text_lib_err = r"\textbf{" + f"{err_lib}" + r"}" if not is_err_mlm_better else f"{err_lib}"
             text_lib_time = r"\textbf{" + f"{time_lib}" + r"}" if not is_time_mlm_better else f"{time_lib}"
+            text_mlm_latency = r"\textbf{" + f"{latency_mlm}" + r"}" if is_latency_mlm_better else f"{latency_mlm}"
+            text_lib_latency = r"\textbf{" + f"{latency_lib}" + r"}" if is_latency_lib_better else f"{latency_lib}"
             table_row = []
             table_row.append(f" {lib if i == 0 else ''}")
             table_row.append(f" {func if i == 0 else ''}")
@@ -111,6 +124,8 @@ def make_func_rows(funcs, lib, accumulator):
             table_row.append(f" {text_lib_err}")
             table_row.append(f" {text_mlm_time}")
             table_row.append(f" {text_lib_time}")
+            table_row.append(f" {text_mlm_latency}")
+            table_row.append(f" {text_lib_latency}")
             accumulator.append("&".join(table_row) + "\\\\")
             i += 1
     accumulator.append("    \hline")
@@ -129,8 +144,8 @@ def make_table_rows(data):
 
 
 def make_latex_table(data):
-    table_head = r"\begin{tabular}{|l|l|l|l|l|l|l|} \hline"
-    table_cols = r"Lib & Func & Domain & Error MLM & Error Libm & Runtime MLM & Runtime libm \\ \hline"
+    table_head = r"\begin{tabular}{|l|l|l|l|l|l|l|l|l|} \hline"
+    table_cols = r"Lib & Func & Domain & Error MLM & Error Libm & Runtime MLM & Runtime libm & Latency MLM & Latency libm \\ \hline"
     table_end = r"\end{tabular}"
     return f"""
     {table_head}
@@ -211,6 +211,13 @@ def format_float(number):
         # Format the number with 2 digits after the decimal
         return "{:.2f}".format(number)
     
+def format_column(row, key):
+    # Data from before a column existed shows a dash
+    if key not in row or row[key] is None:
+        return "-"
+    return format_float(row[key])
+
+
 def make_table_rows(table_data):
     lines = []
     for dom, row in table_data.items():
@@ -218,6 +225,8 @@ def make_table_rows(table_data):
         lines.append(f"                 <th>{dom}</th>")
         lines.append(f"                 <td>{format_float(row['MLM time'])}</td>")
         lines.append(f"                 <td>{format_float(row['Reference time'])}</td>")
+        lines.append(f"                 <td>{format_column(row, 'MLM latency')}</td>")
+        lines.append(f"                 <td>{format_column(row, 'Reference latency')}</td>")
         lines.append(f"                 <td>{format_float(row['MLM error'])}</td>")
         lines.append(f"                 <td>{format_float(row['Reference error'])}</td>")
         lines.append("              </tr>")
@@ -240,6 +249,8 @@ def make_main_part(generation_dir, benchmark_name, table_data):
                     <th>Domain</th>
                     <th>MLM time</th>
                     <th>Reference time</th>
+                    <th>MLM latency</th>
+                    <th>Reference latency</th>
                     <th>MLM error</th>
                     <th>Reference error</th>
                     </tr>
@@ -0,0 +1,443 @@
+import ctypes
+import functools
+import math
+import os
+
+import numpy as np
+from compile import DEFAULT_FLAGS, compile_shared_library
+from numeric_types import FP32, FP64, NumericType
+from utils import Logger
+from work_pool import run_in_child
+
+logger = Logger(level=Logger.HIGH, color=Logger.green)
+
+
+# Libraries that have already been loaded into this process, by path
+LOADED = dict()
+
+# Seed for the sample inputs, given to the C code as -DMEASUREMENT_SEED
+MEASUREMENT_SEED = 42
+
+# Threads used to run MPFR oracles, 0 means one per online cpu
+ORACLE_THREADS = int(os.environ.get("MEGALIBM_ORACLE_THREADS", "0"))
+
+# Candidate code is only loaded in child processes, so a crash in it loses
+# one measurement instead of the whole run. Set to 0 to load in this process
+ISOLATED = os.environ.get("MEGALIBM_ISOLATED_LIBRARIES", "1") not in {"", "0"}
+
+# Cpu to pin timing runs to, negative leaves them unpinned
+TIMING_CPU = int(os.environ.get("MEGALIBM_TIMING_CPU", "-1"))
+
+# Must match TIMING_DEFAULT_WARMUP and the TIMING_ modes in
+# include/timing_measurement.h
+TIMING_WARMUP = 2
+TIMING_MODES = {
+    "throughput": 0,
+    "latency": 1,
+}
+
+_CTYPES = {
+    FP32: ctypes.c_float,
+    FP64: ctypes.c_double,
+}
+
+_DTYPES = {
+    FP32: np.float32,
+    FP64: np.float64,
+}
+
+_SUFFIX = {
+    FP32: "fp32",
+    FP64: "fp64",
+}
+
+
+def measurement_source(numeric_type: NumericType,
+                       function_name: str,
+                       code: str,
+                       is_oracle: bool):
+    """
+    C source exposing the timing and value generation of `function_name`
+    through plain entry points that can be called with ctypes
+    """
+    if numeric_type not in _SUFFIX:
+        raise NotImplementedError(f"Unknown numeric type '{numeric_type}'")
+    suffix = _SUFFIX[numeric_type]
+    c_type = numeric_type.c_type
+
+    lines = [
+        '#include "timing_measurement.h"',
+        '#include "error_measurement.h"',
+        '#include "double_double.h"',
+        '#include "cody_waite_reduction.h"',
+        '',
+        code,
+        '',
+    ]
+
+    if is_oracle:
+        lines += [
+            f"void megalibm_oracle_values_{function_name}("
+            f"{c_type} low, {c_type} high, size_t samples, size_t threads,"
+            f" {c_type} *inputs, {c_type} *correctly_rounded,"
+            f" {c_type} *diffs)",
+            "{",
+            f"  fill_oracle_values_{suffix}({function_name}, low, high,"
+            " samples, threads, inputs, correctly_rounded, diffs);",
+            "}",
+        ]
+        return "\n".join(lines)
+
+    lines += [
+        f"void megalibm_timing_{function_name}("
+        f"{c_type} low, {c_type} high, size_t samples, size_t trials,"
+        " size_t warmup, int mode, int cpu, timing_result *result)",
+        "{",
+        f"  timing_{suffix}({function_name}, low, high, samples, trials,"
+        " warmup, mode, cpu, result);",
+        "}",
+        "",
+        f"void megalibm_counters_{function_name}("
+        f"{c_type} low, {c_type} high, size_t samples, size_t passes,"
+        " int mode, int cpu, perf_result *result)",
+        "{",
+        f"  counters_{suffix}({function_name}, low, high, samples, passes,"
+        " mode, cpu, result);",
+        "}",
+        "",
+        f"void megalibm_function_values_{function_name}("
+        f"{c_type} low, {c_type} high, size_t samples,"
+        f" {c_type} *inputs, {c_type} *outputs)",
+        "{",
+        f"  fill_function_values_{suffix}({function_name}, low, high,"
+        " samples, inputs, outputs);",
+        "}",
+    ]
+    return "\n".join(lines)
+
+
+def sweep_source(numeric_type: NumericType,
+                 function_name: str,
+                 code: str,
+                 oracle_function_name: str,
+                 oracle_code: str):
+    """
+    C source with both the function and its oracle, exposing an exhaustive
+    error sweep over every float in a range
+    """
+    if numeric_type != FP32:
+        raise NotImplementedError("Exhaustive sweeps are only possible for"
+                                  f" FP32, not '{numeric_type.name}'")
+
+    lines = [
+        '#include "exhaustive_measurement.h"',
+        '#include "double_double.h"',
+        '#include "cody_waite_reduction.h"',
+        '',
+        oracle_code,
+        '',
+        code,
+        '',
+        f"void megalibm_sweep_{function_name}("
+        "float low, float high, size_t threads, sweep_result_fp32 *result)",
+        "{",
+        f"  sweep_fp32({function_name}, {oracle_function_name}, low, high,"
+        " threads, result);",
+        "}",
+    ]
+    return "\n".join(lines)
+
+
+# Must match the layout and constants in include/exhaustive_measurement.h
+SWEEP_HISTOGRAM_BINS = 64
+SWEEP_ULP_OFFSET = 32
+
+
+class SweepResult(ctypes.Structure):
+    _fields_ = [
+        ("count", ctypes.c_uint64),
+        ("max_abs_error", ctypes.c_double),
+        ("max_abs_input", ctypes.c_float),
+        ("max_ulp_error", ctypes.c_double),
+        ("max_ulp_input", ctypes.c_float),
+        ("histogram", ctypes.c_uint64 * SWEEP_HISTOGRAM_BINS),
+    ]
+
+    def ulp_histogram(self):
+        """
+        List of (low, high, count) in ulps, bins that are empty are left out
+        """
+        bins = list()
+        for i, count in enumerate(self.histogram):
+            if count == 0:
+                continue
+            if i == 0:
+                low, high = 0.0, 0.0
+            else:
+                low = 2.0**(i - 1 - SWEEP_ULP_OFFSET)
+                high = 2.0**(i - SWEEP_ULP_OFFSET)
+                if i == 1:
+                    low = 0.0
+                if i == SWEEP_HISTOGRAM_BINS - 1:
+                    high = float("inf")
+            bins.append((low, high, count))
+        return bins
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "max_abs_error": self.max_abs_error,
+            "max_abs_input": self.max_abs_input,
+            "max_ulp_error": self.max_ulp_error,
+            "max_ulp_input": self.max_ulp_input,
+            "ulp_histogram": self.ulp_histogram(),
+        }
+
+
+class TimingResult(ctypes.Structure):
+    """
+    Summary of the timing trials, times are in nanoseconds per call
+    """
+    _fields_ = [
+        ("median", ctypes.c_double),
+        ("mad", ctypes.c_double),
+        ("min", ctypes.c_double),
+        ("max", ctypes.c_double),
+        ("trials", ctypes.c_uint64),
+        ("samples", ctypes.c_uint64),
+    ]
+
+    def to_dict(self):
+        return {
+            "median": self.median,
+            "mad": self.mad,
+            "min": self.min,
+            "max": self.max,
+            "trials": self.trials,
+            "samples": self.samples,
+        }
+
+
+class PerfResult(ctypes.Structure):
+    """
+    Hardware counter averages per call, nan where a counter was not
+    available
+    """
+    _fields_ = [
+        ("cycles", ctypes.c_double),
+        ("instructions", ctypes.c_double),
+        ("branch_misses", ctypes.c_double),
+        ("cache_misses", ctypes.c_double),
+    ]
+
+    def available(self):
+        return any(math.isfinite(v) for v in [self.cycles,
+                                              self.instructions,
+                                              self.branch_misses,
+                                              self.cache_misses])
+
+    def to_dict(self):
+        """
+        Counts per call with the instructions per cycle, missing counters
+        are None so they can be written to json
+        """
+        def value(v):
+            return v if math.isfinite(v) else None
+
+        ipc = None
+        if math.isfinite(self.cycles) and math.isfinite(self.instructions) \
+                and self.cycles > 0:
+            ipc = self.instructions / self.cycles
+        return {
+            "cycles": value(self.cycles),
+            "instructions": value(self.instructions),
+            "ipc": ipc,
+            "branch_misses": value(self.branch_misses),
+            "cache_misses": value(self.cache_misses),
+        }
+
+
+def _call_loaded(method, library, args, kwargs):
+    library.isolated = False
+    return method(library, *args, **kwargs)
+
+
+def _isolated(method):
+    # Runs the method in a child process when the library is isolated
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.isolated:
+            return method(self, *args, **kwargs)
+        return run_in_child(_call_loaded, method, self, args, kwargs)
+    return wrapper
+
+
+class MeasurementLibrary():
+    """
+    A compiled function (or oracle) that any number of timing and error runs
+    can be made with without recompiling.
+    When `isolated` the library is only loaded by the child process each run
+    is made in, otherwise it is loaded into this process.
+    """
+
+    def __init__(self, numeric_type, function_name, libname,
+                 isolated: bool = ISOLATED):
+        self.numeric_type = numeric_type
+        self.function_name = function_name
+        self.libname = libname
+        self.isolated = isolated
+        self.lib = None if isolated else ctypes.CDLL(libname)
+        self.value_type = _CTYPES[numeric_type]
+        self.dtype = _DTYPES[numeric_type]
+
+    def __repr__(self):
+        return "MeasurementLibrary({}, {}, {})".format(
+            self.numeric_type.name,
+            repr(self.function_name),
+            repr(self.libname))
+
+    def _entry(self, kind, argtypes, restype=None):
+        if self.lib is None:
+            self.lib = ctypes.CDLL(self.libname)
+        func = getattr(self.lib, f"megalibm_{kind}_{self.function_name}")
+        func.argtypes = argtypes
+        func.restype = restype
+        return func
+
+    @_isolated
+    def timing(self, low: float, high: float, samples: int, trials: int,
+               mode: str = "throughput",
+               warmup: int = TIMING_WARMUP, cpu: int = TIMING_CPU):
+        """
+        Times `trials` passes over `samples` precomputed inputs after
+        `warmup` untimed passes, pinned to `cpu` if it is not negative.
+        In "throughput" mode the calls are independent, in "latency" mode
+        each call waits on the one before it.
+        """
+        if mode not in TIMING_MODES:
+            raise ValueError(f"Unknown timing mode '{mode}'")
+        vt = self.value_type
+        func = self._entry("timing",
+                           [vt, vt, ctypes.c_size_t, ctypes.c_size_t,
+                            ctypes.c_size_t, ctypes.c_int, ctypes.c_int,
+                            ctypes.POINTER(TimingResult)])
+        result = TimingResult()
+        func(low, high, samples, trials, warmup, TIMING_MODES[mode], cpu,
+             ctypes.byref(result))
+        return result
+
+    def time(self, low: float, high: float, samples: int, iters: int,
+             mode: str = "throughput"):
+        """
+        Median nanoseconds per call over `iters` trials
+        """
+        return self.timing(low, high, samples, iters, mode).median
+
+    @_isolated
+    def counters(self, low: float, high: float, samples: int, passes: int,
+                 mode: str = "throughput", cpu: int = TIMING_CPU):
+        """
+        Hardware counters over `passes` passes of the timing inputs, done
+        separately from timing. Uses perf_event_open, so on other platforms,
+        or when the kernel does not allow it, every counter is missing.
+        """
+        if mode not in TIMING_MODES:
+            raise ValueError(f"Unknown timing mode '{mode}'")
+        vt = self.value_type
+        func = self._entry("counters",
+                           [vt, vt, ctypes.c_size_t, ctypes.c_size_t,
+                            ctypes.c_int, ctypes.c_int,
+                            ctypes.POINTER(PerfResult)])
+        result = PerfResult()
+        func(low, high, samples, passes, TIMING_MODES[mode], cpu,
+             ctypes.byref(result))
+        return result
+
+    def _array_type(self):
+        return np.ctypeslib.ndpointer(dtype=self.dtype, ndim=1,
+                                      flags="C_CONTIGUOUS")
+
+    @_isolated
+    def function_values(self, low: float, high: float, samples: int):
+        """
+        Returns numpy arrays of the sampled inputs and function outputs, the
+        C code writes directly into them
+        """
+        vt = self.value_type
+        arr = self._array_type()
+        func = self._entry("function_values",
+                           [vt, vt, ctypes.c_size_t, arr, arr])
+        inputs = np.empty(samples, dtype=self.dtype)
+        outputs = np.empty(samples, dtype=self.dtype)
+        func(low, high, samples, inputs, outputs)
+        return inputs, outputs
+
+    @_isolated
+    def oracle_values(self, low: float, high: float, samples: int,
+                      threads: int = ORACLE_THREADS):
+        """
+        Returns numpy arrays of the sampled inputs, the correctly rounded
+        outputs, and the difference from the real value to those.
+        The oracle is run on `threads` threads, 0 meaning every cpu.
+        """
+        vt = self.value_type
+        arr = self._array_type()
+        func = self._entry("oracle_values",
+                           [vt, vt, ctypes.c_size_t, ctypes.c_size_t,
+                            arr, arr, arr])
+        inputs = np.empty(samples, dtype=self.dtype)
+        correctly_rounded = np.empty(samples, dtype=self.dtype)
+        diffs = np.empty(samples, dtype=self.dtype)
+        func(low, high, samples, threads, inputs, correctly_rounded, diffs)
+        return inputs, correctly_rounded, diffs
+
+    @_isolated
+    def sweep(self, low: float, high: float, threads: int = 0):
+        """
+        Exhaustive error of every float in [low, high] against the oracle,
+        reduced in C so only the summary comes back
+        """
+        vt = self.value_type
+        func = self._entry("sweep",
+                           [vt, vt, ctypes.c_size_t,
+                            ctypes.POINTER(SweepResult)])
+        result = SweepResult()
+        func(low, high, threads, ctypes.byref(result))
+        return result
+
+
+def _measurement_flags(flags):
+    flags = list(DEFAULT_FLAGS) if flags is None else list(flags)
+    return flags + [f"-DMEASUREMENT_SEED={MEASUREMENT_SEED}"]
+
+
+def load_sweep_library(numeric_type: NumericType,
+                       function_name: str,
+                       code: str,
+                       oracle_function_name: str,
+                       oracle_code: str,
+                       flags: list = None):
+    source = sweep_source(numeric_type, function_name, code,
+                          oracle_function_name, oracle_code)
+    libname = compile_shared_library(source, flags=_measurement_flags(flags))
+    if libname not in LOADED:
+        logger("Loading shared library: {}", libname)
+        LOADED[libname] = MeasurementLibrary(numeric_type,
+                                             function_name,
+                                             libname)
+    return LOADED[libname]
+
+
+def load_measurement_library(numeric_type: NumericType,
+                             function_name: str,
+                             code: str,
+                             is_oracle: bool = False,
+                             flags: list = None):
+    source = measurement_source(numeric_type, function_name, code, is_oracle)
+    libname = compile_shared_library(source, flags=_measurement_flags(flags))
+    if libname not in LOADED:
+        logger("Loading shared library: {}", libname)
+        LOADED[libname] = MeasurementLibrary(numeric_type,
+                                             function_name,
+                                             libname)
+    return LOADED[libname]
@@ -16,7 +16,9 @@ sys.path.append(EGG_DIR)
 
 import template_identities
 import fpcore
+import snake_egg_rules
 from utils import Logger, Timer
+from work_pool import run_work_items
 
 logger = Logger(Logger.LOW, color=Logger.blue, def_color=Logger.cyan)
 timer = Timer()
@@ -34,6 +36,20 @@ def parse_arguments(argv):
                         nargs="?",
                         type=str,
                         help="Redirect logging to given file.")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=1,
+                        help="Number of functions to run at once")
+    parser.add_argument("-t", "--timeout",
+                        type=float,
+                        default=None,
+                        help="Seconds allowed per function, runs each"
+                        " function in its own process")
+    parser.add_argument("-r", "--results-dir",
+                        type=str,
+                        default=None,
+                        help="Directory for per function results, finished"
+                        " functions found there are not run again")
     parser.add_argument("dirname",
                         help="Directory with the fpcore files")
     args = parser.parse_args(argv[1:])
@@ -55,6 +71,9 @@ def parse_arguments(argv):
     logger.dlog("    dirname: {}", args.dirname)
     logger.dlog("  verbosity: {}", args.verbosity)
     logger.dlog("   log-file: {}", args.log_file)
+    logger.dlog("       jobs: {}", args.jobs)
+    logger.dlog("    timeout: {}", args.timeout)
+    logger.dlog("results-dir: {}", args.results_dir)
 
     return args
 
@@ -144,6 +163,14 @@ def write_identity_webpage(filename, identities):
         f.write(text)
 
 
+def results_version():
+    # Saved results are only reused with the same rules, finder and limits
+    finder_version = snake_egg_rules.source_version(template_identities.__file__)
+    return "\n".join([snake_egg_rules.RULES_VERSION,
+                      finder_version,
+                      str(template_identities.ITERS)])
+
+
 def handle_work_item(func):
     func.remove_let()
 
@@ -188,7 +215,12 @@ def main(argv):
         logger.warning("Dropping {}", name)
 
     # Run the identity finder
-    tuples = [handle_work_item(func) for func in work_items]
+    tuples = run_work_items(handle_work_item,
+                            work_items,
+                            jobs=args.jobs,
+                            timeout=args.timeout,
+                            results_dir=args.results_dir,
+                            version=results_version())
 
     # Get some statistics
     per_func_identities = dict(tuples)
@@ -52,6 +52,13 @@ fi
 #   esac
 # fi
 
+# Results of earlier nightlies are reused when nothing that goes into them
+# has changed, pass "rebuild" to measure everything again
+REBUILD_FLAG=()
+if [ "${1:-}" = "rebuild" ]; then
+  REBUILD_FLAG=("--rebuild")
+fi
+
 # Data
 NIGHTLY_TIMESTAMP=$(date +%s)
 CORES="$(getconf _NPROCESSORS_ONLN)"
@@ -63,7 +70,7 @@ mkdir "${THIS_NIGHTLY_LOCATION}"
 
 cd "${SCRIPT_LOCATION}"
 for e in "${GIT_LOCATION}"/mlms_core/*.py ; do
-  time python3 "run_example" "${e}" "$THIS_NIGHTLY_LOCATION"
+  time python3 "run_example" "${REBUILD_FLAG[@]}" "${e}" "$THIS_NIGHTLY_LOCATION"
 done
 # time python3 "run_tds" "$TDS_LOCATION" "$THIS_NIGHTLY_LOCATION"
 
@@ -81,7 +88,7 @@ mkdir "${NEXT_NIGHTLY_LOCATION}"
 
 cd "${SCRIPT_LOCATION}"
 for e in "${GIT_LOCATION}"/mlms_better/*.py ; do
-  time python3 "run_example" "${e}" "$NEXT_NIGHTLY_LOCATION"
+  time python3 "run_example" "${REBUILD_FLAG[@]}" "${e}" "$NEXT_NIGHTLY_LOCATION"
 done
 
 mv "${GIT_LOCATION}/generated/${NEXT_NIGHTLY_TIMESTAMP}/generated" "${NEXT_NIGHTLY_LOCATION}"
@@ -101,7 +108,7 @@ SYNTH_LOCATION=${GIT_LOCATION}/mlms_synth
 
 
 cd "${SCRIPT_LOCATION}"
-time python3 "run_tds" "$SYNTH_LOCATION" "$FINAL_NIGHTLY_LOCATION"
+time python3 "run_tds" "${REBUILD_FLAG[@]}" "$SYNTH_LOCATION" "$FINAL_NIGHTLY_LOCATION"
 
 mv "${GIT_LOCATION}/generated/${FINAL_TIMESTAMP}/generated" "${FINAL_NIGHTLY_LOCATION}"
 
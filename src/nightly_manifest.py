@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import os.path as path
+import platform
+import shutil
+
+from compile import (DEFAULT_COMPILER, DEFAULT_FLAGS, DEFAULT_LINK_FLAGS,
+                     compiler_version, include_hash)
+from measurement_library import MEASUREMENT_SEED, TIMING_CPU
+from utils import Logger
+
+logger = Logger(level=Logger.MEDIUM, color=Logger.blue)
+
+SRC_DIR = path.dirname(path.abspath(__file__))
+
+MANIFEST_NAME = "manifest.json"
+
+# Changes to these can change measured numbers without changing any
+# generated code
+MEASUREMENT_SOURCES = [
+    "compile.py",
+    "error_function.py",
+    "measurement_library.py",
+    "time_function.py",
+    "vector_check.py",
+]
+
+
+def _sha256(text: str):
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
+
+
+def source_hash(filenames: list):
+    hasher = hashlib.sha256()
+    for fname in filenames:
+        with open(path.join(SRC_DIR, fname), "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def manifest_inputs(sources: dict, settings: dict):
+    """
+    Hash of every input to one nightly entry.
+    `sources` maps names to text (example source, generated C, ...),
+    `settings` the measurement settings, which must be json serializable.
+    The headers, compiler, flags, measurement code and machine are added.
+    """
+    inputs = {name: _sha256(text) for name, text in sources.items()}
+    inputs["settings"] = _sha256(json.dumps(settings, sort_keys=True))
+    inputs["headers"] = include_hash()
+    inputs["compiler"] = _sha256("\n".join([DEFAULT_COMPILER,
+                                            compiler_version(),
+                                            *DEFAULT_FLAGS,
+                                            *DEFAULT_LINK_FLAGS]))
+    inputs["measurement"] = source_hash(MEASUREMENT_SOURCES)
+    inputs["machine"] = _sha256("\n".join([platform.node(),
+                                           platform.machine(),
+                                           str(MEASUREMENT_SEED),
+                                           str(TIMING_CPU)]))
+    return inputs
+
+
+def manifest_key(inputs: dict):
+    return _sha256(json.dumps(inputs, sort_keys=True))
+
+
+def read_manifest(dirname: str):
+    try:
+        with open(path.join(dirname, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(dirname: str, inputs: dict):
+    """
+    Record the inputs and the files produced for them, call once the entry
+    has been written
+    """
+    outputs = sorted(fname for fname in os.listdir(dirname)
+                     if fname == "data.json" or fname.endswith(".png"))
+    manifest = {
+        "key": manifest_key(inputs),
+        "inputs": inputs,
+        "outputs": outputs,
+    }
+    with open(path.join(dirname, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def previous_entries(nightly_location: str, name: str):
+    """
+    Output directories for `name` in earlier nightlies next to
+    `nightly_location`, newest first
+    """
+    nightlies = path.dirname(path.abspath(nightly_location))
+    this = path.basename(path.abspath(nightly_location))
+    if not path.isdir(nightlies):
+        return list()
+    stamps = [d for d in os.listdir(nightlies) if d.isdigit() and d != this]
+    stamps.sort(key=int, reverse=True)
+    entries = [path.join(nightlies, d, "generated", name) for d in stamps]
+    return [e for e in entries if path.isfile(path.join(e, MANIFEST_NAME))]
+
+
+def reuse_previous(nightly_location: str, name: str, inputs: dict,
+                   out_dir: str):
+    """
+    Copy the outputs of the newest earlier nightly entry made from the same
+    inputs into `out_dir`. Returns True if that was possible.
+    """
+    key = manifest_key(inputs)
+    entries = previous_entries(nightly_location, name)
+    for entry in entries:
+        manifest = read_manifest(entry)
+        if manifest is None or manifest.get("key") != key:
+            continue
+        outputs = manifest.get("outputs", list())
+        if not all(path.isfile(path.join(entry, o)) for o in outputs):
+            continue
+        for fname in outputs:
+            shutil.copy2(path.join(entry, fname), path.join(out_dir, fname))
+        write_manifest(out_dir, inputs)
+        logger("Reusing results for {} from {}", name, entry)
+        return True
+
+    # Say what changed since the last run to make rebuilds explainable
+    if len(entries) != 0:
+        manifest = read_manifest(entries[0]) or dict()
+        old_inputs = manifest.get("inputs", dict())
+        changed = sorted(k for k in set(inputs) | set(old_inputs)
+                         if inputs.get(k) != old_inputs.get(k))
+        logger("Rebuilding {}, changed: {}", name, ", ".join(changed))
+    return False
@@ -25,6 +25,7 @@ class FP32(NumericType):
     c_type = "float"
     name = "FP32"
     suffix = "f"
+    precision = 24
 
 
     @classmethod
@@ -50,6 +51,7 @@ class FP64(NumericType):
     c_type = "double"
     name = "FP64"
     suffix = ""
+    precision = 53
 
     @classmethod
     def num_to_str(self, x):
@@ -70,6 +72,7 @@ class FPDD(NumericType):
     sollya_type = "DD"
     c_type = "dd"
     name = "FPDD"
+    precision = 106
 
     @classmethod
     def num_to_str(self, x):
@@ -6,12 +6,17 @@ import os
 import os.path as path
 import shutil
 import sys
-from error_function import error_function
+from error_function import error_function, error_sweep
 
 import fpcore
 import lambdas
-from numeric_types import FP64
-from time_function import time_function
+from nightly_manifest import (manifest_inputs, reuse_previous, source_hash,
+                              write_manifest)
+from numeric_types import FP32, FP64
+from time_function import function_counters, time_function_stats
+from compile import REPRODUCIBLE_FLAGS
+from tune_polynomials import tune_polynomials, use_fma
+from vector_check import vector_mismatches
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -42,6 +47,40 @@ def parse_arguments(argv):
                         nargs="?",
                         type=str,
                         help="Redirect logging to given file.")
+    parser.add_argument("-e", "--exhaustive",
+                        action="store_true",
+                        help="Measure FP32 error on every float in each"
+                        " domain instead of sampling")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=None,
+                        help="Threads used for exhaustive sweeps, defaults"
+                        " to every cpu")
+    parser.add_argument("-c", "--counters",
+                        action="store_true",
+                        help="Also record hardware performance counters per"
+                        " call, when perf_event_open is available")
+    parser.add_argument("-t", "--tune",
+                        action="store_true",
+                        help="Pick the fastest evaluation scheme for each"
+                        " polynomial that keeps the error on the first input"
+                        " range")
+    parser.add_argument("-f", "--fma",
+                        action="store_true",
+                        help="Evaluate every polynomial with explicit fma,"
+                        " implies --reproducible")
+    parser.add_argument("-p", "--reproducible",
+                        action="store_true",
+                        help="Compile the generated code with fp contraction"
+                        " off, so only explicit fma are used")
+    parser.add_argument("-V", "--vector",
+                        action="store_true",
+                        help="Also check that the array version of the"
+                        " lambda gives the same results as the scalar one")
+    parser.add_argument("-r", "--rebuild",
+                        action="store_true",
+                        help="Measure again even when an earlier nightly"
+                        " has results for the same inputs")
     parser.add_argument("example_file",
                         help="File to run")
     parser.add_argument("nightly_location",
@@ -66,6 +105,14 @@ def parse_arguments(argv):
     # logger.dlog("      dirname: {}", args.dirname)
     logger.dlog("    verbosity: {}", args.verbosity)
     logger.dlog("     log-file: {}", args.log_file)
+    logger.dlog("   exhaustive: {}", args.exhaustive)
+    logger.dlog("         jobs: {}", args.jobs)
+    logger.dlog("     counters: {}", args.counters)
+    logger.dlog("         tune: {}", args.tune)
+    logger.dlog("          fma: {}", args.fma)
+    logger.dlog(" reproducible: {}", args.reproducible)
+    logger.dlog("       vector: {}", args.vector)
+    logger.dlog("      rebuild: {}", args.rebuild)
     logger.dlog(" example_file: {}", args.example_file)
     return args
 
@@ -189,13 +236,24 @@ def main(argv):
     precision = example_globals.get("numeric_type", FP64)
     func_type = example_globals.get("func_type", FP64)
 
-    # Generate the code
+    # Get input ranges
+    input_ranges = example_globals.get("input_ranges")
+    if input_ranges is None:
+        logger.error("File '{}' must define the variable `input_ranges`",
+                     args.example_file)
+        sys.exit(1)
+
+    # Tuned and fma lambdas are measured with the flags they were tuned with
+    lambda_flags = None
+    if args.fma or args.reproducible or args.tune:
+        lambda_flags = list(REPRODUCIBLE_FLAGS)
+
+    # Generate the code, before tuning so earlier results can be found
+    # without tuning again
     lambda_signature, lines = lambdas.generate_c_code(lambda_expression,
                                                       lambda_function_name, numeric_type=precision, func_type=func_type)
     lambda_code = "\n".join(lines)
 
-    print(lambda_code)
-
     # Use the function and type to create an oracle
     oracle_function_name = "oracle"
     oracle_signature, lines = lambdas.generate_mpfr_c_code(oracle_impl_type,
@@ -214,13 +272,6 @@ def main(argv):
     # points_per_pad = example_globals.get("points_per_pad", 4096)
     # repeats_per_time = example_globals.get("repeats_per_time", 100000)
 
-    # Get input ranges
-    input_ranges = example_globals.get("input_ranges")
-    if input_ranges is None:
-        logger.error("File '{}' must define the variable `input_ranges`",
-                     args.example_file)
-        sys.exit(1)
-
     # Create gen dirs 
     THIS_GEN_DIR = GEN_DIR + f"/{NIGHTLY_TS}/"
     if not os.path.exists(THIS_GEN_DIR):
@@ -243,40 +294,163 @@ def main(argv):
     json_ranges = dict()
     json_dict = dict()
 
+    exhaustive = args.exhaustive
+    if exhaustive and func_type != FP32:
+        logger.warning("Exhaustive sweeps need FP32, sampling {} instead",
+                       func_type.name)
+        exhaustive = False
+
+    # Everything that goes into the measurements, when an earlier nightly
+    # measured exactly this its results are copied instead
+    manifest = manifest_inputs(
+        sources={
+            "example": example,
+            "untuned lambda": lambda_code,
+            "reference": reference_code or "",
+            "oracle": oracle_code,
+        },
+        settings={
+            "func_type": func_type.name,
+            "input_ranges": [str(domain) for domain in input_ranges],
+            "error_samples": 2**17,
+            "exhaustive": exhaustive,
+            "timing_modes": ["throughput", "latency"],
+            "counters": args.counters,
+            "lambda_flags": lambda_flags,
+            "fma": args.fma,
+            "tune": args.tune,
+            "vector": args.vector,
+            "tuner": (source_hash(["tune_polynomials.py"])
+                      if args.fma or args.tune else None),
+        })
+    if not args.rebuild and reuse_previous(NIGHTLY_LOCATION,
+                                           lambda_function_name,
+                                           manifest, OUT_DIR):
+        return 0
+
+    if args.fma:
+        lambda_expression = use_fma(lambda_expression)
+
+    if args.tune:
+        lambda_expression, lambda_flags = tune_polynomials(lambda_expression,
+                                                           input_ranges[0],
+                                                           numeric_type=precision,
+                                                           func_type=func_type)
+
+    if args.fma or args.tune:
+        lambda_signature, lines = lambdas.generate_c_code(lambda_expression,
+                                                          lambda_function_name, numeric_type=precision, func_type=func_type)
+        lambda_code = "\n".join(lines)
+
+    print(lambda_code)
+
+    # Both sides are built the same way so the comparison is fair
+    reference_flags = lambda_flags
+
     for idx, domain in enumerate(input_ranges):
-        lambda_time =  time_function(numeric_type=func_type,
+        lambda_time =  time_function_stats(numeric_type=func_type,
                                          c_function_name=lambda_function_name,
                                          c_code=lambda_code,
-                                         domain=domain)
-        reference_time = time_function(numeric_type=func_type,
+                                         domain=domain,
+                                         flags=lambda_flags)
+        reference_time = time_function_stats(numeric_type=func_type,
                                             c_function_name=reference_function_name,
                                             c_code=reference_code,
-                                            domain=domain)
+                                            domain=domain,
+                                            flags=reference_flags)
+        lambda_latency = time_function_stats(numeric_type=func_type,
+                                             c_function_name=lambda_function_name,
+                                             c_code=lambda_code,
+                                             domain=domain,
+                                             mode="latency",
+                                             flags=lambda_flags)
+        reference_latency = time_function_stats(numeric_type=func_type,
+                                                c_function_name=reference_function_name,
+                                                c_code=reference_code,
+                                                domain=domain,
+                                                mode="latency",
+                                                flags=reference_flags)
         lambda_error = error_function(numeric_type=func_type,
                                            samples=2**17,
                                            c_function_name=lambda_function_name,
                                            c_code=lambda_code,
                                            oracle_function_name=oracle_function_name,
                                            oracle_code=oracle_code,
-                                           domain=domain)
+                                           domain=domain,
+                                           flags=lambda_flags)
         reference_error = error_function(numeric_type=func_type,
                                            samples=2**17,
                                            c_function_name=reference_function_name,
                                            c_code=reference_code,
                                            oracle_function_name=oracle_function_name,
                                            oracle_code=oracle_code,
-                                           domain=domain)
+                                           domain=domain,
+                                           flags=reference_flags)
         
         fname = OUT_DIR + f"/{lambda_function_name}_domain_{idx}_absolute_error_abs_max_errors.png"
         
         save_domain_plot(lambda_error, reference_error, lambda_function_name, reference_function_name, fname)
         
         json_range = {
-            "MLM time": float(format_float(lambda_time)),
-            "Reference time": float(format_float(reference_time)),
+            "MLM time": float(format_float(lambda_time["median"])),
+            "Reference time": float(format_float(reference_time["median"])),
+            "MLM time MAD": float(format_float(lambda_time["mad"])),
+            "Reference time MAD": float(format_float(reference_time["mad"])),
+            "MLM latency": float(format_float(lambda_latency["median"])),
+            "Reference latency": float(format_float(reference_latency["median"])),
+            "MLM latency MAD": float(format_float(lambda_latency["mad"])),
+            "Reference latency MAD": float(format_float(reference_latency["mad"])),
             "MLM error": float(format_float(lambda_error["f_abs_error"].max())),
             "Reference error":float(format_float(reference_error["f_abs_error"].max())),
         }
+        if args.counters:
+            json_range["MLM counters"] = function_counters(numeric_type=func_type,
+                                                           c_function_name=lambda_function_name,
+                                                           c_code=lambda_code,
+                                                           domain=domain,
+                                                           flags=lambda_flags)
+            json_range["Reference counters"] = function_counters(numeric_type=func_type,
+                                                                 c_function_name=reference_function_name,
+                                                                 c_code=reference_code,
+                                                                 domain=domain,
+                                                                 flags=reference_flags)
+        if exhaustive:
+            lambda_sweep = error_sweep(numeric_type=func_type,
+                                       c_function_name=lambda_function_name,
+                                       c_code=lambda_code,
+                                       oracle_function_name=oracle_function_name,
+                                       oracle_code=oracle_code,
+                                       domain=domain,
+                                       threads=args.jobs,
+                                       flags=lambda_flags)
+            reference_sweep = error_sweep(numeric_type=func_type,
+                                          c_function_name=reference_function_name,
+                                          c_code=reference_code,
+                                          oracle_function_name=oracle_function_name,
+                                          oracle_code=oracle_code,
+                                          domain=domain,
+                                          threads=args.jobs,
+                                          flags=reference_flags)
+            json_range.update({
+                "MLM error": float(format_float(lambda_sweep["max_abs_error"])),
+                "Reference error": float(format_float(reference_sweep["max_abs_error"])),
+                "MLM error input": lambda_sweep["max_abs_input"],
+                "Reference error input": reference_sweep["max_abs_input"],
+                "MLM ulp error": lambda_sweep["max_ulp_error"],
+                "Reference ulp error": reference_sweep["max_ulp_error"],
+                "Inputs checked": lambda_sweep["count"],
+            })
+        if args.vector:
+            check = vector_mismatches(lambda_expression,
+                                      lambda_function_name,
+                                      domain,
+                                      numeric_type=precision,
+                                      func_type=func_type,
+                                      flags=lambda_flags)
+            if check["mismatches"] != 0:
+                logger.warning("Array version differs on {} of {} inputs",
+                               check["mismatches"], check["samples"])
+            json_range["MLM vector mismatches"] = check["mismatches"]
         # dom_str = str(domain)
         dom_str = f"[{str(domain.float_inf)[:7]}, {str(domain.float_sup)[:7]}]"
         json_ranges[dom_str] = json_range
@@ -285,9 +459,13 @@ def main(argv):
     json_dict["table_data"] = json_ranges
     json_dict["func_name"] = lambda_function_name
     json_dict["func_body"] = str(lambda_expression)
+    json_dict["func_flags"] = lambda_flags
+    json_dict["reference_flags"] = reference_flags
 
     with open( OUT_DIR + 'data.json' , 'w') as json_file:
         json.dump(json_dict, json_file)
+
+    write_manifest(OUT_DIR, manifest)
     # 
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ from matplotlib import pyplot as plt
 from error_function import error_function
 from numeric_types import FP64
 
-from time_function import time_function
+from time_function import function_counters, time_function_stats
 
 BIN_DIR = path.abspath(path.dirname(__file__))
 GIT_DIR = path.split(BIN_DIR)[0]
@@ -32,7 +32,9 @@ import lambdas
 import cmd_sollya
 import find_identities
 
-from synthesize import synthesize
+from nightly_manifest import manifest_inputs, reuse_previous, write_manifest
+from synthesize import DEFAULT_BEAM_WIDTH, synthesize
+from work_pool import run_work_items
 from assemble_c_files import *
 from interval import Interval
 
@@ -54,6 +56,33 @@ def parse_arguments(argv):
                         nargs="?",
                         type=str,
                         help="Redirect logging to given file.")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=None,
+                        help="Number of processes to run at once during"
+                             " synthesis and error measurement"
+                             " (default: all cores)")
+    parser.add_argument("-f", "--fuel",
+                        type=int,
+                        default=10,
+                        help="Synthesis search iterations (default: 10)")
+    parser.add_argument("-b", "--beam-width",
+                        type=int,
+                        default=DEFAULT_BEAM_WIDTH,
+                        help="Partial implementations kept per synthesis"
+                             " iteration, only the Pareto front of the"
+                             " completed ones is measured. 0 searches"
+                             " exhaustively and measures every completed"
+                             " implementation"
+                             f" (default: {DEFAULT_BEAM_WIDTH})")
+    parser.add_argument("-c", "--counters",
+                        action="store_true",
+                        help="Also record hardware performance counters per"
+                             " call, when perf_event_open is available")
+    parser.add_argument("-r", "--rebuild",
+                        action="store_true",
+                        help="Measure again even when an earlier nightly"
+                             " has results for the same inputs")
     parser.add_argument("dirname",
                         help="Directory with the fpcore files")
     parser.add_argument("nightly_location",
@@ -83,6 +112,11 @@ def parse_arguments(argv):
     logger.dlog("    dirname: {}", args.dirname)
     logger.dlog("  verbosity: {}", args.verbosity)
     logger.dlog("   log-file: {}", args.log_file)
+    logger.dlog("       jobs: {}", args.jobs)
+    logger.dlog("       fuel: {}", args.fuel)
+    logger.dlog(" beam-width: {}", args.beam_width)
+    logger.dlog("   counters: {}", args.counters)
+    logger.dlog("    rebuild: {}", args.rebuild)
 
     return args
 
@@ -225,12 +259,53 @@ def save_domain_plot(left_data, right_data, left_name, right_name, fname, sample
     return axes
 
 
-def generate_all_code(function, domain, location):
+ERROR_SAMPLES = 2**17
+
+
+class MeasurementCell():
+    """
+    One function to measure on one domain, with the oracle to measure against
+    and the number of threads the oracle may use
+    """
+
+    def __init__(self, func_name, code, oracle_name, oracle_code, domain,
+                 oracle_threads):
+        self.func_name = func_name
+        self.code = code
+        self.oracle_name = oracle_name
+        self.oracle_code = oracle_code
+        self.domain = domain
+        self.oracle_threads = oracle_threads
+
+    def get_any_name(self):
+        return f"{self.func_name} on {self.domain}"
+
+
+def measure_error(cell):
+    """
+    Max absolute error of one cell, run in a worker so only the summary is
+    sent back
+    """
+    error = error_function(numeric_type=FP64,
+                           samples=ERROR_SAMPLES,
+                           c_function_name=cell.func_name,
+                           c_code=cell.code,
+                           oracle_function_name=cell.oracle_name,
+                           oracle_code=cell.oracle_code,
+                           domain=cell.domain,
+                           oracle_threads=cell.oracle_threads)
+    return cell.func_name, str(cell.domain), float(error["f_abs_error"].max())
+
+
+def generate_all_code(function, domain, location, jobs=None,
+                      nightly_location=None, rebuild=False, counters=False,
+                      fuel=10, beam_width=DEFAULT_BEAM_WIDTH):
     name = c_ize_name(function)
     target = lambdas.types.Impl(function, domain)
     print("NAME", name)
 
-    my_lambdas = synthesize(target)
+    my_lambdas = synthesize(target, fuel=fuel, jobs=jobs,
+                            beam_width=beam_width or None)
 
     # TODO: handle numeric type current only impl FP64
     # CR and Libm source code
@@ -247,88 +322,153 @@ def generate_all_code(function, domain, location):
         os.mkdir(OUT_DIR)
 
     # Copy header files to run c code and generate data
-    os.chdir(OUT_DIR)
     shutil.copytree(GIT_DIR + "/include", OUT_DIR + "/include",
                     dirs_exist_ok=True)
 
     domains = get_domains(domain)
 
-    # Move to out dir to compile and link files
-    os.chdir(OUT_DIR)
+    libm_code = "\n".join(libm_src)
+    oracle_code = "\n".join(mpfr_src)
 
-    json_dict = dict()
-    best_lambda_ranges = None
-    best_lambda_plot_data = dict()
-    best_lambda_func_name = None
-    least_err  = float("inf")
+    candidates = list()
     for i, lam in enumerate(my_lambdas):
         try:
             func_name = f"my_{name}_{i}"
             sig, src = lambdas.generate_c_code(lam, func_name)
-            lambda_code = "\n".join(src)
-            libm_code = "\n".join(libm_src)
-            oracle_code = "\n".join(mpfr_src)
             logger.blog("C function", "\n".join(src))
-            # TODO : input numeric_type from args
-            lambda_err_sum = 0
-            json_ranges = dict()
-            plot_data = dict()
-            for domain in domains:
-                domain_str = str(domain)
-                lambda_time =  time_function(numeric_type=FP64,
-                                            c_function_name=func_name,
-                                            c_code=lambda_code,
-                                            domain=domain)
-                reference_time = time_function(numeric_type=FP64,
-                                                    c_function_name=libm_func_name,
-                                                    c_code=libm_code,
-                                                    domain=domain)
-                lambda_error = error_function(numeric_type=FP64,
-                                                samples=2**17,
-                                                c_function_name=func_name,
-                                                c_code=lambda_code,
-                                                oracle_function_name=mpfr_func_name,
-                                                oracle_code=oracle_code,
-                                                domain=domain)
-                reference_error = error_function(numeric_type=FP64,
-                                                samples=2**17,
-                                                c_function_name=libm_func_name,
-                                                c_code=libm_code,
-                                                oracle_function_name=mpfr_func_name,
-                                                oracle_code=oracle_code,
-                                                domain=domain)
-
-                if domain_str not in plot_data:
-                    plot_data[domain_str] = dict()
-
-                plot_data[domain_str]["lambda_error"] = lambda_error
-                plot_data[domain_str]["reference_error"] = reference_error
-
-                json_range = {
-                    "MLM time": float(format_float(lambda_time)),
-                    "Reference time": float(format_float(reference_time)),
-                    "MLM error": float(format_float(lambda_error["f_abs_error"].max())),
-                    "Reference error":float(format_float(reference_error["f_abs_error"].max())),
-                }
-
-                json_ranges[domain_str] = json_range
-
-                lambda_err_sum += lambda_error["f_abs_error"].max()
-
-            if lambda_err_sum < least_err:
-                least_err = lambda_err_sum
-                best_lambda_ranges = json_ranges
-                best_lambda_func_name = func_name
-                best_lambda_plot_data = plot_data
-                best_lambda_body = str(lam)
-
-            # gen_sigs.append(sig)
-            # gen_srcs.append(src)
-            # gen_func_names.append(func_name)
-            # gen_lams.append(lam)
+            candidates.append((func_name, "\n".join(src), lam))
         except cmd_sollya.FailedGenError:
             logger.warning("Unable to generate polynomial, skipping")
 
+    if len(candidates) == 0:
+        return False
+
+    # Everything that goes into the measurements, when an earlier nightly
+    # measured exactly this its results are copied instead
+    manifest = manifest_inputs(
+        sources={
+            "function": str(function),
+            "lambdas": "\n".join(str(lam) for _, _, lam in candidates),
+            "candidates": "\n".join(code for _, code, _ in candidates),
+            "libm": libm_code,
+            "oracle": oracle_code,
+        },
+        settings={
+            "func_type": FP64.name,
+            "domains": [str(d) for d in domains],
+            "error_samples": ERROR_SAMPLES,
+            "timing_modes": ["throughput", "latency"],
+            "counters": counters,
+        })
+    if (nightly_location is not None
+            and not rebuild
+            and reuse_previous(nightly_location, name, manifest, OUT_DIR)):
+        return True
+
+    # Errors for every candidate on every domain are independent, the
+    # references go first so the oracle values are cached for the rest
+    # The cores are split between the jobs and the oracle threads in each
+    if jobs is None:
+        jobs = os.cpu_count()
+    oracle_threads = max(1, (os.cpu_count() or 1) // max(jobs, 1))
+    reference_cells = [MeasurementCell(libm_func_name, libm_code,
+                                       mpfr_func_name, oracle_code, d,
+                                       oracle_threads)
+                       for d in domains]
+    candidate_cells = [MeasurementCell(func_name, code,
+                                       mpfr_func_name, oracle_code, d,
+                                       oracle_threads)
+                       for func_name, code, _ in candidates
+                       for d in domains]
+    errors = dict()
+    for cells in [reference_cells, candidate_cells]:
+        for func_name, domain_str, err in run_work_items(measure_error,
+                                                         cells,
+                                                         jobs=jobs):
+            errors[func_name, domain_str] = err
+
+    # TODO : input numeric_type from args
+    # Timing is done one function at a time so runs do not compete for the
+    # machine, the libraries were already built by the error runs
+    reference_times = {str(d): time_function_stats(numeric_type=FP64,
+                                                   c_function_name=libm_func_name,
+                                                   c_code=libm_code,
+                                                   domain=d)
+                       for d in domains}
+    reference_latencies = {str(d): time_function_stats(numeric_type=FP64,
+                                                       c_function_name=libm_func_name,
+                                                       c_code=libm_code,
+                                                       domain=d,
+                                                       mode="latency")
+                           for d in domains}
+    reference_counters = dict()
+    if counters:
+        reference_counters = {str(d): function_counters(numeric_type=FP64,
+                                                        c_function_name=libm_func_name,
+                                                        c_code=libm_code,
+                                                        domain=d)
+                              for d in domains}
+
+    json_dict = dict()
+    best_lambda_ranges = None
+    best_lambda_func_name = None
+    least_err  = float("inf")
+    for func_name, lambda_code, lam in candidates:
+        if any((func_name, str(d)) not in errors for d in domains):
+            logger.warning("Error measurement failed for {}, skipping",
+                           func_name)
+            continue
+
+        lambda_err_sum = 0
+        json_ranges = dict()
+        for domain in domains:
+            domain_str = str(domain)
+            lambda_time =  time_function_stats(numeric_type=FP64,
+                                              c_function_name=func_name,
+                                              c_code=lambda_code,
+                                              domain=domain)
+            lambda_latency = time_function_stats(numeric_type=FP64,
+                                                 c_function_name=func_name,
+                                                 c_code=lambda_code,
+                                                 domain=domain,
+                                                 mode="latency")
+            reference_time = reference_times[domain_str]
+            reference_latency = reference_latencies[domain_str]
+            lambda_error = errors[func_name, domain_str]
+            reference_error = errors.get((libm_func_name, domain_str),
+                                         float("nan"))
+
+            json_range = {
+                "MLM time": float(format_float(lambda_time["median"])),
+                "Reference time": float(format_float(reference_time["median"])),
+                "MLM time MAD": float(format_float(lambda_time["mad"])),
+                "Reference time MAD": float(format_float(reference_time["mad"])),
+                "MLM latency": float(format_float(lambda_latency["median"])),
+                "Reference latency": float(format_float(reference_latency["median"])),
+                "MLM latency MAD": float(format_float(lambda_latency["mad"])),
+                "Reference latency MAD": float(format_float(reference_latency["mad"])),
+                "MLM error": float(format_float(lambda_error)),
+                "Reference error":float(format_float(reference_error)),
+            }
+
+            if counters:
+                json_range["MLM counters"] = function_counters(numeric_type=FP64,
+                                                               c_function_name=func_name,
+                                                               c_code=lambda_code,
+                                                               domain=domain)
+                json_range["Reference counters"] = reference_counters[domain_str]
+
+            json_ranges[domain_str] = json_range
+
+            lambda_err_sum += lambda_error
+
+        if lambda_err_sum < least_err:
+            least_err = lambda_err_sum
+            best_lambda_ranges = json_ranges
+            best_lambda_func_name = func_name
+            best_lambda_code = lambda_code
+            best_lambda_body = str(lam)
+
     if not best_lambda_ranges:
         return False
 
@@ -336,16 +476,34 @@ def generate_all_code(function, domain, location):
     json_dict["func_name"] = best_lambda_func_name
     json_dict["func_body"] = best_lambda_body
 
-    # SAVE plots for the best performing lambda
-    for idx, domain in enumerate(sorted(best_lambda_ranges.keys())):
+    # SAVE plots for the best performing lambda, only its error data is
+    # remade, the oracle values come from the cache
+    domains_by_str = {str(d): d for d in domains}
+    for idx, domain_str in enumerate(sorted(best_lambda_ranges.keys())):
+        domain = domains_by_str[domain_str]
+        lambda_error = error_function(numeric_type=FP64,
+                                      samples=ERROR_SAMPLES,
+                                      c_function_name=best_lambda_func_name,
+                                      c_code=best_lambda_code,
+                                      oracle_function_name=mpfr_func_name,
+                                      oracle_code=oracle_code,
+                                      domain=domain)
+        reference_error = error_function(numeric_type=FP64,
+                                         samples=ERROR_SAMPLES,
+                                         c_function_name=libm_func_name,
+                                         c_code=libm_code,
+                                         oracle_function_name=mpfr_func_name,
+                                         oracle_code=oracle_code,
+                                         domain=domain)
         fname = OUT_DIR + f"/{best_lambda_func_name}_domain_{idx}_absolute_error_abs_max_errors.png"
-        save_domain_plot(best_lambda_plot_data[str(domain)]["lambda_error"],
-                         best_lambda_plot_data[str(domain)]["reference_error"],
+        save_domain_plot(lambda_error, reference_error,
                          best_lambda_func_name, libm_func_name, fname)
 
     with open( OUT_DIR + 'data.json' , 'w') as json_file:
         json.dump(json_dict, json_file)
 
+    write_manifest(OUT_DIR, manifest)
+
     return True
 
 
@@ -373,7 +531,14 @@ def handle_work_item(func, nightly_info):
     did_generation = False
 
     # DEF something weird
-    did_generation = generate_all_code(func, domain, GEN_FOLDER)
+    did_generation = generate_all_code(
+        func, domain, GEN_FOLDER,
+        jobs=nightly_info["jobs"],
+        nightly_location=nightly_info["nightly_location"],
+        rebuild=nightly_info["rebuild"],
+        counters=nightly_info["counters"],
+        fuel=nightly_info["fuel"],
+        beam_width=nightly_info["beam_width"])
     if not did_generation:
         # REMOVE generated fir for the function to make website
         shutil.rmtree(f"{GEN_FOLDER}{c_ize_name(func)}")
@@ -392,7 +557,12 @@ def main(argv):
 
     nightly_info = {
         "nightly_location": NIGHTLY_LOCATION,
-        "nightly_timestamp": NIGHTLY_TS
+        "nightly_timestamp": NIGHTLY_TS,
+        "jobs": args.jobs,
+        "fuel": args.fuel,
+        "beam_width": args.beam_width,
+        "rebuild": args.rebuild,
+        "counters": args.counters,
     }
 
 
@@ -4,3 +4,23 @@ from .operations import *
 from .rules import rules
 from .eval import eval
 from .parse import egg_to_fpcore, one_arg
+
+import hashlib as _hashlib
+import os.path as _path
+
+
+def source_version(*filenames):
+    """
+    Hash of the rule definitions (and any extra files given) used to key
+    on-disk caches of egraph results
+    """
+    rules_dir = _path.dirname(_path.abspath(__file__))
+    names = ["operations.py", "rules.py", "eval.py", "parse.py"]
+    hasher = _hashlib.sha256()
+    for fname in [_path.join(rules_dir, n) for n in names] + list(filenames):
+        with open(fname, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+RULES_VERSION = source_version()
@@ -0,0 +1,63 @@
+import math
+
+import lambdas
+from lambdas.types import count_ops
+
+# Ops per polynomial term, a multiply and an add
+POLY_OPS_PER_TERM = 2
+
+# A hole never needs less than this fraction of the terms the whole domain
+# would need
+MIN_TERM_FRACTION = 0.25
+
+# Widths are capped here, so wide and infinite domains need all the terms
+MAX_WIDTH = 2.0**10
+
+
+def domain_width(domain):
+    """
+    Width of the domain as a float, capped at MAX_WIDTH
+    """
+    if not domain.isfinite():
+        return MAX_WIDTH
+    return min(MAX_WIDTH, domain.float_sup - domain.float_inf)
+
+
+class CostModel():
+    """
+    Estimated op count of a partial implementation, used to order the
+    synthesis search.
+    Transforms cost the ops in their reductions and reconstructions, as
+    given by their `cost_ops`, polynomials cost POLY_OPS_PER_TERM per term, and holes cost the terms a
+    polynomial on their domain is expected to need. That is `terms` for the
+    whole target domain, fewer as reductions narrow the domain.
+    Any callable taking a lambda and returning a number can be used in its
+    place.
+    """
+
+    def __init__(self, target_domain, terms: int):
+        self.target_width = domain_width(target_domain)
+        self.terms = terms
+
+    def terms_needed(self, hole):
+        width = domain_width(hole.out_type.domain)
+        if self.target_width == 0.0:
+            return self.terms
+        # Degree for a fixed error grows about with the log of the width
+        fraction = math.log2(1 + width) / math.log2(1 + self.target_width)
+        fraction = min(1.0, max(MIN_TERM_FRACTION, fraction))
+        return self.terms * fraction
+
+    def node_ops(self, node):
+        if type(node) == lambdas.Hole:
+            return POLY_OPS_PER_TERM * self.terms_needed(node)
+        if hasattr(node, "p_monomials"):
+            terms = len(node.p_monomials) + len(node.q_monomials)
+            return POLY_OPS_PER_TERM * terms + count_ops(node.combiner)
+        if not isinstance(node, lambdas.types.Transform):
+            return 0
+        return node.cost_ops()
+
+    def __call__(self, lam):
+        nodes = lam.find_lambdas(lambda l: True)
+        return sum(self.node_ops(node) for node in nodes)
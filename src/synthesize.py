@@ -1,5 +1,7 @@
 
 import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import cmd_sollya
 import fpcore
@@ -7,16 +9,63 @@ import lambdas
 from dirty_equal import dirty_equal
 from interval import Interval
 from lego_blocks.forms.horner import tree_pow
+from synthesis_cost import CostModel
 from utils.logging import Logger
 
 logger = Logger(color=Logger.green, level=Logger.LOW)
 
-def synthesize(target, fuel=10):
+POLYNOMIAL_METHODS = ["taylor", "chebyshev", "remez", "fpminimax"]
+
+# Partials kept between fuel iterations by `synthesize`
+DEFAULT_BEAM_WIDTH = 16
+
+# Approximation errors at or below this are as good as exact for doubles,
+# a few ulps at magnitude 1 where the rounding of the evaluation dominates.
+# Compared with the measured errors, which 14 term polynomials on reduced
+# domains get under
+DEFAULT_ERROR_FLOOR = 2**-50
+
+
+def synthesize(target, fuel=10, jobs=None, beam_width=DEFAULT_BEAM_WIDTH):
     lam = lambdas.Hole(target)
     return paper_synthesize(lam,
                             tools=["tds", "remez"],
                             terms=[14],
-                            fuel=fuel)
+                            fuel=fuel,
+                            jobs=jobs,
+                            beam_width=beam_width)
+
+
+def has_hole(lam):
+    return len(lam.find_lambdas(lambda l: type(l) == lambdas.Hole)) != 0
+
+
+def approximation_error(lam):
+    """
+    Largest measured error of the approximations in a completed lambda.
+    The epsilons are rounded up to multiples of 2**-23, so they would tie
+    accurate lambdas, they are only used when nothing was measured
+    """
+    approxs = lam.find_lambdas(lambda l: type(l) == lambdas.Approx)
+    return max([a.epsilon if a.infnorm is None else a.infnorm
+                for a in approxs], default=0.0)
+
+
+def dominated(cost, error, front):
+    """
+    If some (cost, error, lambda) on the front is at least as good in both
+    and better in one
+    """
+    return any(c <= cost and e <= error and (c < cost or e < error)
+               for c, e, _ in front)
+
+
+def pareto_front(scored):
+    """
+    The (cost, error, lambda) triples no other triple dominates
+    """
+    return [t for t in scored if not dominated(t[0], t[1], scored)]
+
 
 def paper_synthesize(lam,
                      tools:list=None,
@@ -24,7 +73,25 @@ def paper_synthesize(lam,
                      powers: str="auto", # for poly
                      precisions: list=None, # for poly
                      fixed_terms: dict=None, # for poly
-                     fuel=10):
+                     fuel=10,
+                     jobs: int=None,
+                     beam_width: int=None,
+                     cost_model=None,
+                     error_floor: float=DEFAULT_ERROR_FLOOR):
+    """
+    Best first search for implementations of the holes in `lam`.
+    Each fuel iteration fills every hole of the kept partials with each
+    transform and polynomial, then:
+    * completed lambdas join the (cost, error) Pareto front, where cost is
+      `cost_model` of the lambda and error its approximation error
+    * partials are dropped when a completed lambda is cheaper and at least
+      as accurate as `error_floor`, the best any completion could be
+    * the `beam_width` cheapest partials are kept
+    Returns the lambdas on the front.
+    With `beam_width` None the search is exhaustive, every partial is kept
+    and every completed lambda is returned. The cost is an estimate and the
+    error leaves out evaluation error, so this is the way to measure them all.
+    """
 
     transforms = []
     if "tds" in tools:
@@ -35,11 +102,26 @@ def paper_synthesize(lam,
         lambdas.PeriodicRecons
         ]
 
+    # Sollya runs are farmed out to worker processes when jobs != 1
+    executor = None
+    if jobs is None:
+        jobs = os.cpu_count()
+
+    if cost_model is None:
+        cost_model = CostModel(lam.out_type.domain, max(terms))
+
+    if not has_hole(lam):
+        lam.type_check()
+        return [lam]
+
     # Each list item is a lambda expression with Hole elements
+    exhaustive = beam_width is None
     completed = list()
+    front = list()
     old_partials = [lam]
     for i in range(fuel):
         new_partials = list()
+        poly_requests = list()
         for partial in old_partials:
             try:
                 logger("Finishing partial impl: {}", partial)
@@ -47,11 +129,6 @@ def paper_synthesize(lam,
                 pass # just make it run
             holes = partial.find_lambdas(lambda l: type(l) == lambdas.Hole)
 
-            # The expression had no holes,
-            if len(holes) == 0:
-                completed.append(partial)
-                continue
-
             # One hole
             found_at_least_one = False
             assert len(holes) == 1
@@ -69,55 +146,58 @@ def paper_synthesize(lam,
                     new_partials.append(filled)
 
             # Polynomial synth part
+            # Each request gets a placeholder that is filled once all the
+            # Sollya calls for this fuel iteration have been made
             if hole.out_type.domain.isfinite():
                 for t in terms:
-                    if "taylor" in tools:
-                        tay = fill_sollya_polynomial(hole.out_type.function,
-                                                     hole.out_type.domain,
-                                                     "taylor",
-                                                     t,
-                                                     powers,
-                                                     precisions,
-                                                     fixed_terms)
-                        found_at_least_one = True
-                        new_partials.append(partial.replace_lambda(hole, tay))
-                    if "chebyshev" in tools:
-                        tay = fill_sollya_polynomial(hole.out_type.function,
-                                                     hole.out_type.domain,
-                                                     "chebyshev",
-                                                     t,
-                                                     powers,
-                                                     precisions,
-                                                     fixed_terms)
+                    for method in POLYNOMIAL_METHODS:
+                        if method not in tools:
+                            continue
                         found_at_least_one = True
-                        new_partials.append(partial.replace_lambda(hole, tay))
-                    if "remez" in tools:
-                        tay = fill_sollya_polynomial(hole.out_type.function,
-                                                     hole.out_type.domain,
-                                                     "remez",
-                                                     t,
-                                                     powers,
-                                                     precisions,
-                                                     fixed_terms)
-                        found_at_least_one = True
-                        new_partials.append(partial.replace_lambda(hole, tay))
-                    if "fpminimax" in tools:
-                        tay = fill_sollya_polynomial(hole.out_type.function,
-                                                     hole.out_type.domain,
-                                                     "fpminimax",
-                                                     t,
-                                                     powers,
-                                                     precisions,
-                                                     fixed_terms)
-                        found_at_least_one = True
-                        new_partials.append(partial.replace_lambda(hole, tay))
+                        new_partials.append(None)
+                        # Interned so the Sollya translations of the many
+                        # equal functions are shared
+                        args = (hole.out_type.function.intern(),
+                                hole.out_type.domain,
+                                method,
+                                t,
+                                powers,
+                                precisions,
+                                fixed_terms)
+                        poly_requests.append((len(new_partials) - 1,
+                                              partial,
+                                              hole,
+                                              args))
 
             # Complain
             if not found_at_least_one:
                 logger.warning("Unable to fill hole!")
 
+        # Make all the Sollya calls for this iteration together
+        if len(poly_requests) != 0:
+            if executor is None and jobs != 1 and len(poly_requests) > 1:
+                executor = ProcessPoolExecutor(max_workers=jobs)
+            fill_polynomial_holes(new_partials, poly_requests, executor, jobs)
+            new_partials = [p for p in new_partials if p is not None]
+
+        # Completed lambdas go on the front, the cheapest partials that
+        # could still beat it are kept. An exhaustive search keeps them all
+        scored = [(cost_model(p), p) for p in new_partials]
+        done = [(c, approximation_error(p), p)
+                for c, p in scored if not has_hole(p)]
+        completed.extend(done)
+        pending = [(c, p) for c, p in scored if has_hole(p)]
+        if not exhaustive:
+            front = pareto_front(front + done)
+            pending = [(c, p) for c, p in pending
+                       if not dominated(c, error_floor, front)]
+            pending.sort(key=lambda t: t[0])
+            pending = pending[:beam_width]
+        logger("Kept {} of {} partials, {} completed",
+               len(pending), len(scored), len(completed))
+
         # Update list
-        old_partials = new_partials
+        old_partials = [p for _, p in pending]
 
         # Early out
         if len(old_partials) == 0:
@@ -126,8 +206,17 @@ def paper_synthesize(lam,
         if i == fuel - 1:
             logger.warning("Ran out of fuel!")
 
+    if executor is not None:
+        executor.shutdown()
+
+    if exhaustive:
+        front = completed
+    else:
+        logger("Dropped {} of {} completed lambdas off the front",
+               len(completed) - len(front), len(completed))
+
     my_lambdas = list()
-    for c in completed:
+    for _, _, c in front:
         logger("Type check on: {}", c)
         c.type_check()
         my_lambdas.append(c)
@@ -135,6 +224,86 @@ def paper_synthesize(lam,
     return my_lambdas
 
 
+def fill_polynomial_holes(new_partials: list,
+                          poly_requests: list,
+                          executor: ProcessPoolExecutor=None,
+                          jobs: int=1):
+    """
+    Replace the placeholders in `new_partials` with the filled partials.
+    `poly_requests` holds (index, partial, hole, args) tuples where `args` are
+    the arguments to `fill_sollya_polynomial`.
+    Without an executor the polynomials are made in order in this process.
+    The error bounds are found in one Sollya request per job, placeholders
+    whose error bound could not be found are left as None.
+    """
+    polys = [None] * len(poly_requests)
+    if executor is None:
+        for i, (_, _, _, args) in enumerate(poly_requests):
+            polys[i] = sollya_polynomial(*args)
+    else:
+        futures = {executor.submit(sollya_polynomial, *args): i
+                   for i, (_, _, _, args) in enumerate(poly_requests)}
+        try:
+            for future in as_completed(futures):
+                polys[futures[future]] = future.result()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    triples = [(poly.in_node.out_type.function, args[0], args[1])
+               for poly, (_, _, _, args) in zip(polys, poly_requests)]
+    if executor is None or jobs == 1:
+        epsilons = dirtyinfnorm_batch(triples)
+    else:
+        # Contiguous chunks, one batch per job
+        size = math.ceil(len(triples) / jobs)
+        starts = range(0, len(triples), size)
+        futures = [executor.submit(dirtyinfnorm_batch, triples[s:s+size])
+                   for s in starts]
+        try:
+            epsilons = [eps for future in futures for eps in future.result()]
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    for poly, eps, request in zip(polys, epsilons, poly_requests):
+        idx, partial, hole, args = request
+        func, domain = args[0], args[1]
+        if eps is None:
+            logger.warning("Dropping polynomial for {} on {}", func, domain)
+            continue
+        approx = lambdas.Approx(func, domain, round_up_epsilon(eps), poly,
+                                infnorm=eps)
+        new_partials[idx] = partial.replace_lambda(hole, approx)
+
+
+def dirtyinfnorm_batch(triples: list):
+    """
+    DirtyInfNormBatch that falls back to one DirtyInfNorm per triple when
+    Sollya reports an error, so one bad polynomial does not take the others
+    with it. Timeouts are handled by the batch itself.
+    Triples whose error bound could not be found get None.
+    """
+    try:
+        return cmd_sollya.DirtyInfNormBatch(triples)
+    except cmd_sollya.FailedDirtyInfNorm:
+        logger.warning("Batched DirtyInfNorm failed, running one at a time")
+
+    epsilons = list()
+    for poly, fpc, domain in triples:
+        try:
+            epsilons.append(cmd_sollya.DirtyInfNorm(poly, fpc, domain))
+        except (cmd_sollya.TimeoutDirtyInfNorm, cmd_sollya.FailedDirtyInfNorm):
+            epsilons.append(None)
+    return epsilons
+
+
+def round_up_epsilon(eps):
+    # round up the epsilon just incase
+    scale = 2**23
+    return math.ceil(eps*scale)/scale
+
+
 def fill_sollya_polynomial(func: fpcore.ast.FPCore,
                            domain: Interval,
                            method: str,
@@ -142,6 +311,20 @@ def fill_sollya_polynomial(func: fpcore.ast.FPCore,
                            powers: str="auto",
                            precisions: list=None,
                            fixed_terms: dict=None):
+    poly = sollya_polynomial(func, domain, method, terms, powers, precisions,
+                             fixed_terms)
+    eps = cmd_sollya.DirtyInfNorm(poly.in_node.out_type.function, func, domain)
+    return lambdas.Approx(func, domain, round_up_epsilon(eps), poly,
+                          infnorm=eps)
+
+
+def sollya_polynomial(func: fpcore.ast.FPCore,
+                      domain: Interval,
+                      method: str,
+                      terms: int,
+                      powers: str="auto",
+                      precisions: list=None,
+                      fixed_terms: dict=None):
     if method not in {"fpminimax", "remez", "chebyshev", "taylor"}:
         raise TypeError(f"method must be one of fpminimax, remez, chebyshev, taylor")
     assert powers in {"odd", "even", "auto", "all"}
@@ -216,11 +399,4 @@ def fill_sollya_polynomial(func: fpcore.ast.FPCore,
     # get coefficients out
     for m,c in zip(monomials, res.coefficients):
         poly_terms[m] = fpcore.interface.num(c)
-    poly = lambdas.Polynomial(poly_terms, split=1)
-
-    # round up the epsilon just incase
-    eps = cmd_sollya.DirtyInfNorm(poly.in_node.out_type.function, func, domain)
-    scale = 2**23
-    eps = math.ceil(eps*scale)/scale
-
-    return lambdas.Approx(func, domain, eps, poly)
\ No newline at end of file
+    return lambdas.Polynomial(poly_terms, split=1)
\ No newline at end of file
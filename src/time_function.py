@@ -1,8 +1,12 @@
-
-import subprocess
-from compile import compile_file, link_files
 from interval import Interval
+from measurement_library import load_measurement_library
 from numeric_types import FP32, FP64, NumericType
+from utils import Logger
+
+logger = Logger(level=Logger.MEDIUM, color=Logger.green)
+
+# Only complain once when perf_event_open does not work
+COUNTERS_NAG_SHOWN = False
 
 
 def time_function(numeric_type: NumericType,
@@ -10,42 +14,71 @@ def time_function(numeric_type: NumericType,
                   c_code: str,
                   domain: Interval,
                   samples: int = 1 << 17,
-                  iters: int = 100) -> float:
+                  iters: int = 100,
+                  mode: str = "throughput",
+                  flags: list = None) -> float:
+    """
+    Median nanoseconds per call. In "throughput" mode the inputs are
+    independent, in "latency" mode each input depends on the previous output.
+    `flags` replaces the default compiler flags.
+    """
     
     if not c_function_name:
         return None
-    
 
-    low = domain.inf.to_libm_c(numeric_type=numeric_type)
-    high = domain.sup.to_libm_c(numeric_type=numeric_type)
-
-
-    if numeric_type == FP64:
-        gen = f"time_function_fp64"
-    elif numeric_type == FP32:
-        gen = f"time_function_fp32"
-
-    lines = [
-        '#include "timing_measurement.h"',
-        '#include "double_double.h"',
-        '#include "cody_waite_reduction.h"',
-        '',
-        c_code,
-        '',
-        'int main(int argc, char** argv) {',
-        f'  {gen}({c_function_name}, {low}, {high}, {samples}, {iters});',
-        '}'
-    ]
-    c_source = "\n".join(lines)
-
-    fname = f"{c_function_name}.c"
-    with open(fname, "w") as f:
-        f.write(c_source)
-
-    run_name = f"{c_function_name}_runner"
-    obj = compile_file(fname)
-    runner = link_files([obj], run_name)
-    
-    p = subprocess.run(f"./{runner}", capture_output=True)
+    # The function is compiled once and reused for every domain
+    lib = load_measurement_library(numeric_type, c_function_name, c_code,
+                                   flags=flags)
+
+    return lib.time(domain.float_inf, domain.float_sup, samples, iters, mode)
+
+
+def time_function_stats(numeric_type: NumericType,
+                        c_function_name: str,
+                        c_code: str,
+                        domain: Interval,
+                        samples: int = 1 << 17,
+                        iters: int = 100,
+                        mode: str = "throughput",
+                        flags: list = None) -> dict:
+    """
+    Like time_function, but gives the median, median absolute deviation,
+    min and max nanoseconds per call over the `iters` trials
+    """
+    if not c_function_name:
+        return None
+
+    lib = load_measurement_library(numeric_type, c_function_name, c_code,
+                                   flags=flags)
+
+    return lib.timing(domain.float_inf, domain.float_sup, samples,
+                      iters, mode).to_dict()
+
+
+def function_counters(numeric_type: NumericType,
+                      c_function_name: str,
+                      c_code: str,
+                      domain: Interval,
+                      samples: int = 1 << 17,
+                      passes: int = 10,
+                      mode: str = "throughput",
+                      flags: list = None) -> dict:
+    """
+    Cycles, instructions, instructions per cycle, branch misses and cache
+    misses per call, each None when the counter is not available
+    """
+    global COUNTERS_NAG_SHOWN
+
+    if not c_function_name:
+        return None
+
+    lib = load_measurement_library(numeric_type, c_function_name, c_code,
+                                   flags=flags)
 
-    return float.fromhex(p.stdout.decode("utf-8"))
\ No newline at end of file
+    result = lib.counters(domain.float_inf, domain.float_sup, samples,
+                          passes, mode)
+    if not result.available() and not COUNTERS_NAG_SHOWN:
+        logger.warning("Hardware counters are not available"
+                       " (needs Linux and perf_event_paranoid <= 2)")
+        COUNTERS_NAG_SHOWN = True
+    return result.to_dict()
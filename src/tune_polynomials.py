@@ -0,0 +1,206 @@
+import copy
+
+import lambdas
+import lego_blocks.forms as forms
+from compile import REPRODUCIBLE_FLAGS
+from error_function import error_function
+from lambdas.fixed_multi_polynomial import FixedMultiPolynomial
+from numeric_types import FP64, NumericType
+from time_function import time_function
+from utils import Logger
+
+logger = Logger(level=Logger.MEDIUM, color=Logger.cyan)
+
+# Orders the general form can sum its terms in
+GENERAL_ORDERS = ["ascending", "descending"]
+
+# A candidate has to be this much faster to replace the current choice, so
+# timing noise does not flip between equivalent schemes
+MIN_GAIN = 0.02
+
+# The default error bound is the untuned error plus this fraction, sampled
+# errors of equally good schemes differ in the last bits
+ERROR_SLACK = 0.01
+
+
+def is_tunable(lam):
+    # Double double evaluation and custom splits are left as written
+    if type(lam) == lambdas.Horner:
+        if lam.useDD or lam.split_expr is not None:
+            return False
+    elif type(lam) not in {lambdas.Estrin, lambdas.General}:
+        return False
+    return isinstance(lam.in_node, FixedMultiPolynomial)
+
+
+def polynomial_nodes(lam):
+    """
+    Polynomial evaluations in the tree by the polynomial they evaluate,
+    rewriting copies the tree so nodes are found again by this key
+    """
+    found = lam.find_lambdas(is_tunable)
+    return {str(node.in_node): node for node in found}
+
+
+def scheme_variants(node, max_split: int, fmas: list):
+    """
+    Every evaluation scheme for the polynomial of `node`, with and without
+    fma as given
+    """
+    poly = node.in_node
+    terms = len(poly.p_monomials)
+    if len(poly.q_monomials) != 0:
+        terms = min(terms, len(poly.q_monomials))
+    splits = range(0, min(max_split, terms - 1) + 1)
+
+    variants = list()
+    for fma in fmas:
+        variants += [lambdas.General(copy.copy(poly), order=order, fma=fma)
+                     for order in GENERAL_ORDERS]
+        variants += [lambdas.Horner(copy.copy(poly), split=split, fma=fma)
+                     for split in splits]
+        variants += [lambdas.Estrin(copy.copy(poly), split=split, fma=fma)
+                     for split in splits]
+    return variants
+
+
+def describe(node):
+    fma = ", fma" if node.fma else ""
+    if type(node) == lambdas.General:
+        return f"general {node.order}{fma}"
+    return f"{type(node).__name__.lower()} split {node.split}{fma}"
+
+
+def rounding_bound(node, numeric_type: NumericType):
+    """
+    Largest rounding error bound of the polynomial forms `node` generates,
+    over the domain of its polynomial
+    """
+    domain = node.in_node.out_type.domain
+    blocks = node.generate(numeric_type)
+    return max(block.rounding_error(domain) for block in blocks
+               if isinstance(block, forms.Form))
+
+
+def use_fma(lam):
+    """
+    Rewrite the evaluation of every FixedPolynomial in `lam` to use explicit
+    fma, keeping the scheme
+    """
+    for key in sorted(polynomial_nodes(lam)):
+        node = polynomial_nodes(lam)[key]
+        fused = copy.copy(node)
+        fused.fma = True
+        lam = lam.replace_lambda(node, fused)
+    return lam
+
+
+class Tuner():
+    """
+    Measures the error and speed of whole lambdas on one domain
+    """
+
+    def __init__(self, lam, domain, numeric_type, func_type, samples, iters):
+        self.domain = domain
+        self.numeric_type = numeric_type
+        self.func_type = func_type
+        self.samples = samples
+        self.iters = iters
+        self.function_name = "tune_candidate"
+        self.oracle_name = "tune_oracle"
+        _, lines = lambdas.generate_mpfr_c_code(lam.out_type,
+                                                self.oracle_name,
+                                                numeric_type=func_type)
+        self.oracle_code = "\n".join(lines)
+
+    def measure(self, lam, flags):
+        """
+        Max absolute error and median nanoseconds per call, None when the
+        lambda cannot be generated
+        """
+        try:
+            _, lines = lambdas.generate_c_code(lam, self.function_name,
+                                               numeric_type=self.numeric_type,
+                                               func_type=self.func_type)
+        except (ValueError, NotImplementedError) as e:
+            logger("Unable to generate candidate: {}", e)
+            return None
+        code = "\n".join(lines)
+
+        data = error_function(numeric_type=self.func_type,
+                              samples=self.samples,
+                              c_function_name=self.function_name,
+                              c_code=code,
+                              oracle_function_name=self.oracle_name,
+                              oracle_code=self.oracle_code,
+                              domain=self.domain,
+                              flags=flags)
+        error = float(data["f_abs_error"].max())
+        time = time_function(numeric_type=self.func_type,
+                             c_function_name=self.function_name,
+                             c_code=code,
+                             domain=self.domain,
+                             samples=self.samples,
+                             iters=self.iters,
+                             flags=flags)
+        return error, time
+
+
+def tune_polynomials(lam,
+                     domain,
+                     numeric_type: NumericType = FP64,
+                     func_type: NumericType = FP64,
+                     error_bound: float = None,
+                     max_split: int = 2,
+                     fmas: list = None,
+                     samples: int = 1 << 14,
+                     iters: int = 20):
+    """
+    Rewrite the evaluation of every FixedPolynomial in `lam` to the fastest
+    scheme (general in either order, horner or estrin with each split),
+    with or without explicit fma, that keeps the error on `domain` within
+    `error_bound`, by default the error of `lam` as written plus
+    ERROR_SLACK.
+    Polynomials are tuned one at a time, keeping the choices made so far.
+    Everything is compiled with REPRODUCIBLE_FLAGS, so only the fma the
+    code asks for is used.
+    Returns the tuned lambda and the compiler flags it was measured with.
+    """
+    if fmas is None:
+        fmas = [False, True]
+    lam.type_check()
+    tuner = Tuner(lam, domain, numeric_type, func_type, samples, iters)
+
+    flags = list(REPRODUCIBLE_FLAGS)
+    measured = tuner.measure(lam, flags)
+    if measured is None:
+        raise ValueError("Unable to generate the lambda being tuned")
+    base_error, best_time = measured
+    if error_bound is None:
+        error_bound = base_error * (1 + ERROR_SLACK)
+    logger("Untuned: error {} time {}", base_error, best_time)
+
+    best = lam
+    for key in sorted(polynomial_nodes(lam)):
+        current = best
+        node = polynomial_nodes(current).get(key)
+        if node is None:
+            continue
+        logger("Tuning {}", key)
+
+        for variant in scheme_variants(node, max_split, fmas):
+            candidate = current.replace_lambda(node, variant)
+            measured = tuner.measure(candidate, flags)
+            if measured is None:
+                continue
+            error, time = measured
+            logger("  {}: error {} (bound {}) time {}",
+                   describe(variant), error,
+                   rounding_bound(variant, numeric_type), time)
+            if error > error_bound:
+                continue
+            if time < best_time * (1 - MIN_GAIN):
+                best, best_time = candidate, time
+
+    logger("Tuned: time {}", best_time)
+    return best, flags
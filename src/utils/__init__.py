@@ -5,3 +5,5 @@ from .timing import Timer
 from .expr_if_less import ExprIfLess
 
 from .class_modifier import add_method
+from .disk_cache import DiskCache, normalized_hash
+from .array_cache import ArrayCache
@@ -0,0 +1,113 @@
+import os
+import os.path as path
+import time
+
+import numpy as np
+
+from .disk_cache import CACHE_DISABLED, DEFAULT_CACHE_DIR
+from .logging import Logger
+
+logger = Logger(level=Logger.HIGH, color=Logger.green)
+
+# Temporary files older than this, in seconds, were left by a writer that
+# died and are removed on eviction. Younger ones may still be being written
+TMP_MAX_AGE = 60 * 60
+
+
+class ArrayCache():
+    """
+    A content addressed store of numpy arrays, one .npy file per key, that
+    are memory mapped back in on lookup so large tables are never parsed or
+    copied up front.
+
+    When the files grow past `max_bytes` the least recently used are dropped.
+    """
+
+    def __init__(self,
+                 name: str,
+                 directory: str = None,
+                 max_bytes: int = 8 << 30):
+        self.name = name
+        self.directory = path.join(directory or DEFAULT_CACHE_DIR, name)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.enabled = not CACHE_DISABLED
+
+    def __repr__(self):
+        return "ArrayCache({}, {})".format(repr(self.name),
+                                           repr(self.directory))
+
+    def _filename(self, key: str):
+        return path.join(self.directory, f"{key}.npy")
+
+    def lookup(self, key: str):
+        """
+        Returns the read only memory mapped array, or None if it is missing
+        """
+        if not self.enabled:
+            return None
+        filename = self._filename(key)
+        try:
+            array = np.load(filename, mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # The modification time doubles as the last use for eviction
+        os.utime(filename)
+        self.hits += 1
+        return array
+
+    def store(self, key: str, array: np.ndarray):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self._filename(key)
+        # Written under a temporary name so readers never see a partial file
+        tmpname = path.join(self.directory, f"{key}.{os.getpid()}.tmp.npy")
+        np.save(tmpname, array)
+        os.replace(tmpname, filename)
+        self.evict()
+
+    def evict(self):
+        if not path.isdir(self.directory):
+            return
+        now = time.time()
+        entries = list()
+        for fname in os.listdir(self.directory):
+            filename = path.join(self.directory, fname)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            if fname.endswith(".tmp.npy"):
+                if now - stat.st_mtime > TMP_MAX_AGE:
+                    self._remove(filename)
+                continue
+            if fname.endswith(".npy"):
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        logger("Evicting from {}, {} bytes over", self.name,
+               total - self.max_bytes)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(filename)
+            total -= size
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def clear(self):
+        if not path.isdir(self.directory):
+            return
+        for fname in os.listdir(self.directory):
+            os.remove(path.join(self.directory, fname))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
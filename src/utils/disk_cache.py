@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import os.path as path
+import sqlite3
+import time
+
+from .logging import Logger
+
+logger = Logger(level=Logger.HIGH, color=Logger.green)
+
+THIS_LOC = path.abspath(__file__)
+UTILS_DIR = path.split(THIS_LOC)[0]
+SRC_DIR = path.split(UTILS_DIR)[0]
+GIT_DIR = path.split(SRC_DIR)[0]
+
+# The cache location can be moved (or shared between checkouts) by setting
+# MEGALIBM_CACHE_DIR, and turned off entirely with MEGALIBM_NO_CACHE=1
+DEFAULT_CACHE_DIR = os.environ.get("MEGALIBM_CACHE_DIR",
+                                   path.join(GIT_DIR, "cache"))
+CACHE_DISABLED = os.environ.get("MEGALIBM_NO_CACHE", "0") not in {"", "0"}
+
+
+def normalized_hash(text: str):
+    """
+    Hash text after removing whitespace differences that do not change its
+    meaning (trailing spaces, blank lines, line endings)
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    normal = "\n".join(line for line in lines if line != "")
+    return hashlib.sha256(normal.encode("utf8")).hexdigest()
+
+
+class DiskCache():
+    """
+    A content addressed key/value store kept in a sqlite file so that it is
+    shared between processes and between runs.
+
+    Values must be json serializable, `None` is a valid value and is used to
+    remember negative results.
+    Entries older than `max_age` seconds are dropped, and when the store grows
+    past `max_bytes` the least recently used entries are dropped. This is
+    checked on connecting and after every `evict_every` stores.
+    Access times are only needed for eviction, so hits do not write, they
+    are kept in memory and written with the next store or eviction.
+    """
+
+    def __init__(self,
+                 name: str,
+                 directory: str = None,
+                 max_bytes: int = 1 << 30,
+                 max_age: float = 60 * 60 * 24 * 90,
+                 evict_every: int = 256):
+        self.name = name
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.filename = path.join(self.directory, f"{name}.sqlite")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.enabled = not CACHE_DISABLED
+        self._conn = None
+        self._pid = None
+        self._stores = 0
+        self._accessed = dict()
+
+    def __repr__(self):
+        return "DiskCache({}, {})".format(repr(self.name),
+                                          repr(self.directory))
+
+    def _connect(self):
+        # sqlite connections must not be shared with forked children
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        self._pid = os.getpid()
+        self._stores = 0
+        self._accessed = dict()
+        os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.filename, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                           " key TEXT PRIMARY KEY,"
+                           " value TEXT NOT NULL,"
+                           " size INTEGER NOT NULL,"
+                           " created REAL NOT NULL,"
+                           " accessed REAL NOT NULL)")
+        self._conn.commit()
+        self.evict()
+        return self._conn
+
+    def lookup(self, key: str):
+        """
+        Returns a tuple of (found, value) so that cached `None` values can be
+        told apart from missing entries
+        """
+        if not self.enabled:
+            return False, None
+        conn = self._connect()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?",
+                           (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age:
+            self.misses += 1
+            return False, None
+        self._accessed[key] = now
+        self.hits += 1
+        return True, json.loads(row[0])
+
+    def store(self, key: str, value):
+        if not self.enabled:
+            return
+        text = json.dumps(value)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO entries"
+                     " (key, value, size, created, accessed)"
+                     " VALUES (?, ?, ?, ?, ?)",
+                     (key, text, len(text), now, now))
+        self._accessed.pop(key, None)
+        self._write_accessed(conn)
+        conn.commit()
+        self._stores += 1
+        if self._stores % self.evict_every == 0:
+            self.evict()
+
+    def _write_accessed(self, conn):
+        if len(self._accessed) == 0:
+            return
+        conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                         [(t, k) for k, t in self._accessed.items()])
+        self._accessed.clear()
+
+    def evict(self):
+        conn = self._connect()
+        self._write_accessed(conn)
+        cutoff = time.time() - self.max_age
+        conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries")
+        total = total.fetchone()[0]
+        if total > self.max_bytes:
+            logger("Evicting from {}, {} bytes over", self.name,
+                   total - self.max_bytes)
+            rows = conn.execute("SELECT key, size FROM entries"
+                                " ORDER BY accessed ASC").fetchall()
+            drop = list()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                drop.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", drop)
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM entries")
+        conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,109 @@
+import ctypes
+
+import numpy as np
+import lambdas
+from compile import DEFAULT_FLAGS, compile_shared_library
+from interval import Interval
+from measurement_library import MEASUREMENT_SEED
+from numeric_types import FP32, FP64, NumericType
+from utils import Logger
+from work_pool import run_in_child
+
+logger = Logger(level=Logger.MEDIUM, color=Logger.green)
+
+_DTYPES = {
+    FP32: np.float32,
+    FP64: np.float64,
+}
+
+# Same width unsigned integers, to compare results bit for bit
+_BITS = {
+    FP32: np.uint32,
+    FP64: np.uint64,
+}
+
+
+def vector_source(lam, name: str, numeric_type: NumericType,
+                  func_type: NumericType):
+    """
+    C source with the scalar and the array versions of `lam`, and a loop
+    calling the scalar one with the same signature as the array one
+    """
+    _, scalar_lines = lambdas.generate_c_code(lam, name,
+                                              numeric_type=numeric_type,
+                                              func_type=func_type)
+    _, vec_lines = lambdas.generate_vec_c_code(lam, f"{name}_vec",
+                                               numeric_type=numeric_type,
+                                               func_type=func_type)
+    c_type = func_type.c_type
+    lines = [
+        "#include <stddef.h>",
+        "#include \"double_double.h\"",
+        "#include \"cody_waite_reduction.h\"",
+        "",
+        *scalar_lines,
+        "",
+        *vec_lines,
+        "",
+        f"void {name}_scalar(const {c_type} *in, {c_type} *out, size_t n)",
+        "{",
+        "    for (size_t i = 0; i < n; i++)",
+        "    {",
+        f"        out[i] = {name}(in[i]);",
+        "    }",
+        "}",
+    ]
+    return "\n".join(lines)
+
+
+def _run_both(libname, name, inputs):
+    lib = ctypes.CDLL(libname)
+    arr = np.ctypeslib.ndpointer(dtype=inputs.dtype, ndim=1,
+                                 flags="C_CONTIGUOUS")
+    outputs = list()
+    for suffix in ["scalar", "vec"]:
+        func = getattr(lib, f"{name}_{suffix}")
+        func.argtypes = [arr, arr, ctypes.c_size_t]
+        func.restype = None
+        out = np.empty_like(inputs)
+        func(inputs, out, len(inputs))
+        outputs.append(out)
+    return outputs
+
+
+def vector_mismatches(lam,
+                      name: str,
+                      domain: Interval,
+                      samples: int = 1 << 16,
+                      numeric_type: NumericType = FP64,
+                      func_type: NumericType = FP64,
+                      flags: list = None) -> dict:
+    """
+    Runs the scalar and the array versions of `lam` on the same `samples`
+    inputs from `domain`. Gives the number of inputs where the results are
+    not bit for bit equal, NaNs being equal to each other, and the largest
+    absolute difference.
+    The library is run in a child process, see measurement_library.
+    """
+    if flags is None:
+        flags = list(DEFAULT_FLAGS)
+    source = vector_source(lam, name, numeric_type, func_type)
+    libname = compile_shared_library(source, flags=flags)
+
+    dtype = _DTYPES[func_type]
+    rng = np.random.default_rng(MEASUREMENT_SEED)
+    inputs = rng.uniform(domain.float_inf, domain.float_sup,
+                         samples).astype(dtype)
+    scalar, vec = run_in_child(_run_both, libname, name, inputs)
+
+    bits = _BITS[func_type]
+    both_nan = np.isnan(scalar) & np.isnan(vec)
+    differ = (scalar.view(bits) != vec.view(bits)) & ~both_nan
+    with np.errstate(invalid="ignore"):
+        diff = np.abs(scalar[differ].astype(np.float64)
+                      - vec[differ].astype(np.float64))
+    return {
+        "samples": samples,
+        "mismatches": int(np.count_nonzero(differ)),
+        "max_abs_difference": float(diff.max()) if diff.size != 0 else 0.0,
+    }
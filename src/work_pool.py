@@ -0,0 +1,206 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import os.path as path
+import pickle
+import time
+import traceback
+
+from utils import Logger, normalized_hash
+
+logger = Logger(level=Logger.MEDIUM, color=Logger.blue)
+
+
+def _context():
+    # Forked workers see the handler even when it lives in a script
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _item_name(item):
+    # FPCores name themselves, anything else is shown as is
+    if hasattr(item, "get_any_name"):
+        return item.get_any_name() or item
+    return item
+
+
+def _child_main(handler, item, conn):
+    try:
+        conn.send(("ok", handler(item)))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def _call_main(func, args, conn):
+    try:
+        conn.send(("ok", func(*args)))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+class ChildFailed(Exception):
+    pass
+
+
+def run_in_child(func, *args):
+    """
+    Return `func(*args)` run in a child process, so a crash in native code
+    raises ChildFailed instead of taking this process down.
+    Work items run by `run_work_items` are already in their own process, so
+    there `func` is called directly.
+    """
+    if multiprocessing.current_process().daemon:
+        return func(*args)
+
+    ctx = _context()
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_call_main, args=(func, args, send_conn))
+    proc.start()
+    send_conn.close()
+    try:
+        status, value = recv_conn.recv()
+    except EOFError:
+        proc.join()
+        status, value = "crashed", f"exit code {proc.exitcode}"
+    finally:
+        recv_conn.close()
+    proc.join()
+    if status != "ok":
+        raise ChildFailed(f"{status}: {value}")
+    return value
+
+
+class ResultFiles():
+    """
+    One pickle per finished work item, so a run can be resumed and reports
+    can be built from whatever has finished so far
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _filename(self, key):
+        return path.join(self.directory, f"{key}.pickle")
+
+    def load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._filename(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def store(self, key, record):
+        if self.directory is None:
+            return
+        filename = self._filename(key)
+        tmpname = f"{filename}.{os.getpid()}.tmp"
+        with open(tmpname, "wb") as f:
+            pickle.dump(record, f)
+        os.replace(tmpname, filename)
+
+
+def run_work_items(handler,
+                   work_items: list,
+                   jobs: int = 1,
+                   timeout: float = None,
+                   results_dir: str = None,
+                   version: str = ""):
+    """
+    Run `handler` on every work item and return the list of results of the
+    items that finished, in work item order.
+
+    With more than one job, or a timeout, every item runs in its own process
+    so a crash or a runaway item only loses that item.
+    Finished items are recorded in `results_dir` and not run again. They are
+    keyed on the item and `version`, which should change whenever the
+    handler would give a different result.
+    """
+    results = ResultFiles(results_dir)
+    keys = [normalized_hash("\n".join([version, str(item)]))
+            for item in work_items]
+    records = [results.load(key) for key in keys]
+    for item, record in zip(work_items, records):
+        if record is not None:
+            logger("Reusing result for {}", _item_name(item))
+
+    todo = [i for i, record in enumerate(records) if record is None]
+
+    if jobs <= 1 and timeout is None:
+        for i in todo:
+            records[i] = {"status": "ok", "result": handler(work_items[i])}
+            results.store(keys[i], records[i])
+    else:
+        _run_isolated(handler, work_items, keys, records, todo,
+                      max(jobs, 1), timeout, results)
+
+    finished = list()
+    for item, record in zip(work_items, records):
+        if record is None:
+            continue
+        if record["status"] != "ok":
+            logger.warning("{} for {}", record["status"], _item_name(item))
+            if "message" in record:
+                logger.warning("{}", record["message"])
+            continue
+        finished.append(record["result"])
+    return finished
+
+
+def _run_isolated(handler, work_items, keys, records, todo, jobs, timeout,
+                  results):
+    ctx = _context()
+    pending = list(reversed(todo))
+    running = dict()
+
+    def finish(i, record):
+        records[i] = record
+        # Only successes are kept, failures are tried again on the next run
+        if record["status"] == "ok":
+            results.store(keys[i], record)
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            i = pending.pop()
+            recv_conn, send_conn = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_child_main,
+                               args=(handler, work_items[i], send_conn),
+                               daemon=True)
+            proc.start()
+            send_conn.close()
+            running[recv_conn] = (i, proc, time.monotonic())
+
+        ready = multiprocessing.connection.wait(list(running), timeout=1.0)
+        for conn in ready:
+            i, proc, _ = running.pop(conn)
+            try:
+                status, value = conn.recv()
+            except EOFError:
+                status, value = "crashed", f"exit code {proc.exitcode}"
+            conn.close()
+            proc.join()
+            if status == "ok":
+                finish(i, {"status": "ok", "result": value})
+            else:
+                finish(i, {"status": status, "message": value})
+
+        if timeout is None:
+            continue
+        now = time.monotonic()
+        for conn, (i, proc, start) in list(running.items()):
+            if now - start < timeout:
+                continue
+            proc.kill()
+            proc.join()
+            conn.close()
+            del running[conn]
+            finish(i, {"status": "timeout",
+                       "message": f"no result after {timeout} sec"})